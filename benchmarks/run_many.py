@@ -0,0 +1,73 @@
+"""
+How run_many scales with the number of threads:
+
+    python benchmarks/run_many.py [--tapes N] [--tape-size N] [--rounds N]
+
+Every task sorts random bytes with a bf program, so the work per task is
+the same and only the number of threads differs.
+"""
+
+import os
+import time
+import random
+import argparse
+
+import budivelnyk as bd
+
+
+# Daniel B. Cristofani's bubble sort of the input bytes, which must not be 0.
+SORT = """
+>>,[>>,]<<
+[[<<]>>>>[
+<<[>+<<+>-]
+>>[>+<<<<[->]>[<]>>-]
+<<<[[-]>>[>+<-]>>[<<<+>>>-]]
+>>[[<+>-]>>]<
+]<<[>>+<<-]<<]
+>>>>[.>>]
+"""
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tapes", type=int, default=1000, help="number of tapes (default: 1000)")
+    parser.add_argument("--tape-size", type=int, default=100, help="bytes to sort per tape (default: 100)")
+    parser.add_argument("--rounds", type=int, default=3, help="best of this many runs (default: 3)")
+    return parser.parse_args()
+
+
+def _worker_counts() -> list[int]:
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def main() -> None:
+    arguments = _parse_args()
+    sort = bd.Bf.to_function(SORT, use_jit=bd.UseJIT.MEMORY)
+    generator = random.Random(0)
+    inputs = [bytes(generator.randrange(1, 256) for _ in range(arguments.tape_size))
+              for _ in range(arguments.tapes)]
+    outputs = [bytearray(arguments.tape_size) for _ in inputs]
+    tape_size = 2 * arguments.tape_size + 5
+
+    print(f"{arguments.tapes} tapes, {arguments.tape_size} bytes each")
+    baseline = None
+    for workers in _worker_counts():
+        best = float("inf")
+        for _ in range(arguments.rounds):
+            tapes = [bd.tape_of_size(tape_size) for _ in inputs]
+            start = time.perf_counter()
+            bd.run_many(sort, tapes, inputs=inputs, outputs=outputs, workers=workers)
+            best = min(best, time.perf_counter() - start)
+        baseline = baseline or best
+        print(f"{workers:3} threads: {best * 1000:8.1f} ms, {baseline / best:5.2f}x")
+    assert all(output == bytes(sorted(input)) for input, output in zip(inputs, outputs))
+
+
+if __name__ == "__main__":
+    main()
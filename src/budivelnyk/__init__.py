@@ -3,6 +3,15 @@ Compile bf to asm or to a Python function. Cell size is one byte.
 """
 
 from .frontends.bf import Bf
+from .frontends.batch import BatchResult
 from .backends import Backend
-from .backends.jit import UseJIT, jit_implemented
-from .tape import Tape, tape_of_size, tape_with_contents, as_tape
+from .backends.jit import UseJIT, MemoryIOFunction, jit_implemented
+from .cache import FunctionCache, CacheStatistics
+from .disk_cache import DiskCache
+from .parallel import run_many
+from .tape_pool import TapePool, PooledTapeFunction
+from .analysis import TapeRequirements
+from .tape import (
+    Tape, tape_of_size, tape_with_contents, as_tape,
+    tape_from_file, tape_with_huge_pages, tape_guarded, run_guarded
+)
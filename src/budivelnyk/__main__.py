@@ -1,8 +1,153 @@
-from sys import argv
+"""
+Command line interface. Compiles one file, or every .bf file in a directory:
+
+    python -m budivelnyk input.bf output.s
+    python -m budivelnyk --shared -j 8 programs/ build/
+
+When compiling directories, inputs that haven't changed since the last
+build are skipped. Whether they have changed is decided by hashes of their
+contents and the options, which are stored in a manifest in the output
+directory.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+
 from .frontends.bf import Bf
+from .backends import Backend
+from .optimizer import DEFAULT_LEVEL
+from .disk_cache import compiler_version
+
+
+MANIFEST_NAME = ".budivelnyk-manifest.json"
+
+
+def _parse_args(args: list[str]|None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m budivelnyk", description="Compile bf to asm or to shared libraries.")
+    parser.add_argument("input", help="a bf file, or a directory to compile all .bf files in")
+    parser.add_argument("output", help="the output file, or a directory if the input is a directory")
+    parser.add_argument("-b", "--backend", choices=tuple(Backend.__members__), default=Backend.suggest().name)
+    parser.add_argument("-O", dest="optimize", type=int, default=DEFAULT_LEVEL, metavar="LEVEL",
+                        help=f"optimization level (default: {DEFAULT_LEVEL})")
+    parser.add_argument("--blank-tape", action="store_true", help="assume that the tape is all zeros at the start")
+    parser.add_argument("--bounds-checked", action="store_true",
+                        help="stop programs that would leave the tape, run returns 1 then (x86_64 only)")
+    parser.add_argument("--shared", action="store_true", help="create shared libraries instead of asm")
+    parser.add_argument("--direct", action="store_true",
+                        help="write shared libraries without an assembler or linker (x86_64 Linux only)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of files to compile in parallel (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="compile inputs even if they haven't changed")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't print timings")
+    arguments = parser.parse_args(args)
+    if arguments.direct and not arguments.shared:
+        parser.error("--direct requires --shared")
+    return arguments
+
+
+def _pairs(input_directory: Path, output_directory: Path, suffix: str) -> list[tuple[str, str]]:
+    pairs = []
+    for input_path in sorted(input_directory.rglob("*.bf")):
+        output_path = output_directory / input_path.relative_to(input_directory).with_suffix(suffix)
+        pairs.append((str(input_path), str(output_path)))
+    return pairs
+
+
+def _fingerprint(input_path: str, options: dict[str, object]) -> str:
+    digest = hashlib.sha256()
+    with open(input_path, "rb") as input_file:
+        digest.update(input_file.read())
+    digest.update(repr(sorted(options.items())).encode())
+    digest.update(compiler_version().encode())
+    return digest.hexdigest()
+
+
+def _load_manifest(path: Path) -> dict[str, str]:
+    try:
+        with open(path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _save_manifest(path: Path, manifest: dict[str, str]) -> None:
+    # the output directory doesn't exist yet if there was nothing to compile
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(path.name + ".tmp")
+    with open(temporary_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def main(args: list[str]|None = None) -> int:
+    arguments = _parse_args(args)
+    backend = Backend[arguments.backend]
+    options: dict[str, object] = {
+        "backend": backend.name,
+        "optimize": arguments.optimize,
+        "blank_tape": arguments.blank_tape,
+        "bounds_checked": arguments.bounds_checked,
+        "shared": arguments.shared,
+        "direct": arguments.direct,
+    }
+
+    input_path, output_path = Path(arguments.input), Path(arguments.output)
+    if not input_path.is_dir():
+        # a single file is always compiled
+        pairs = [(str(input_path), str(output_path))]
+        manifest_path = None
+        manifest: dict[str, str] = {}
+        fingerprints: dict[str, str] = {}
+    else:
+        pairs = _pairs(input_path, output_path, ".so" if arguments.shared else ".s")
+        manifest_path = output_path / MANIFEST_NAME
+        manifest = {} if arguments.force else _load_manifest(manifest_path)
+        # The manifest refers to inputs relative to the input directory.
+        fingerprints = {os.path.relpath(source, input_path): _fingerprint(source, options) for source, _ in pairs}
+
+    outdated = []
+    for source, target in pairs:
+        name = os.path.relpath(source, input_path)
+        if name in fingerprints and manifest.get(name) == fingerprints[name] and os.path.exists(target):
+            if not arguments.quiet:
+                print(f"{source}: unchanged")
+        else:
+            outdated.append((source, target))
+            Path(target).parent.mkdir(parents=True, exist_ok=True)
+
+    if arguments.shared:
+        results = Bf.files_to_shared_many(outdated, backend=backend, optimize=arguments.optimize,
+                                          blank_tape=arguments.blank_tape, direct=arguments.direct,
+                                          bounds_checked=arguments.bounds_checked, workers=arguments.jobs)
+    else:
+        results = Bf.files_to_asm_files_many(outdated, backend=backend, optimize=arguments.optimize,
+                                             blank_tape=arguments.blank_tape,
+                                             bounds_checked=arguments.bounds_checked, workers=arguments.jobs)
+
+    failed = False
+    for result in results:
+        name = os.path.relpath(result.input_path, input_path)
+        if result.ok:
+            if name in fingerprints:
+                manifest[name] = fingerprints[name]
+            if not arguments.quiet:
+                print(f"{result.input_path} -> {result.output_path}: {result.seconds * 1000:.1f} ms")
+        else:
+            failed = True
+            manifest.pop(name, None)
+            print(f"{result.input_path}: {result.error}", file=sys.stderr)
+
+    if manifest_path is not None:
+        _save_manifest(manifest_path, manifest)
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
-    if len(argv) != 3:
-        quit("Exactly two args are required: path to input file and path to output file.")
-    input_path, output_path = argv[1:]
-    Bf.file_to_asm_file(input_path, output_path)
+    sys.exit(main())
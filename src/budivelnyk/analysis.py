@@ -0,0 +1,122 @@
+"""
+Static analysis of the intermediate AST.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+
+from .intermediate import (
+    AST, Loop, If, DoWhile, MulAdd, Scan, CheckBounds,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set,
+    AddAt, SetAt, OutputAt, InputAt
+)
+
+
+@dataclass(frozen=True)
+class TapeRequirements:
+    """
+    Offsets of the leftmost and rightmost cells that a program may access,
+    relative to the cell it starts on, which is always included. None if
+    the program may move arbitrarily far in that direction, as far as the
+    analysis can tell.
+    """
+    lowest: int|None
+    highest: int|None
+
+    @property
+    def bounded(self) -> bool:
+        return self.lowest is not None and self.highest is not None
+
+    @property
+    def size(self) -> int|None:
+        """ Number of cells from the lowest to the highest offset. """
+        if self.lowest is None or self.highest is None:
+            return None
+        return self.highest - self.lowest + 1
+
+    @property
+    def start(self) -> int|None:
+        """ Index of the starting cell in a tape of `size` cells, nonzero if the program moves left of it. """
+        return None if self.lowest is None else -self.lowest
+
+
+def tape_requirements(intermediate: AST) -> TapeRequirements:
+    """
+    The result is exact for code without loops, and for loops that return
+    to the cell they started on. Other loops can move arbitrarily far, so
+    they make the bound in the direction they move unknown.
+    """
+    extent = _Interval(0, 0)
+    _analyze(intermediate, _Interval(0, 0), extent)
+    return TapeRequirements(
+        lowest=None if extent.low == -math.inf else int(extent.low),
+        highest=None if extent.high == math.inf else int(extent.high),
+    )
+
+
+@dataclass
+class _Interval:
+    low: float  # an int or -inf
+    high: float  # an int or inf
+
+    def shifted(self, n: int) -> _Interval:
+        return _Interval(self.low + n, self.high + n)
+
+    def include(self, other: _Interval) -> None:
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+
+
+def _analyze(intermediate: AST, position: _Interval, extent: _Interval) -> _Interval:
+    """
+    `position` is the range of offsets where the pointer may be before the
+    code runs, and the result is the range after. Accessed offsets are added
+    to `extent`.
+    """
+    position = _Interval(position.low, position.high)
+    for node in intermediate:
+        match node:
+            case Forward(n):
+                position = position.shifted(n)
+            case Back(n):
+                position = position.shifted(-n)
+            case Add() | Subtract() | Set() | Output() | Input():
+                extent.include(position)
+            case AddAt(offset, _) | SetAt(offset, _) | OutputAt(offset, _) | InputAt(offset, _):
+                extent.include(position.shifted(offset))
+            case MulAdd(offset, _):
+                extent.include(position)
+                extent.include(position.shifted(offset))
+            case Print() | CheckBounds():
+                pass
+            case Scan(stride):
+                if stride > 0:
+                    position.high = math.inf
+                else:
+                    position.low = -math.inf
+                extent.include(position)
+            case Loop(body) | If(body) | DoWhile(body):
+                extent.include(position)
+                # Analyze one iteration relative to where it starts.
+                body_extent = _Interval(0, 0)
+                moved = _analyze(body, _Interval(0, 0), body_extent)
+                if isinstance(node, If):
+                    starts = position
+                    after = _Interval(position.low, position.high)
+                    after.include(_Interval(position.low + moved.low, position.high + moved.high))
+                else:
+                    # Every iteration may move further in the same direction.
+                    starts = _Interval(position.low, position.high)
+                    if moved.high > 0:
+                        starts.high = math.inf
+                    if moved.low < 0:
+                        starts.low = -math.inf
+                    after = starts
+                extent.include(after)
+                extent.include(_Interval(starts.low + body_extent.low, starts.high + body_extent.high))
+                position = after
+            case _:
+                raise NotImplementedError(f"unknown node {node}")
+    return position
@@ -80,7 +80,9 @@ class Backend(enum.Enum):
     def suggest() -> Backend:
         return Backend.candidates()[0]
 
-    def intermediate_to_asm(self, intermediate: AST) -> Iterator[str]:
+    def intermediate_to_asm(self, intermediate: AST, bounds_checked: bool = False) -> Iterator[str]:
+        if bounds_checked and not self.name.startswith("X86_64"):
+            raise ValueError(f"bounds checking is only implemented for x86_64 backends, not {self.name}")
         match self:
             case Backend.ARM32:
                 yield from generate_arm32(intermediate, thumb=False)
@@ -99,16 +101,16 @@ class Backend(enum.Enum):
             case Backend.X86_32_NASM:
                 yield from generate_x86_32_nasm(intermediate)
             case Backend.X86_64_GAS_ATT:
-                yield from generate_x86_64_att(intermediate, linux_syscalls=False)
+                yield from generate_x86_64_att(intermediate, linux_syscalls=False, bounds_checked=bounds_checked)
             case Backend.X86_64_GAS_INTEL:
-                yield from generate_x86_64_gas_intel(intermediate, linux_syscalls=False)
+                yield from generate_x86_64_gas_intel(intermediate, linux_syscalls=False, bounds_checked=bounds_checked)
             case Backend.X86_64_NASM:
-                yield from generate_x86_64_nasm(intermediate, linux_syscalls=False)
+                yield from generate_x86_64_nasm(intermediate, linux_syscalls=False, bounds_checked=bounds_checked)
             case Backend.X86_64_LINUX_SYSCALLS_GAS_ATT:
-                yield from generate_x86_64_att(intermediate, linux_syscalls=True)
+                yield from generate_x86_64_att(intermediate, linux_syscalls=True, bounds_checked=bounds_checked)
             case Backend.X86_64_LINUX_SYSCALLS_GAS_INTEL:
-                yield from generate_x86_64_gas_intel(intermediate, linux_syscalls=True)
+                yield from generate_x86_64_gas_intel(intermediate, linux_syscalls=True, bounds_checked=bounds_checked)
             case Backend.X86_64_LINUX_SYSCALLS_NASM:
-                yield from generate_x86_64_nasm(intermediate, linux_syscalls=True)
+                yield from generate_x86_64_nasm(intermediate, linux_syscalls=True, bounds_checked=bounds_checked)
             case _:
                 raise RuntimeError(f"unhandled backend {self}, this is a bug")
@@ -1,8 +1,9 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan
 )
 
 def generate_arm32(intermediate: AST, *, thumb: bool) -> Iterator[str]:
@@ -61,7 +62,59 @@ def _generate_body(intermediate: AST, parent_label: str='', *, thumb: bool) -> I
                 yield  '    movlt  r1, 0'
                 yield  '    mov    r0, r4'
                 yield  '    strb   r1, [r0]'
-
+            case Print(data):
+                yield  '    mov    r4, r0'
+                for byte in data:
+                    yield f'    mov    r0, {byte}'
+                    yield  '    bl     putchar'
+                yield  '    mov    r0, r4'
+            case Set(n):
+                yield f'    mov    r1, {n}'
+                yield  '    strb   r1, [r0]'
+            case AddAt(offset, n):
+                operation = 'add' if n > 0 else 'sub'
+                yield f'    ldrb   r1, [r0, #{offset}]'
+                yield f'    {operation}    r1, r1, {abs(n)}'
+                yield f'    strb   r1, [r0, #{offset}]'
+            case SetAt(offset, n):
+                yield f'    mov    r1, {n}'
+                yield f'    strb   r1, [r0, #{offset}]'
+            case OutputAt(offset, n):
+                yield  '    mov    r4, r0'
+                yield f'    ldrb   r0, [r0, #{offset}]'
+                yield from ['    bl     putchar'] * n
+                yield  '    mov    r0, r4'
+            case InputAt(offset, n):
+                yield  '    mov    r4, r0'
+                yield from ['    bl     getchar'] * n
+                # EOF handling: replace negative values with 0.
+                yield  '    cmp    r0, 0'
+                yield  '    ite    ge'
+                yield  '    movge  r1, r0'
+                yield  '    movlt  r1, 0'
+                yield  '    mov    r0, r4'
+                yield f'    strb   r1, [r0, #{offset}]'
+            case MulAdd(offset, factor):
+                yield  '    ldrb   r1, [r0]'
+                if factor not in (1, 255):
+                    yield f'    mov    r2, {factor}'
+                    yield  '    mul    r1, r1, r2'
+                yield f'    ldrb   r2, [r0, #{offset}]'
+                if factor == 255:
+                    yield  '    sub    r2, r2, r1'
+                else:
+                    yield  '    add    r2, r2, r1'
+                yield f'    strb   r2, [r0, #{offset}]'
+            case Scan(1):
+                # p += strlen(p)
+                yield  '    mov    r4, r0'
+                yield  '    bl     strlen'
+                yield  '    add    r0, r0, r4'
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], f'{parent_label}_{loop_id}', thumb=thumb)
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -75,3 +128,22 @@ def _generate_body(intermediate: AST, parent_label: str='', *, thumb: bool) -> I
                 yield f'    b      start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, label, thumb=thumb)
+                yield  '    ldrb   r1, [r0]'
+                yield  '    cmp    r1, 0'  # cbnz can't jump backwards
+                yield f'    bne    start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield  '    ldrb   r1, [r0]'
+                if thumb:
+                    yield f'    cbz    r1, end{label}'
+                else:
+                    yield  '    cmp    r1, 0'
+                    yield f'    beq    end{label}'
+                yield from _generate_body(body, label, thumb=thumb)
+                yield f'end{label}:'
+                loop_id += 1
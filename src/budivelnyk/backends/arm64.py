@@ -1,8 +1,9 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan
 )
 
 def generate_arm64(intermediate: AST) -> Iterator[str]:
@@ -58,6 +59,61 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
                 yield  '    csel   w1, w0, wzr, ge'
                 yield  '    mov    x0, x19'
                 yield  '    strb   w1, [x0]'
+            case Print(data):
+                yield  '    mov    x19, x0'
+                for byte in data:
+                    yield f'    mov    w0, {byte}'
+                    yield  '    bl     putchar'
+                yield  '    mov    x0, x19'
+            case Set(0):
+                yield  '    strb   wzr, [x0]'
+            case Set(n):
+                yield f'    mov    w1, {n}'
+                yield  '    strb   w1, [x0]'
+            case AddAt(offset, n):
+                operation = 'add' if n > 0 else 'sub'
+                yield f'    ldrb   w1, [x0, {offset}]'
+                yield f'    {operation}    w1, w1, {abs(n)}'
+                yield f'    strb   w1, [x0, {offset}]'
+            case SetAt(offset, 0):
+                yield f'    strb   wzr, [x0, {offset}]'
+            case SetAt(offset, n):
+                yield f'    mov    w1, {n}'
+                yield f'    strb   w1, [x0, {offset}]'
+            case OutputAt(offset, n):
+                yield  '    mov    x19, x0'
+                yield f'    ldrb   w0, [x0, {offset}]'
+                yield from ['    bl     putchar'] * n
+                yield  '    mov    x0, x19'
+            case InputAt(offset, n):
+                yield  '    mov    x19, x0'
+                yield from ['    bl     getchar'] * n
+                # EOF handling: replace negative values with 0.
+                yield  '    cmp    w0, 0'
+                yield  '    csel   w1, w0, wzr, ge'
+                yield  '    mov    x0, x19'
+                yield f'    strb   w1, [x0, {offset}]'
+            case MulAdd(offset, factor):
+                yield  '    ldrb   w1, [x0]'
+                if factor not in (1, 255):
+                    yield f'    mov    w2, {factor}'
+                    yield  '    mul    w1, w1, w2'
+                yield f'    ldrb   w2, [x0, {offset}]'
+                if factor == 255:
+                    yield  '    sub    w2, w2, w1'
+                else:
+                    yield  '    add    w2, w2, w1'
+                yield f'    strb   w2, [x0, {offset}]'
+            case Scan(1):
+                # p += strlen(p)
+                yield  '    mov    x19, x0'
+                yield  '    bl     strlen'
+                yield  '    add    x0, x0, x19'
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -67,3 +123,17 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
                 yield f'    b      start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, label)
+                yield  '    ldrb   w1, [x0]'
+                yield f'    cbnz   w1, start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield  '    ldrb   w1, [x0]'
+                yield f'    cbz    w1, end{label}'
+                yield from _generate_body(body, label)
+                yield f'end{label}:'
+                loop_id += 1
@@ -0,0 +1,172 @@
+"""
+Shared libraries for x86_64 Linux, written without an assembler or linker.
+
+The library contains the same machine code as the JIT compiler generates,
+exports it as `run`, and is position-independent. With the C library,
+putchar and getchar are found through GOT entries, which the dynamic
+linker fills in when the library is loaded.
+"""
+
+import struct
+
+from ..intermediate import AST
+from .jit.x86_64 import generate_x86_64, IO, INPUT_STATE_SIZE
+
+
+PAGE_SIZE = 0x1000
+
+# ELF constants, see elf.h:
+ET_DYN = 3
+EM_X86_64 = 62
+PT_LOAD, PT_DYNAMIC, PT_GNU_STACK = 1, 2, 0x6474E551
+PF_X, PF_W, PF_R = 1, 2, 4
+SHT_PROGBITS, SHT_STRTAB, SHT_RELA, SHT_HASH, SHT_DYNAMIC, SHT_NOBITS, SHT_DYNSYM = 1, 3, 4, 5, 6, 8, 11
+SHF_WRITE, SHF_ALLOC, SHF_EXECINSTR = 1, 2, 4
+DT_NULL, DT_NEEDED, DT_HASH, DT_STRTAB, DT_SYMTAB = 0, 1, 4, 5, 6
+DT_RELA, DT_RELASZ, DT_RELAENT, DT_STRSZ, DT_SYMENT = 7, 8, 9, 10, 11
+STB_GLOBAL, STT_FUNC = 1, 2
+R_X86_64_GLOB_DAT = 6
+
+_HEADER_SIZE = 64
+_PROGRAM_HEADER_SIZE = 56
+_SECTION_HEADER_SIZE = 64
+_SYMBOL_SIZE = 24
+_RELA_SIZE = 24
+_PROGRAM_HEADERS = 5
+
+# Index of .text in the section headers:
+_TEXT = 5
+
+
+def _round_up(n: int, multiple: int) -> int:
+    return (n + multiple - 1) // multiple * multiple
+
+
+class _Strings:
+    def __init__(self) -> None:
+        self.data = bytearray(b"\0")
+
+    def add(self, string: str) -> int:
+        offset = len(self.data)
+        self.data += string.encode() + b"\0"
+        return offset
+
+
+def generate_elf_x86_64(intermediate: AST, linux_syscalls: bool, bounds_checked: bool = False) -> bytes:
+    machine_code = generate_x86_64(intermediate, IO.SYSCALLS if linux_syscalls else IO.LIBC,
+                                   position_independent=True, bounds_checked=bounds_checked)
+    imports = [] if linux_syscalls else ["putchar", "getchar"]
+
+    strings = _Strings()
+    run_name = strings.add("run")
+    import_names = [strings.add(name) for name in imports]
+    libc = None if linux_syscalls else strings.add("libc.so.6")
+
+    # Read-only segment: headers, hash table, symbols, strings, relocations.
+    hash_offset = _HEADER_SIZE + _PROGRAM_HEADERS * _PROGRAM_HEADER_SIZE
+    symbol_count = 2 + len(imports)
+    hash_size = 4 * (2 + 1 + symbol_count)
+    symbols_offset = _round_up(hash_offset + hash_size, 8)
+    strings_offset = symbols_offset + symbol_count * _SYMBOL_SIZE
+    rela_offset = _round_up(strings_offset + len(strings.data), 8)
+    rela_size = len(imports) * _RELA_SIZE
+    read_only_end = rela_offset + rela_size
+
+    # Executable segment:
+    text_offset = _round_up(read_only_end, PAGE_SIZE)
+    text_size = len(machine_code.code)
+
+    # Writable segment: dynamic section, GOT, and the input state in .bss.
+    dynamic_offset = _round_up(text_offset + text_size, PAGE_SIZE)
+    dynamic = [(DT_HASH, hash_offset), (DT_SYMTAB, symbols_offset), (DT_SYMENT, _SYMBOL_SIZE),
+               (DT_STRTAB, strings_offset), (DT_STRSZ, len(strings.data))]
+    if libc is not None:
+        dynamic.insert(0, (DT_NEEDED, libc))
+        dynamic += [(DT_RELA, rela_offset), (DT_RELASZ, rela_size), (DT_RELAENT, _RELA_SIZE)]
+    dynamic.append((DT_NULL, 0))
+    dynamic_size = len(dynamic) * 16
+    got_offset = dynamic_offset + dynamic_size
+    got_size = 8 * len(imports)
+    bss_address = _round_up(got_offset + got_size, 16)
+    bss_size = INPUT_STATE_SIZE if linux_syscalls else 0
+    file_end = got_offset + got_size
+
+    # Addresses are the same as file offsets.
+    code = machine_code.link({
+        "input_state": bss_address,
+        "putchar": got_offset,
+        "getchar": got_offset + 8,
+    }, base=text_offset)
+
+    image = bytearray(file_end)
+
+    symbols = bytearray(_SYMBOL_SIZE)  # symbol 0 is always empty
+    symbols += struct.pack("<IBBHQQ", run_name, STB_GLOBAL << 4 | STT_FUNC, 0, _TEXT, text_offset, text_size)
+    for name in import_names:
+        symbols += struct.pack("<IBBHQQ", name, STB_GLOBAL << 4 | STT_FUNC, 0, 0, 0, 0)
+    image[symbols_offset:strings_offset] = symbols
+    image[strings_offset:strings_offset + len(strings.data)] = strings.data
+
+    # One bucket, and every symbol is chained to the previous one.
+    image[hash_offset:hash_offset + hash_size] = struct.pack(f"<{3 + symbol_count}I", 1, symbol_count,
+                                                             symbol_count - 1, 0, *range(symbol_count - 1))
+
+    for i in range(len(imports)):
+        image[rela_offset + i * _RELA_SIZE:rela_offset + (i + 1) * _RELA_SIZE] = struct.pack(
+            "<QQq", got_offset + 8 * i, (2 + i) << 32 | R_X86_64_GLOB_DAT, 0)
+
+    image[text_offset:text_offset + text_size] = code
+    image[dynamic_offset:got_offset] = b"".join(struct.pack("<qQ", tag, value) for tag, value in dynamic)
+
+    section_names = _Strings()
+    sections = [
+        # name, type, flags, address, size, link, info, alignment, entry size
+        ("", 0, 0, 0, 0, 0, 0, 0, 0),
+        (".hash", SHT_HASH, SHF_ALLOC, hash_offset, hash_size, 2, 0, 8, 4),
+        (".dynsym", SHT_DYNSYM, SHF_ALLOC, symbols_offset, symbol_count * _SYMBOL_SIZE, 3, 1, 8, _SYMBOL_SIZE),
+        (".dynstr", SHT_STRTAB, SHF_ALLOC, strings_offset, len(strings.data), 0, 0, 1, 0),
+        (".rela.dyn", SHT_RELA, SHF_ALLOC, rela_offset, rela_size, 2, 0, 8, _RELA_SIZE),
+        (".text", SHT_PROGBITS, SHF_ALLOC|SHF_EXECINSTR, text_offset, text_size, 0, 0, 16, 0),
+        (".dynamic", SHT_DYNAMIC, SHF_ALLOC|SHF_WRITE, dynamic_offset, dynamic_size, 3, 0, 8, 16),
+        (".got", SHT_PROGBITS, SHF_ALLOC|SHF_WRITE, got_offset, got_size, 0, 0, 8, 8),
+        (".bss", SHT_NOBITS, SHF_ALLOC|SHF_WRITE, bss_address, bss_size, 0, 0, 16, 0),
+        (".shstrtab", SHT_STRTAB, 0, 0, 0, 0, 0, 1, 0),
+    ]
+    names = [section_names.add(name) if name else 0 for name, *_ in sections]
+    section_names_offset = len(image)
+    image += section_names.data
+    section_headers_offset = _round_up(len(image), 8)
+    image += bytes(section_headers_offset - len(image))
+    for name, (_, type_, flags, address, size, link, info, alignment, entry_size) in zip(names, sections):
+        offset = address
+        if type_ == SHT_NOBITS:
+            offset = file_end
+        if type_ == SHT_STRTAB and not flags:  # .shstrtab isn't loaded
+            offset, size = section_names_offset, len(section_names.data)
+        image += struct.pack("<IIQQQQIIQQ", name, type_, flags, address, offset, size,
+                             link, info, alignment, entry_size)
+
+    program_headers = b"".join([
+        # type, flags, offset, address, physical address, file size, memory size, alignment
+        struct.pack("<IIQQQQQQ", PT_LOAD, PF_R, 0, 0, 0, read_only_end, read_only_end, PAGE_SIZE),
+        struct.pack("<IIQQQQQQ", PT_LOAD, PF_R|PF_X, text_offset, text_offset, text_offset,
+                    text_size, text_size, PAGE_SIZE),
+        struct.pack("<IIQQQQQQ", PT_LOAD, PF_R|PF_W, dynamic_offset, dynamic_offset, dynamic_offset,
+                    file_end - dynamic_offset, bss_address + bss_size - dynamic_offset, PAGE_SIZE),
+        struct.pack("<IIQQQQQQ", PT_DYNAMIC, PF_R|PF_W, dynamic_offset, dynamic_offset, dynamic_offset,
+                    dynamic_size, dynamic_size, 8),
+        struct.pack("<IIQQQQQQ", PT_GNU_STACK, PF_R|PF_W, 0, 0, 0, 0, 0, 16),
+    ])
+    header = struct.pack(
+        "<4sBBBBB7sHHIQQQIHHHHHH",
+        b"\x7fELF", 2, 1, 1, 0, 0, bytes(7),    # 64-bit, little endian, version 1, System V ABI
+        ET_DYN, EM_X86_64, 1,
+        0,                                      # entry point
+        _HEADER_SIZE,                           # program headers
+        section_headers_offset,
+        0,                                      # flags
+        _HEADER_SIZE, _PROGRAM_HEADER_SIZE, _PROGRAM_HEADERS,
+        _SECTION_HEADER_SIZE, len(sections), len(sections) - 1,
+    )
+    image[:hash_offset] = header + program_headers
+    return bytes(image)
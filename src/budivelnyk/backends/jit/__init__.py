@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-import mmap
+import sys
 import ctypes
+import weakref
+from contextlib import nullcontext
 import platform
 from enum import Enum, auto
-from typing import Callable
+from typing import Any, TypeVar
 
 from ...tape import Tape
 from ...intermediate import AST
-from .x86_64 import generate_x86_64
+from ...disk_cache import DiskCache, intermediate_hash, compiler_version
+from .x86_64 import generate_x86_64, IO, INPUT_STATE_SIZE, MEMORY_STATE_SIZE
+from .assembler import MachineCode
+from .arena import arena
+from .io import c_library
+from ...buffers import BufferAddress, call_with_tape, call_with_tape_bounds
 
 
 jit_implemented: bool = platform.system() == "Linux" and platform.machine() == "x86_64"
@@ -18,6 +25,7 @@ jit_implemented: bool = platform.system() == "Linux" and platform.machine() == "
 class UseJIT(Enum):
     LIBC = auto()
     SYSCALLS = auto()
+    MEMORY = auto()
     NO = auto()
 
     @staticmethod
@@ -25,30 +33,158 @@ class UseJIT(Enum):
         return UseJIT.SYSCALLS if jit_implemented else UseJIT.NO
 
 
-def _intermediate_to_machine_code(intermediate: AST, linux_syscalls: bool) -> bytes:
-    if jit_implemented:
-        return generate_x86_64(intermediate, linux_syscalls)
-    else:
+def _intermediate_to_machine_code(intermediate: AST, io: IO, disk_cache: DiskCache|None,
+                                  bounds_checked: bool) -> MachineCode:
+    if not jit_implemented:
         raise NotImplementedError("JIT is only implemented for Linux on x86_64")
+    if disk_cache is None:
+        return generate_x86_64(intermediate, io, bounds_checked=bounds_checked)
+
+    mode = io.name.lower() + ("_bounds_checked" if bounds_checked else "")
+    key = DiskCache.key("jit", "x86_64", mode, compiler_version(), intermediate_hash(intermediate))
+    cached = disk_cache.get(key)
+    if cached is not None:
+        return MachineCode.from_bytes(cached)
+    machine_code = generate_x86_64(intermediate, io, bounds_checked=bounds_checked)
+    disk_cache.put(key, machine_code.to_bytes())
+    return machine_code
+
+
+C = TypeVar("C", bound="_JITCode")
+
+
+class _JITCode:
+    """ Machine code in memory, released when it's closed or garbage collected, whichever happens first. """
+
+    def __init__(self, code: bytes, function_type: Any):
+        allocation = arena.allocate(code)
+        self._function = function_type(allocation.address)
+        self.address: int = allocation.address
+        self.size: int = allocation.size
+        self._finalizer = weakref.finalize(self, arena.release, allocation)
+
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def __enter__(self: C) -> C:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
 
 
-def _machine_code_to_function(code: bytes) -> Callable[[Tape], None]:
-    size = len(code)
-    memory = _executable_memory(size)
-    memory.write(code)
-    array_t = ctypes.c_byte * size
-    array_view = array_t.from_buffer(memory)
-    return ctypes.cast(array_view, ctypes.CFUNCTYPE(None))
+class JITFunction(_JITCode):
+    """
+    Function compiled to machine code in memory, which does I/O with system
+    calls or the C library. Bounds-checked functions raise IndexError when
+    the program would leave the tape.
+    """
 
+    def __init__(self, code: bytes, input_state: Any = None, uses_libc: bool = False, bounds_checked: bool = False):
+        # Without argtypes, ctypes passes arrays fastest, but it would pass
+        # ints as 32-bit, so addresses are passed through another prototype.
+        if bounds_checked:
+            super().__init__(code, ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t))
+        else:
+            super().__init__(code, ctypes.CFUNCTYPE(None))
+        self._address_function = ctypes.CFUNCTYPE(None, ctypes.c_void_p)(self.address)
+        self._uses_libc = uses_libc
+        self._bounds_checked = bounds_checked
+        self._input_state = input_state  # must live as long as the code
 
-def intermediate_to_function(intermediate: AST, *, linux_syscalls: bool) -> Callable[[Tape], None]:
-    code: bytes = _intermediate_to_machine_code(intermediate, linux_syscalls)
-    return _machine_code_to_function(code)
+    def __call__(self, tape: Tape|int|object) -> None:
+        """ `tape` is a ctypes array, any other writable buffer, or an address if it isn't bounds-checked. """
+        if not self._finalizer.alive:
+            raise ValueError("call of a closed function")
+        if self._uses_libc:
+            # Output appears in the same order as if it were printed from Python.
+            sys.stdout.flush()
+            try:
+                self._call(tape)
+            finally:
+                c_library().flush()
+        elif isinstance(tape, ctypes.Array) and not self._bounds_checked:  # the most common case first
+            self._function(tape)
+        else:
+            self._call(tape)
+
+    def _call(self, tape: Tape|int|object) -> None:
+        if self._bounds_checked:
+            call_with_tape_bounds(self._function, tape)
+        else:
+            call_with_tape(self._function, self._address_function, tape)
+
+
+class MemoryIOFunction(_JITCode):
+    """
+    Function compiled to machine code in memory, which reads its input from
+    a buffer and writes its output to another one.
+    """
+
+    def __init__(self, code: bytes, bounds_checked: bool = False):
+        if bounds_checked:
+            function_type = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p)
+        else:
+            function_type = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_void_p)
+        super().__init__(code, function_type)
+        self._bounds_checked = bounds_checked
+
+    def __call__(self, tape: Tape|int|object, input: object = b"", output: object = None) -> tuple[int, int]:
+        """
+        `tape` is a ctypes array, any other writable buffer, or an address.
+        `input` and `output` are objects that support the buffer protocol,
+        e.g. bytes or a memoryview of an mmap for input and bytearray for
+        output. Returns the numbers of bytes consumed from the input and
+        produced as output. Reading past the end of the input gives 0.
+        Output that doesn't fit is counted but not stored, so it was
+        truncated if the second number is larger than the output.
+
+        Bounds-checked functions raise IndexError when the program would
+        leave the tape, and the tape can't be an address then.
+        """
+        if not self._finalizer.alive:
+            raise ValueError("call of a closed function")
+        state = (ctypes.c_uint64 * (MEMORY_STATE_SIZE // 8))()
+        with _buffer_or_nothing(input, False) as (input_address, input_size), \
+             _buffer_or_nothing(output, True) as (output_address, output_size):
+            state[:] = [input_address, input_address + input_size, output_address, output_address + output_size]
+            if self._bounds_checked:
+                call_with_tape_bounds(self._function, tape, state)
+            elif isinstance(tape, ctypes.Array | bytes | int):
+                self._function(tape, state)
+            else:
+                with BufferAddress(tape, writable=True) as (tape_address, _):
+                    self._function(tape_address, state)
+        return state[0] - input_address, state[2] - output_address
+
+
+def _buffer_or_nothing(data: object, writable: bool) -> BufferAddress|nullcontext[tuple[int, int]]:
+    # Most calls don't have both input and output.
+    if data is None or type(data) is bytes and not data:
+        return nullcontext((0, 0))
+    return BufferAddress(data, writable)
+
+
+def intermediate_to_function(intermediate: AST, *, linux_syscalls: bool,
+                             disk_cache: DiskCache|None = None, bounds_checked: bool = False) -> JITFunction:
+    io = IO.SYSCALLS if linux_syscalls else IO.LIBC
+    machine_code = _intermediate_to_machine_code(intermediate, io, disk_cache, bounds_checked)
+    # Input read ahead by one call is kept for the next one, so it's stored
+    # outside of the generated code's stack frame.
+    input_state = ctypes.create_string_buffer(INPUT_STATE_SIZE if linux_syscalls else 0)
+    if linux_syscalls:
+        code = machine_code.link({"input_state": ctypes.addressof(input_state)})
+    else:
+        libc = c_library()
+        code = machine_code.link({"putchar": libc.putchar, "getchar": libc.getchar})
+    return JITFunction(code, input_state, uses_libc=not linux_syscalls, bounds_checked=bounds_checked)
 
 
-# TODO: error handling, especially on platforms that aren't Linux, and tests
-# TODO: this is wasteful if we allocate lots of functions all smaller than os.sysconf("SC_PAGESIZE")
-def _executable_memory(size: int) -> mmap.mmap:
-    permissions = mmap.PROT_READ|mmap.PROT_WRITE|mmap.PROT_EXEC
-    flags = mmap.MAP_PRIVATE|mmap.MAP_ANON
-    return mmap.mmap(-1, size, flags, permissions)
+def intermediate_to_memory_function(intermediate: AST, *, disk_cache: DiskCache|None = None,
+                                    bounds_checked: bool = False) -> MemoryIOFunction:
+    machine_code = _intermediate_to_machine_code(intermediate, IO.MEMORY, disk_cache, bounds_checked)
+    return MemoryIOFunction(machine_code.link({}), bounds_checked)
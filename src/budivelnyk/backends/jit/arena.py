@@ -0,0 +1,233 @@
+"""
+Executable memory for JIT-compiled functions.
+
+No page is ever writable and executable at the same time. Code is written
+through a writable mapping of a memory file and executed through a second,
+read-only executable mapping of the same file, so many functions can share
+pages and new ones can be added while others run. If the system doesn't
+allow executable mappings of memory files, every function gets its own
+pages, which are made executable with mprotect after the code is written.
+
+A child process created by fork would share the memory files with its
+parent, so both would place new code in the same free space. The child
+gets private copies of them instead, at the same addresses, so the code
+it inherited keeps working.
+"""
+
+from __future__ import annotations
+
+import os
+import mmap
+import ctypes
+import weakref
+import threading
+from dataclasses import dataclass
+
+
+PAGE_SIZE = mmap.PAGESIZE
+CHUNK_SIZE = 16 * PAGE_SIZE
+ALIGNMENT = 16
+
+
+if os.name == "posix":
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _libc.mmap.restype = ctypes.c_void_p
+    _libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+    _libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    _libc.mprotect.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+
+_MAP_FAILED = ctypes.c_void_p(-1).value
+_MAP_FIXED = 0x10  # not in the mmap module
+
+
+def _round_up(n: int, multiple: int) -> int:
+    return (n + multiple - 1) // multiple * multiple
+
+
+def _check(result: int|None, failed: int|None, function: str) -> None:
+    if result == failed:
+        errno = ctypes.get_errno()
+        raise OSError(errno, f"{function} failed: {os.strerror(errno)}")
+
+
+class _Chunk:
+    """ Pages mapped twice: once for writing, once for execution. """
+
+    def __init__(self, size: int) -> None:
+        self.writable, address = self._map(None, size)
+        self.address: int = address
+        self.size = size
+        self.top = 0                                # everything above is free
+        self.holes: list[tuple[int, int]] = []      # (offset, size) of freed blocks below top
+        self.live = 0                               # number of allocations
+
+    @staticmethod
+    def _map(address: int|None, size: int, contents: bytes = b"") -> tuple[mmap.mmap, int]:
+        """ Maps a new memory file twice, for execution at `address` if it's given. """
+        fd = os.memfd_create("budivelnyk-jit", os.MFD_CLOEXEC)
+        try:
+            os.ftruncate(fd, size)
+            writable = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ|mmap.PROT_WRITE)
+            writable[:len(contents)] = contents
+            flags = mmap.MAP_SHARED if address is None else mmap.MAP_SHARED|_MAP_FIXED
+            executable = _libc.mmap(address, size, mmap.PROT_READ|mmap.PROT_EXEC, flags, fd, 0)
+            if executable == _MAP_FAILED:
+                writable.close()
+            _check(executable, _MAP_FAILED, "mmap")
+        finally:
+            os.close(fd)
+        assert executable is not None
+        return writable, executable
+
+    def make_private(self) -> None:
+        """ Replaces the memory file with a copy, which isn't shared with the parent process after fork. """
+        writable, _ = self._map(self.address, self.size, self.writable[:])
+        self.writable.close()
+        self.writable = writable
+
+    def allocate(self, size: int) -> int|None:
+        for i, (offset, hole_size) in enumerate(self.holes):
+            if hole_size >= size:
+                if hole_size == size:
+                    del self.holes[i]
+                else:
+                    self.holes[i] = (offset + size, hole_size - size)
+                self.live += 1
+                return offset
+        if self.top + size <= self.size:
+            offset = self.top
+            self.top += size
+            self.live += 1
+            return offset
+        return None
+
+    def release(self, offset: int, size: int) -> None:
+        self.live -= 1
+        if self.live == 0:
+            self.top = 0
+            self.holes = []
+            return
+        self.holes.append((offset, size))
+        self.holes.sort()
+        merged: list[tuple[int, int]] = []
+        for hole in self.holes:
+            if merged and merged[-1][0] + merged[-1][1] == hole[0]:
+                merged[-1] = (merged[-1][0], merged[-1][1] + hole[1])
+            else:
+                merged.append(hole)
+        if merged and merged[-1][0] + merged[-1][1] == self.top:
+            self.top = merged.pop()[0]
+        self.holes = merged
+
+    def write(self, offset: int, code: bytes) -> None:
+        self.writable[offset:offset + len(code)] = code
+
+    def unmap(self) -> None:
+        self.writable.close()
+        _check(_libc.munmap(self.address, self.size), -1, "munmap")
+
+
+@dataclass
+class Allocation:
+    address: int
+    size: int
+    chunk: _Chunk|None    # None if the code has its own pages
+    offset: int = 0
+
+
+class Arena:
+    """ Thread-safe allocator of executable memory. """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._chunks: list[_Chunk] = []
+        self._shared_pages: bool = hasattr(os, "memfd_create")
+        _arenas.add(self)
+
+    def allocate(self, code: bytes) -> Allocation:
+        size = _round_up(max(len(code), 1), ALIGNMENT)
+        with self._lock:
+            if self._shared_pages:
+                try:
+                    return self._allocate_in_chunk(code, size)
+                except OSError:
+                    self._shared_pages = False
+            return self._allocate_pages(code, size)
+
+    def release(self, allocation: Allocation) -> None:
+        with self._lock:
+            chunk = allocation.chunk
+            if chunk is None:
+                _check(_libc.munmap(allocation.address, allocation.size), -1, "munmap")
+                return
+            chunk.release(allocation.offset, allocation.size)
+            # One empty chunk is kept for the next function.
+            if chunk.live == 0 and len(self._chunks) > 1:
+                self._chunks.remove(chunk)
+                chunk.unmap()
+
+    def _after_fork_in_child(self) -> None:
+        self._lock = threading.Lock()
+        try:
+            for chunk in self._chunks:
+                chunk.make_private()
+        except OSError:
+            # Don't add code to pages that the parent may use as well.
+            self._shared_pages = False
+
+    def _allocate_in_chunk(self, code: bytes, size: int) -> Allocation:
+        for chunk in self._chunks:
+            offset = chunk.allocate(size)
+            if offset is not None:
+                break
+        else:
+            chunk = _Chunk(max(CHUNK_SIZE, _round_up(size, PAGE_SIZE)))
+            self._chunks.append(chunk)
+            offset = chunk.allocate(size)
+            assert offset is not None
+        chunk.write(offset, code)
+        return Allocation(chunk.address + offset, size, chunk, offset)
+
+    def _allocate_pages(self, code: bytes, size: int) -> Allocation:
+        size = _round_up(size, PAGE_SIZE)
+        address = _libc.mmap(None, size, mmap.PROT_READ|mmap.PROT_WRITE,
+                             mmap.MAP_PRIVATE|mmap.MAP_ANON, -1, 0)
+        _check(address, _MAP_FAILED, "mmap")
+        assert address is not None
+        ctypes.memmove(address, code, len(code))
+        if _libc.mprotect(address, size, mmap.PROT_READ|mmap.PROT_EXEC) == -1:
+            errno = ctypes.get_errno()
+            _libc.munmap(address, size)
+            raise OSError(errno, f"mprotect failed: {os.strerror(errno)}")
+        return Allocation(address, size, None)
+
+
+_arenas: weakref.WeakSet[Arena] = weakref.WeakSet()
+_forking: list[Arena] = []
+
+
+def _before_fork() -> None:
+    # No chunk is copied while code is written to it.
+    _forking[:] = _arenas
+    for arena in _forking:
+        arena._lock.acquire()
+
+
+def _after_fork_in_parent() -> None:
+    for arena in _forking:
+        arena._lock.release()
+    _forking.clear()
+
+
+def _after_fork_in_child() -> None:
+    for arena in _forking:
+        arena._after_fork_in_child()
+    _forking.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent,
+                        after_in_child=_after_fork_in_child)
+
+
+arena = Arena()
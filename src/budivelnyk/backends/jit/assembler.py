@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from .hex import b
+
+
+# Short (rel8) and near (rel32) forms of jumps:
+_JUMPS: dict[str, tuple[bytes, bytes]] = {
+    "jmp": (b("EB"), b("E9")),
+    "je":  (b("74"), b("0F 84")),
+    "jne": (b("75"), b("0F 85")),
+    "jb":  (b("72"), b("0F 82")),
+    "jae": (b("73"), b("0F 83")),
+    "jbe": (b("76"), b("0F 86")),
+    "jle": (b("7E"), b("0F 8E")),
+}
+_JUMPS["jz"] = _JUMPS["je"]
+_JUMPS["jnz"] = _JUMPS["jne"]
+
+
+class Relocation(NamedTuple):
+    offset: int
+    symbol: str
+    relative: bool = False  # 32-bit displacement from the end of the field if True, else 64-bit address
+
+
+@dataclass(frozen=True)
+class MachineCode:
+    """ Code with addresses of symbols that are only known when it's loaded. """
+    code: bytes
+    relocations: tuple[Relocation, ...] = ()
+
+    def link(self, symbols: dict[str, int], base: int = 0) -> bytes:
+        """ `base` is the address of the code, only needed for relative relocations. """
+        code = bytearray(self.code)
+        for offset, symbol, relative in self.relocations:
+            if relative:
+                displacement = symbols[symbol] - (base + offset + 4)
+                code[offset:offset + 4] = displacement.to_bytes(4, "little", signed=True)
+            else:
+                code[offset:offset + 8] = symbols[symbol].to_bytes(8, "little")
+        return bytes(code)
+
+    def to_bytes(self) -> bytes:
+        header = bytearray(len(self.relocations).to_bytes(4, "little"))
+        for offset, symbol, relative in self.relocations:
+            name = symbol.encode()
+            header += offset.to_bytes(4, "little") + bytes([relative, len(name)]) + name
+        return bytes(header) + self.code
+
+    @staticmethod
+    def from_bytes(data: bytes) -> MachineCode:
+        count = int.from_bytes(data[:4], "little")
+        position = 4
+        relocations = []
+        for _ in range(count):
+            offset = int.from_bytes(data[position:position + 4], "little")
+            relative, length = data[position + 4], data[position + 5]
+            symbol = data[position + 6:position + 6 + length].decode()
+            relocations.append(Relocation(offset, symbol, bool(relative)))
+            position += 6 + length
+        return MachineCode(data[position:], tuple(relocations))
+
+
+@dataclass
+class _Symbol:
+    """ Instruction ending with the address of a symbol or a displacement to it. """
+    opcode: bytes
+    symbol: str
+    relative: bool
+
+    def size(self) -> int:
+        return len(self.opcode) + (4 if self.relative else 8)
+
+
+@dataclass
+class _Reference:
+    """ Instruction ending with a displacement from its end to a label. """
+    label: str
+    near: bytes
+    short: bytes|None = None  # None if there is no rel8 form, e.g. for call
+
+    def size(self) -> int:
+        if self.short is not None:
+            return len(self.short) + 1
+        return len(self.near) + 4
+
+
+class Assembler:
+    """
+    Collects machine code and references to labels, which may be defined later.
+
+    Jumps are first assumed to be short. When the code is assembled, the ones
+    whose targets turn out to be too far away are made near, which can only
+    make other jumps longer, so we repeat until nothing changes. Every step
+    takes time linear in the size of the code.
+    """
+
+    def __init__(self) -> None:
+        self._pieces: list[bytearray|_Reference|_Symbol] = [bytearray()]
+        self._labels: dict[str, int] = {}  # label -> index of the piece that starts there
+
+    def emit(self, *code: bytes) -> None:
+        last = self._pieces[-1]
+        if not isinstance(last, bytearray):
+            last = bytearray()
+            self._pieces.append(last)
+        for part in code:
+            last += part
+
+    def label(self, name: str) -> None:
+        if name in self._labels:
+            raise ValueError(f"label {name} is already defined")
+        self._labels[name] = len(self._pieces)
+        self._pieces.append(bytearray())
+
+    def jump(self, mnemonic: str, label: str) -> None:
+        short, near = _JUMPS[mnemonic]
+        self._pieces.append(_Reference(label, near, short))
+
+    def call(self, label: str) -> None:
+        self.relative(b("E8"), label)
+
+    def relative(self, opcode: bytes, label: str) -> None:
+        """ `opcode` followed by a 32-bit displacement to `label`, e.g. for lea rsi, [rip+label]. """
+        self._pieces.append(_Reference(label, opcode))
+
+    def absolute(self, opcode: bytes, symbol: str) -> None:
+        """ `opcode` followed by the address of `symbol`, e.g. for movabs r13, symbol. """
+        self._pieces.append(_Symbol(opcode, symbol, relative=False))
+
+    def rip_relative(self, opcode: bytes, symbol: str) -> None:
+        """ `opcode` followed by a 32-bit displacement to `symbol`, e.g. for lea r13, [rip+symbol]. """
+        self._pieces.append(_Symbol(opcode, symbol, relative=True))
+
+    def assemble(self) -> MachineCode:
+        for reference in self._references():
+            if reference.label not in self._labels:
+                raise ValueError(f"label {reference.label} is not defined")
+
+        while True:
+            offsets = self._offsets()
+            relaxed = False
+            for i, piece in enumerate(self._pieces):
+                if isinstance(piece, _Reference) and piece.short is not None:
+                    if not -0x80 <= self._displacement(piece, offsets[i], offsets) < 0x80:
+                        piece.short = None
+                        relaxed = True
+            if not relaxed:
+                break
+
+        code = bytearray()
+        relocations = []
+        for i, piece in enumerate(self._pieces):
+            if isinstance(piece, bytearray):
+                code += piece
+                continue
+            if isinstance(piece, _Symbol):
+                code += piece.opcode
+                relocations.append(Relocation(len(code), piece.symbol, piece.relative))
+                code += bytes(piece.size() - len(piece.opcode))
+                continue
+            displacement = self._displacement(piece, offsets[i], offsets)
+            if piece.short is not None:
+                code += piece.short + displacement.to_bytes(1, "little", signed=True)
+            else:
+                code += piece.near + displacement.to_bytes(4, "little", signed=True)
+        return MachineCode(bytes(code), tuple(relocations))
+
+    def _references(self) -> list[_Reference]:
+        return [piece for piece in self._pieces if isinstance(piece, _Reference)]
+
+    def _offsets(self) -> list[int]:
+        offsets = []
+        offset = 0
+        for piece in self._pieces:
+            offsets.append(offset)
+            offset += len(piece) if isinstance(piece, bytearray) else piece.size()
+        offsets.append(offset)  # for a label at the very end
+        return offsets
+
+    def _displacement(self, reference: _Reference, offset: int, offsets: list[int]) -> int:
+        return offsets[self._labels[reference.label]] - (offset + reference.size())
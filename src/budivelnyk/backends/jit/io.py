@@ -1,24 +1,26 @@
-import sys
 import ctypes
+from functools import cache
 
 
-def _reinterpret_pointer(pointer) -> bytes:  # type: ignore
-    pointer_size = ctypes.sizeof(pointer)
-    array = (ctypes.c_ubyte * pointer_size)()
-    ctypes.memmove(array, ctypes.byref(pointer), pointer_size)
-    return bytes(array)
+class _CLibrary:
+    """ Functions from the C library that Python itself uses. """
 
+    def __init__(self) -> None:
+        self._library = ctypes.CDLL(None)
+        self.putchar: int = self._address("putchar")
+        self.getchar: int = self._address("getchar")
 
-@ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int)  # type: ignore
-def _write_char(i: int) -> int:
-    print(chr(i), end="", flush=True)
-    return i
+    def _address(self, name: str) -> int:
+        address = ctypes.cast(getattr(self._library, name), ctypes.c_void_p).value
+        assert address is not None
+        return address
 
+    def flush(self) -> None:
+        # Output written with putchar stays in the C library's buffer until
+        # it's flushed, which would otherwise only happen at exit.
+        self._library.fflush(None)
 
-@ctypes.CFUNCTYPE(ctypes.c_int)  # type: ignore
-def _read_char() -> int:
-    return ord(sys.stdin.read(1))
 
-
-encoded_write_char: bytes = _reinterpret_pointer(_write_char)
-encoded_read_char: bytes = _reinterpret_pointer(_read_char)
+@cache
+def c_library() -> _CLibrary:
+    return _CLibrary()
@@ -1,110 +1,521 @@
-from typing import Iterator
+from enum import Enum, auto
 
 from ...intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan, CheckBounds
 )
+from ...bounds import insert_bounds_checks
 
-from .io import encoded_read_char, encoded_write_char
 from .hex import b
+from .assembler import Assembler, MachineCode
+from ..x86_64_intel import BUFFER_SIZE
 
 
-def generate_x86_64(intermediate: AST, linux_syscalls: bool) -> bytes:
+INPUT_STATE_SIZE = 16 + BUFFER_SIZE
+MEMORY_STATE_SIZE = 32
+
+
+class IO(Enum):
+    SYSCALLS = auto()
+    LIBC = auto()
+    MEMORY = auto()
+
+
+def generate_x86_64(intermediate: AST, io: IO, position_independent: bool = False,
+                    bounds_checked: bool = False) -> MachineCode:
+    """
+    With Linux system calls, the code refers to `input_state`, which must be
+    linked to INPUT_STATE_SIZE bytes of zeroed memory that live as long as the
+    code. With the C library, it refers to `putchar` and `getchar`.
+
+    With in-memory I/O, the code takes a second argument, a pointer to
+    MEMORY_STATE_SIZE bytes: the current position and the end of the input,
+    then the current position and the end of the output. The positions are
+    advanced as bytes are read and written. Output past the end is counted
+    but not stored, and reading past the end of the input gives 0.
+
+    Position-independent code refers to the same symbols relative to rip,
+    and `putchar` and `getchar` are the addresses of pointers to the
+    functions, e.g. their GOT entries.
+
+    Bounds-checked code takes the size of the tape as the second argument,
+    before the memory state, and returns an int: 0, or 1 if the program
+    stopped because it would have left the tape.
+    """
     # TODO:
     # I need JIT tests with ., and the best way to achieve it is to unify test_jit and test_*_to_shared as test_*_to_function.
     # Separately, there should be (less detailed) tests for the other four Bf methods.
 
-    return b"".join([*_generate_prologue(linux_syscalls),
-                     *_generate_body(intermediate, linux_syscalls),
-                     *_generate_epilogue(linux_syscalls)])
+    asm = Assembler()
+    if bounds_checked:
+        intermediate = insert_bounds_checks(intermediate)
+        asm.emit(
+            b("41 56"),                                 # push r14
+            b("41 57"),                                 # push r15
+            b("49 89 FE"),                              # mov r14, rdi
+            b("4C 8D 3C 37"),                           # lea r15, [rdi+rsi]
+        )
+    _generate_prologue(asm, io, position_independent, state=RDX if bounds_checked else RSI)
+    _generate_body(asm, intermediate, io)
+    if bounds_checked:
+        asm.emit(b("45 31 F6"))                         # xor r14d, r14d
+        asm.label("checked_return")
+    _generate_epilogue(asm, io, bounds_checked)
+    return asm.assemble()
+
+
+def _generate_prologue(asm: Assembler, io: IO, position_independent: bool, state: int) -> None:
+    if io is IO.SYSCALLS:
+        asm.emit(
+            b("53"),                                    # push rbx
+            b("41 54"),                                 # push r12
+            b("41 55"),                                 # push r13
+            _immediate("48", "EC", BUFFER_SIZE),        # sub rsp, BUFFER_SIZE
+            b("48 89 E3"),                              # mov rbx, rsp
+            b("45 31 E4"),                              # xor r12d, r12d
+        )
+        if position_independent:
+            asm.rip_relative(b("4C 8D 2D"), "input_state")  # lea r13, [rip+input_state]
+        else:
+            asm.absolute(b("49 BD"), "input_state")     # movabs r13, input_state
+    elif io is IO.MEMORY:
+        asm.emit(
+            b("41 55"),                                 # push r13
+            b("49 89", 0xC5 | state << 3),              # mov r13, rsi (or rdx)
+        )
+    else:
+        asm.emit(
+            b("41 54"),                                 # push r12
+            b("41 55"),                                 # push r13
+        )
+        if position_independent:
+            asm.rip_relative(b("4C 8B 25"), "putchar")  # mov r12, [rip+putchar]
+            asm.rip_relative(b("4C 8B 2D"), "getchar")  # mov r13, [rip+getchar]
+        else:
+            asm.absolute(b("49 BC"), "putchar")         # movabs r12, putchar
+            asm.absolute(b("49 BD"), "getchar")         # movabs r13, getchar
+
+
+def _generate_epilogue(asm: Assembler, io: IO, bounds_checked: bool) -> None:
+    if io is IO.SYSCALLS:
+        asm.call("flush_output")
+        asm.emit(
+            _immediate("48", "C4", BUFFER_SIZE),        # add rsp, BUFFER_SIZE
+            b("41 5D"),                                 # pop r13
+            b("41 5C"),                                 # pop r12
+            b("5B"),                                    # pop rbx
+        )
+    elif io is IO.MEMORY:
+        asm.emit(b("41 5D"))                            # pop r13
+    else:
+        asm.emit(
+            b("41 5D"),                                 # pop r13
+            b("41 5C"),                                 # pop r12
+        )
+    if bounds_checked:
+        asm.emit(
+            b("44 89 F0"),                              # mov eax, r14d
+            b("41 5F"),                                 # pop r15
+            b("41 5E"),                                 # pop r14
+        )
+    asm.emit(b("C3"))                                   # ret
+    if bounds_checked:
+        # Output that was produced before is kept.
+        asm.label("out_of_bounds")
+        asm.emit(b("41 BE 01 00 00 00"))                # mov r14d, 1
+        asm.jump("jmp", "checked_return")
+    if io is IO.SYSCALLS:
+        _generate_flush_output(asm)
+        _generate_read_input(asm)
+    elif io is IO.MEMORY:
+        _generate_write_memory(asm)
+        _generate_read_memory(asm)
+
+
+# Buffered I/O with Linux system calls, see the x86_64_intel backend for the asm code.
+# rbx is the output buffer, r12 is the number of bytes in it, r13 is the input state.
+
+def _generate_flush_output(asm: Assembler) -> None:
+    asm.label("flush_output")
+    asm.emit(
+        b("48 89 DE"),          # mov rsi, rbx
+        b("4E 8D 0C 23"),       # lea r9, [rbx+r12]
+        b("45 31 E4"),          # xor r12d, r12d
+    )
+    asm.label("write_output")
+    asm.emit(b("49 89 F8"))     # mov r8, rdi
+    asm.label("write_output_loop")
+    asm.emit(
+        b("4C 89 CA"),          # mov rdx, r9
+        b("48 29 F2"),          # sub rdx, rsi
+    )
+    asm.jump("jz", "write_output_done")
+    asm.emit(
+        b("BF 01 00 00 00"),    # mov edi, 1
+        b("B8 01 00 00 00"),    # mov eax, 1
+        b("0F 05"),             # syscall
+        b("48 85 C0"),          # test rax, rax
+    )
+    asm.jump("jle", "write_output_done")
+    asm.emit(b("48 01 C6"))     # add rsi, rax
+    asm.jump("jmp", "write_output_loop")
+    asm.label("write_output_done")
+    asm.emit(
+        b("4C 89 C7"),          # mov rdi, r8
+        b("C3"),                # ret
+    )
+
+
+def _generate_read_input(asm: Assembler) -> None:
+    asm.label("read_input")
+    asm.emit(
+        b("49 8B 45 00"),       # mov rax, [r13]
+        b("49 3B 45 08"),       # cmp rax, [r13+8]
+    )
+    asm.jump("jb", "read_input_ready")
+    asm.call("flush_output")
+    asm.emit(
+        b("49 89 F8"),          # mov r8, rdi
+        b("31 FF"),             # xor edi, edi
+        b("49 8D 75 10"),       # lea rsi, [r13+16]
+        b("BA", BUFFER_SIZE.to_bytes(4, "little")),  # mov edx, BUFFER_SIZE
+        b("31 C0"),             # xor eax, eax
+        b("0F 05"),             # syscall
+        b("4C 89 C7"),          # mov rdi, r8
+        b("48 85 C0"),          # test rax, rax
+    )
+    asm.jump("jle", "read_input_eof")
+    asm.emit(
+        b("49 89 45 08"),       # mov [r13+8], rax
+        b("31 C0"),             # xor eax, eax
+    )
+    asm.label("read_input_ready")
+    asm.emit(
+        b("41 0F B6 4C 05 10"), # movzx ecx, byte ptr [r13+rax+16]
+        b("48 FF C0"),          # inc rax
+        b("49 89 45 00"),       # mov [r13], rax
+        b("89 C8"),             # mov eax, ecx
+        b("C3"),                # ret
+    )
+    asm.label("read_input_eof")
+    asm.emit(
+        b("31 C0"),             # xor eax, eax
+        b("49 89 45 00"),       # mov [r13], rax
+        b("49 89 45 08"),       # mov [r13+8], rax
+        b("C3"),                # ret
+    )
+
+
+# In-memory I/O, r13 is the memory state.
+
+def _generate_write_memory(asm: Assembler) -> None:
+    """ Writes al unless the output is full. """
+    asm.label("write_memory")
+    asm.emit(
+        b("49 8B 4D 10"),       # mov rcx, [r13+16]
+        b("49 3B 4D 18"),       # cmp rcx, [r13+24]
+    )
+    asm.jump("jae", "write_memory_full")
+    asm.emit(b("88 01"))        # mov [rcx], al
+    asm.label("write_memory_full")
+    asm.emit(
+        b("48 FF C1"),          # inc rcx
+        b("49 89 4D 10"),       # mov [r13+16], rcx
+        b("C3"),                # ret
+    )
+
 
+def _generate_read_memory(asm: Assembler) -> None:
+    """ Returns the next byte of the input in eax, or 0 at its end. """
+    asm.label("read_memory")
+    asm.emit(
+        b("49 8B 4D 00"),       # mov rcx, [r13]
+        b("31 C0"),             # xor eax, eax
+        b("49 3B 4D 08"),       # cmp rcx, [r13+8]
+    )
+    asm.jump("jae", "read_memory_end")
+    asm.emit(
+        b("0F B6 01"),          # movzx eax, byte ptr [rcx]
+        b("48 FF C1"),          # inc rcx
+        b("49 89 4D 00"),       # mov [r13], rcx
+    )
+    asm.label("read_memory_end")
+    asm.emit(b("C3"))           # ret
 
-def _generate_prologue(linux_syscalls: bool) -> Iterator[bytes]:
-    if not linux_syscalls:
-        yield b("41 54")                        # push r12
-        yield b("41 55")                        # push r13
-        yield b("49 BC", encoded_write_char)    # movabs r12, encoded_write_char
-        yield b("49 BD", encoded_read_char)     # movabs r13, encoded_read_char
 
+# Look for 0 in 16 cells at a time. Aligned loads never cross a page
+# boundary, so we never touch a page that the original loop wouldn't.
+# See the x86_64_intel backend for the asm code.
+_SCAN_FORWARD = b"".join([
+    b("66 0F EF C0"),       # pxor xmm0, xmm0
+    b("89 F9"),             # mov ecx, edi
+    b("83 E1 0F"),          # and ecx, 15
+    b("48 83 E7 F0"),       # and rdi, -16
+    b("66 0F 6F 0F"),       # movdqa xmm1, [rdi]
+    b("66 0F 74 C8"),       # pcmpeqb xmm1, xmm0
+    b("66 0F D7 C1"),       # pmovmskb eax, xmm1
+    b("D3 E8"),             # shr eax, cl
+    b("D3 E0"),             # shl eax, cl
+    b("85 C0"),             # test eax, eax
+    b("75 14"),             # jnz found
+    # scan:
+    b("48 83 C7 10"),       # add rdi, 16
+    b("66 0F 6F 0F"),       # movdqa xmm1, [rdi]
+    b("66 0F 74 C8"),       # pcmpeqb xmm1, xmm0
+    b("66 0F D7 C1"),       # pmovmskb eax, xmm1
+    b("85 C0"),             # test eax, eax
+    b("74 EC"),             # jz scan
+    # found:
+    b("0F BC C0"),          # bsf eax, eax
+    b("48 01 C7"),          # add rdi, rax
+])
 
-def _generate_epilogue(linux_syscalls: bool) -> Iterator[bytes]:
-    if not linux_syscalls:
-        yield b("41 5D")   # pop r13
-        yield b("41 5C")   # pop r12
-    yield b("C3")      # ret
+_SCAN_BACK = b"".join([
+    b("66 0F EF C0"),       # pxor xmm0, xmm0
+    b("89 F9"),             # mov ecx, edi
+    b("83 E1 0F"),          # and ecx, 15
+    b("83 F1 0F"),          # xor ecx, 15
+    b("48 83 E7 F0"),       # and rdi, -16
+    b("66 0F 6F 0F"),       # movdqa xmm1, [rdi]
+    b("66 0F 74 C8"),       # pcmpeqb xmm1, xmm0
+    b("66 0F D7 C1"),       # pmovmskb eax, xmm1
+    b("D3 E0"),             # shl eax, cl
+    b("25 FF FF 00 00"),    # and eax, 0xFFFF
+    b("D3 E8"),             # shr eax, cl
+    b("85 C0"),             # test eax, eax
+    b("75 14"),             # jnz found
+    # scan:
+    b("48 83 EF 10"),       # sub rdi, 16
+    b("66 0F 6F 0F"),       # movdqa xmm1, [rdi]
+    b("66 0F 74 C8"),       # pcmpeqb xmm1, xmm0
+    b("66 0F D7 C1"),       # pmovmskb eax, xmm1
+    b("85 C0"),             # test eax, eax
+    b("74 EC"),             # jz scan
+    # found:
+    b("0F BD C0"),          # bsr eax, eax
+    b("48 01 C7"),          # add rdi, rax
+])
 
 
-def _generate_body(intermediate: AST, linux_syscalls: bool) -> Iterator[bytes]:
+# Register numbers as used in ModRM bytes:
+AL = 0
+RDX = 2
+RSI = 6
+RDI = 7
+
+
+def _generate_body(asm: Assembler, intermediate: AST, io: IO, parent_label: str = '') -> None:
+    loop_id = 0
     for node in intermediate:
         match node:
-            case Add(1):
-                yield b("FE 07")            # inc byte ptr [rdi]
             case Add(n):
-                yield b("80 07", n)     # add byte ptr [rdi], n
-            case Subtract(1):
-                yield b("FE 0F")            # dec byte ptr [rdi]
+                asm.emit(_add(0, n))
             case Subtract(n):
-                yield b("80 2F", n)      # sub byte ptr [rdi], n
+                asm.emit(_add(0, -n))
+            case AddAt(offset, n):
+                asm.emit(_add(offset, n))
             case Forward(1):
-                yield b("48 FF C7")        # inc rdi
+                asm.emit(b("48 FF C7"))              # inc rdi
             case Forward(n):
-                yield b("48 83 C7", n)  # add rdi, n  TODO: large n
+                asm.emit(_immediate("48", "C7", n))  # add rdi, n
             case Back(1):
-                yield b("48 FF CF")        # dec rdi
+                asm.emit(b("48 FF CF"))              # dec rdi
             case Back(n):
-                yield b("48 83 EF", n)  # sub rdi, n  TODO: large n
+                asm.emit(_immediate("48", "EF", n))  # sub rdi, n
             case Output(n):
-                if linux_syscalls:
-                    yield b("48 89 fe")        # mov rsi, rdi
-                    yield b("bf 01 00 00 00")  # mov edi, 1
-                    yield b("ba 01 00 00 00")  # mov edx, 1
-                    yield from [
-                        b("b8 01 00 00 00") +  # mov eax, 1
-                        b("0f 05")             # syscall
-                    ] * n
-                    yield b("48 89 f7")        # mov rdi, rsi
-                else:
-                    yield b("57")              # push rdi
-                    yield b("48 0F B6 3F")     # movzx rdi, byte ptr [rdi]
-                    sequence = [
-                        b("41 FF D4"),         # call r12 (see prologue)
-                        b("48 89 C7")          # mov rdi, rax
-                    ] * n
-                    yield from sequence[:-1]
-                    yield b("5F")              # pop rdi
+                _output(asm, 0, n, io)
+            case OutputAt(offset, n):
+                _output(asm, offset, n, io)
             case Input(n):
-                if linux_syscalls:
-                    yield b("48 89 fe")        # mov rsi, rdi
-                    yield b("bf 00 00 00 00")  # mov edi, 0
-                    yield b("ba 01 00 00 00")  # mov edx, 1
-                    yield b("b8 00 00 00 00")  # mov eax, 0
-                    yield b("0f 05")           # syscall
-                    yield b("48 89 f7")        # mov rdi, rsi
-                    yield b("83 f8 01")        # cmp eax, 1
-                    yield b("74 03")           # je read_ok
-                    yield b("c6 07 00")        # mov byte prt [rdi], 0
-                    # read_ok:
+                _input(asm, 0, n, io)
+            case InputAt(offset, n):
+                _input(asm, offset, n, io)
+            case Print(data):
+                _print(asm, data, io, f'{parent_label}_{loop_id}')
+                loop_id += 1
+            case Set(n):
+                asm.emit(b("C6", _address(0, 0)), bytes([n]))        # mov byte ptr [rdi], n
+            case SetAt(offset, n):
+                asm.emit(b("C6", _address(0, offset)), bytes([n]))   # mov byte ptr [rdi+offset], n
+            case MulAdd(offset, factor):
+                asm.emit(b("0F B6 07"))             # movzx eax, byte ptr [rdi]
+                if factor not in (1, 255):
+                    asm.emit(b("6B C0", factor))    # imul eax, eax, factor
+                if factor == 255:
+                    asm.emit(b("28", _address(AL, offset)))  # sub byte ptr [rdi+offset], al
                 else:
-                    yield b("57")              # push rdi
-                    yield from [
-                        b("41 FF D5")          # call r13 (see prologue)
-                    ] * n
-                    yield b("5F")              # pop rdi
-                    yield b("31 D2")           # xor edx, edx
-                    yield b("85 C0")           # test eax, eax
-                    yield b("0F 48 C2")        # cmovs eax, edx
-                    yield b("88 07")           # mov byte ptr [rdi], al
+                    asm.emit(b("00", _address(AL, offset)))  # add byte ptr [rdi+offset], al
+            case Scan(1):
+                asm.emit(_SCAN_FORWARD)
+            case Scan(-1):
+                asm.emit(_SCAN_BACK)
+            case Scan(stride):
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                _generate_body(asm, [Loop([step])], io, f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
-                # TODO: this only supports short jumps, that is, [-128..127]
-                compiled_body = b"".join(_generate_body(body, linux_syscalls))
-
-                # Displacements: 2 is the length in bytes of the jump to the
-                # beginning, and 7 is the length of comparison and both jumps.
-                distance = len(compiled_body)
-                start_to_end = distance + 2
-                end_to_start = 0x100 - distance - 7
-
-                yield b("80 3F 00")           # cmp byte ptr [rdi], 0
-                yield b("74", start_to_end)   # je end
-                yield compiled_body
-                yield b("EB", end_to_start)   # jmp start
+                label = f'{parent_label}_{loop_id}'
+                asm.label(f'start{label}')
+                asm.emit(b("80 3F 00"))             # cmp byte ptr [rdi], 0
+                asm.jump("je", f'end{label}')
+                _generate_body(asm, body, io, label)
+                asm.jump("jmp", f'start{label}')
+                asm.label(f'end{label}')
+                loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                asm.label(f'start{label}')
+                _generate_body(asm, body, io, label)
+                asm.emit(b("80 3F 00"))             # cmp byte ptr [rdi], 0
+                asm.jump("jne", f'start{label}')
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                asm.emit(b("80 3F 00"))             # cmp byte ptr [rdi], 0
+                asm.jump("je", f'end{label}')
+                _generate_body(asm, body, io, label)
+                asm.label(f'end{label}')
+                loop_id += 1
+            case CheckBounds(low, high):
+                _check_bounds(asm, low, high)
+
+
+def _check_bounds(asm: Assembler, low: int, high: int) -> None:
+    """ r14 is the start of the tape, r15 is its end. """
+    if low == 0:
+        asm.emit(b("4C 39 F7"))                     # cmp rdi, r14
+    else:
+        asm.emit(
+            b("48 8D", _address(AL, low)),          # lea rax, [rdi+low]
+            b("4C 39 F0"),                          # cmp rax, r14
+        )
+    asm.jump("jb", "out_of_bounds")
+    if high == 0:
+        asm.emit(b("4C 39 FF"))                     # cmp rdi, r15
+    else:
+        if high != low:
+            asm.emit(b("48 8D", _address(AL, high)))    # lea rax, [rdi+high]
+        asm.emit(b("4C 39 F8"))                     # cmp rax, r15
+    asm.jump("jae", "out_of_bounds")
+
+
+def _immediate(rex: str, modrm: str, n: int) -> bytes:
+    """ Instruction from the 83/81 group (add, sub, cmp...) with the shortest immediate for n. """
+    if -0x80 <= n < 0x80:
+        return b(f"{rex} 83 {modrm}", n.to_bytes(1, "little", signed=True))
+    else:
+        return b(f"{rex} 81 {modrm}", n.to_bytes(4, "little", signed=True))
+
+
+def _address(register: int, offset: int, base: int = RDI) -> bytes:
+    """ ModRM byte and displacement for [base+offset], with the other operand in register. """
+    if offset == 0:
+        return bytes([register << 3 | base])
+    elif -0x80 <= offset < 0x80:
+        return bytes([0x40 | register << 3 | base]) + offset.to_bytes(1, "little", signed=True)
+    else:
+        return bytes([0x80 | register << 3 | base]) + offset.to_bytes(4, "little", signed=True)
+
+
+def _add(offset: int, n: int) -> bytes:
+    n = n % 256
+    match n:
+        case 1:
+            return b("FE", _address(0, offset))                   # inc byte ptr [rdi+offset]
+        case 255:
+            return b("FE", _address(1, offset))                   # dec byte ptr [rdi+offset]
+        case _:
+            return b("80", _address(0, offset)) + bytes([n])      # add byte ptr [rdi+offset], n
+
+
+def _output(asm: Assembler, offset: int, n: int, io: IO) -> None:
+    if io is IO.SYSCALLS:
+        for start in range(0, n, BUFFER_SIZE):
+            chunk = min(n - start, BUFFER_SIZE)
+            # make room for the chunk, then append it:
+            asm.emit(
+                _immediate("49", "FC", BUFFER_SIZE - chunk),    # cmp r12, BUFFER_SIZE-chunk
+                b("76 05"),                                     # jbe +5
+            )
+            asm.call("flush_output")
+            asm.emit(b("0F B6", _address(AL, offset)))          # movzx eax, byte ptr [rdi+offset]
+            for i in range(chunk):
+                asm.emit(b("42 88", _buffer_address(i)))        # mov [rbx+r12+i], al
+            asm.emit(_immediate("49", "C4", chunk))             # add r12, chunk
+    elif io is IO.MEMORY:
+        asm.emit(b("0F B6", _address(AL, offset)))  # movzx eax, byte ptr [rdi+offset]
+        for _ in range(n):
+            asm.call("write_memory")
+    else:
+        asm.emit(
+            b("57"),                                # push rdi
+            b("48 0F B6", _address(RDI, offset)),   # movzx rdi, byte ptr [rdi+offset]
+        )
+        sequence = [
+            b("41 FF D4"),                          # call r12 (putchar)
+            b("48 89 C7")                           # mov rdi, rax
+        ] * n
+        asm.emit(*sequence[:-1])
+        asm.emit(b("5F"))                           # pop rdi
+
+
+def _buffer_address(i: int) -> bytes:
+    """ ModRM and SIB bytes and displacement for [rbx+r12+i], with al as the other operand. """
+    if i == 0:
+        return b("04 23")
+    elif i < 0x80:
+        return b("44 23", i)
+    else:
+        return b("84 23", i.to_bytes(4, "little"))
+
+
+def _print(asm: Assembler, data: bytes, io: IO, label: str) -> None:
+    if io is IO.SYSCALLS:
+        asm.call("flush_output")
+        asm.relative(b("48 8D 35"), f'text{label}')     # lea rsi, [rip+text]
+        asm.emit(
+            b("4C 8D 8E", len(data).to_bytes(4, "little")), # lea r9, [rsi+len]
+        )
+        asm.call("write_output")
+        # The data is stored right after the code, which jumps over it.
+        asm.jump("jmp", f'over{label}')
+        asm.label(f'text{label}')
+        asm.emit(data)
+        asm.label(f'over{label}')
+    elif io is IO.MEMORY:
+        for byte in data:
+            asm.emit(b("B0", byte))                     # mov al, byte
+            asm.call("write_memory")
+    else:
+        asm.emit(b("57"))                               # push rdi
+        for byte in data:
+            asm.emit(
+                b("BF", byte.to_bytes(4, "little")),    # mov edi, byte
+                b("41 FF D4"),                          # call r12 (putchar)
+            )
+        asm.emit(b("5F"))                               # pop rdi
+
+
+def _input(asm: Assembler, offset: int, n: int, io: IO) -> None:
+    if io is IO.SYSCALLS:
+        # read_input already returns 0 on EOF
+        for _ in range(n):
+            asm.call("read_input")
+        asm.emit(b("88", _address(AL, offset)))     # mov byte ptr [rdi+offset], al
+    elif io is IO.MEMORY:
+        for _ in range(n):
+            asm.call("read_memory")
+        asm.emit(b("88", _address(AL, offset)))     # mov byte ptr [rdi+offset], al
+    else:
+        asm.emit(b("57"))                           # push rdi
+        asm.emit(*[
+            b("41 FF D5")                           # call r13 (getchar)
+        ] * n)
+        asm.emit(
+            b("5F"),                                # pop rdi
+            b("31 D2"),                             # xor edx, edx
+            b("85 C0"),                             # test eax, eax
+            b("0F 48 C2"),                          # cmovs eax, edx
+            b("88", _address(AL, offset)),          # mov byte ptr [rdi+offset], al
+        )
@@ -1,8 +1,9 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan
 )
 
 def generate_ppc32(intermediate: AST) -> Iterator[str]:
@@ -64,6 +65,56 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
                 yield  '    li     r3, 0'
                 yield  '1:  stb    r3, 0(r30)'
                 yield  '    mr     r3, r30'
+            case Print(data):
+                yield  '    mr     r30, r3'
+                for byte in data:
+                    yield f'    li     r3, {byte}'
+                    yield  '    bl     _putchar'
+                yield  '    mr     r3, r30'
+            case Set(n):
+                yield f'    li     r4, {n}'
+                yield  '    stb    r4, 0(r3)'
+            case AddAt(offset, n):
+                yield f'    lbz    r4, {offset}(r3)'
+                yield f'    addi   r4, r4, {n}'
+                yield f'    stb    r4, {offset}(r3)'
+            case SetAt(offset, n):
+                yield f'    li     r4, {n}'
+                yield f'    stb    r4, {offset}(r3)'
+            case OutputAt(offset, n):
+                yield  '    mr     r30, r3'
+                yield f'    lbz    r3, {offset}(r3)'
+                yield from ['    bl     _putchar'] * n
+                yield  '    mr     r3, r30'
+            case InputAt(offset, n):
+                yield  '    mr     r30, r3'
+                yield from ['    bl     _getchar'] * n
+                # EOF handling: replace negative values with 0.
+                yield  '    cmpwi  r3, 0'
+                yield  '    bge+   1f'
+                yield  '    li     r3, 0'
+                yield f'1:  stb    r3, {offset}(r30)'
+                yield  '    mr     r3, r30'
+            case MulAdd(offset, factor):
+                yield  '    lbz    r4, 0(r3)'
+                if factor not in (1, 255):
+                    yield f'    mulli  r4, r4, {factor}'
+                yield f'    lbz    r5, {offset}(r3)'
+                if factor == 255:
+                    yield  '    subf   r5, r4, r5'
+                else:
+                    yield  '    add    r5, r5, r4'
+                yield f'    stb    r5, {offset}(r3)'
+            case Scan(1):
+                # p += strlen(p)
+                yield  '    mr     r30, r3'
+                yield  '    bl     _strlen'
+                yield  '    add    r3, r3, r30'
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -74,3 +125,19 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
                 yield f'    b      start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, label)
+                yield  '    lbz    r4, 0(r3)'
+                yield  '    cmplwi r4, 0'
+                yield f'    bne+   start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield  '    lbz    r4, 0(r3)'
+                yield  '    cmplwi r4, 0'
+                yield f'    beq-   end{label}'
+                yield from _generate_body(body, label)
+                yield f'end{label}:'
+                loop_id += 1
@@ -1,8 +1,9 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan
 )
 
 def generate_riscv64(intermediate: AST) -> Iterator[str]:
@@ -58,6 +59,61 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
                 yield  '    and    a0, a0, a1'
                 yield  '    sb     a0, 0(s0)'
                 yield  '    mv     a0, s0'
+            case Print(data):
+                yield  '    mv     s0, a0'
+                for byte in data:
+                    yield f'    li     a0, {byte}'
+                    yield  '    call   putchar'
+                yield  '    mv     a0, s0'
+            case Set(0):
+                yield  '    sb     zero, 0(a0)'
+            case Set(n):
+                yield f'    li     a1, {n}'
+                yield  '    sb     a1, 0(a0)'
+            case AddAt(offset, n):
+                yield f'    lb     a1, {offset}(a0)'
+                yield f'    addi   a1, a1, {n}'
+                yield f'    sb     a1, {offset}(a0)'
+            case SetAt(offset, 0):
+                yield f'    sb     zero, {offset}(a0)'
+            case SetAt(offset, n):
+                yield f'    li     a1, {n}'
+                yield f'    sb     a1, {offset}(a0)'
+            case OutputAt(offset, n):
+                yield  '    mv     s0, a0'
+                yield f'    lb     a0, {offset}(a0)'
+                yield from ['    call   putchar'] * n
+                yield  '    mv     a0, s0'
+            case InputAt(offset, n):
+                yield  '    mv     s0, a0'
+                yield from ['    call   getchar'] * n
+                # EOF handling: replace negative values with 0.
+                yield  '    sgtz   a1, a0'
+                yield  '    neg    a1, a1'
+                yield  '    and    a0, a0, a1'
+                yield f'    sb     a0, {offset}(s0)'
+                yield  '    mv     a0, s0'
+            case MulAdd(offset, factor):
+                yield  '    lb     a1, 0(a0)'
+                if factor not in (1, 255):
+                    yield f'    li     a2, {factor}'
+                    yield  '    mul    a1, a1, a2'
+                yield f'    lb     a2, {offset}(a0)'
+                if factor == 255:
+                    yield  '    sub    a2, a2, a1'
+                else:
+                    yield  '    add    a2, a2, a1'
+                yield f'    sb     a2, {offset}(a0)'
+            case Scan(1):
+                # p += strlen(p)
+                yield  '    mv     s0, a0'
+                yield  '    call   strlen'
+                yield  '    add    a0, a0, s0'
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -67,3 +123,17 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
                 yield f'    j      start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, label)
+                yield  '    lb     a1, 0(a0)'
+                yield f'    bne    a1, zero, start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield  '    lb     a1, 0(a0)'
+                yield f'    beq    a1, zero, end{label}'
+                yield from _generate_body(body, label)
+                yield f'end{label}:'
+                loop_id += 1
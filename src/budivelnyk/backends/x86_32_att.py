@@ -1,8 +1,9 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan
 )
 
 def generate_x86_32_att(intermediate: AST) -> Iterator[str]:
@@ -34,14 +35,12 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
     loop_id = 0
     for node in intermediate:
         match node:
-            case Add(1):
-                yield  '    incb   (%eax)'
             case Add(n):
-                yield f'    addb   ${n}, (%eax)'
-            case Subtract(1):
-                yield  '    decb   (%eax)'
+                yield from _add(0, n)
             case Subtract(n):
-                yield f'    subb   ${n}, (%eax)'
+                yield from _add(0, -n)
+            case AddAt(offset, n):
+                yield from _add(offset, n)
             case Forward(1):
                 yield  '    incl   %eax'
             case Forward(n):
@@ -51,30 +50,40 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
             case Back(n):
                 yield f'    subl   ${n}, %eax'
             case Output(n):
-                yield  '    pushl  %eax'
-                yield  '    movzbl (%eax), %ecx'
-                yield  '    pushl  %ecx'
-                sequence = [
-                       '    call   putchar@PLT',
-                       '    movl   %eax, (%esp)'
-                ] * n
-                yield from sequence[:-1]
-                yield  '    addl   $4, %esp'
-                yield  '    popl   %eax'
+                yield from _output(0, n)
+            case OutputAt(offset, n):
+                yield from _output(offset, n)
             case Input(n):
+                yield from _input(0, n)
+            case InputAt(offset, n):
+                yield from _input(offset, n)
+            case Print(data):
+                yield from _print(data)
+            case Set(n):
+                yield f'    movb   ${n}, (%eax)'
+            case SetAt(offset, n):
+                yield f'    movb   ${n}, {_cell(offset)}'
+            case MulAdd(offset, 1):
+                yield  '    movzbl (%eax), %ecx'
+                yield f'    addb   %cl, {offset}(%eax)'
+            case MulAdd(offset, 255):
+                yield  '    movzbl (%eax), %ecx'
+                yield f'    subb   %cl, {offset}(%eax)'
+            case MulAdd(offset, factor):
+                yield  '    movzbl (%eax), %ecx'
+                yield f'    imull  ${factor}, %ecx, %ecx'
+                yield f'    addb   %cl, {offset}(%eax)'
+            case Scan(1):
+                # p += strlen(p)
                 yield  '    pushl  %eax'
-                yield  '    subl   $4, %esp'
-                yield from ['    call getchar@PLT'] * n
-                # EOF handling: replace negative values with 0.
-                # Can't use cmovs because it requires i686.
-                yield  '    xorl   %ecx, %ecx'
-                yield  '    testl  %eax, %eax'
-                yield  '    setns  %cl'
-                yield  '    negl   %ecx'
-                yield  '    andl   %eax, %ecx'
-                yield  '    addl   $4, %esp'
-                yield  '    popl   %eax'
-                yield  '    movb   %cl, (%eax)'
+                yield  '    call   strlen@PLT'
+                yield  '    popl   %ecx'
+                yield  '    addl   %ecx, %eax'
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -84,3 +93,78 @@ def _generate_body(intermediate: AST, parent_label: str='') -> Iterator[str]:
                 yield f'    jmp    start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, label)
+                yield  '    cmpb   $0, (%eax)'
+                yield f'    jne    start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield  '    cmpb   $0, (%eax)'
+                yield f'    je     end{label}'
+                yield from _generate_body(body, label)
+                yield f'end{label}:'
+                loop_id += 1
+
+
+def _cell(offset: int) -> str:
+    """ Memory operand for the cell at offset from the current one. """
+    if offset:
+        return f'{offset}(%eax)'
+    else:
+        return '(%eax)'
+
+
+def _add(offset: int, n: int) -> Iterator[str]:
+    cell = _cell(offset)
+    match n:
+        case 1:
+            yield f'    incb   {cell}'
+        case -1:
+            yield f'    decb   {cell}'
+        case _ if n > 0:
+            yield f'    addb   ${n}, {cell}'
+        case _:
+            yield f'    subb   ${-n}, {cell}'
+
+
+def _output(offset: int, n: int) -> Iterator[str]:
+    yield  '    pushl  %eax'
+    yield f'    movzbl {_cell(offset)}, %ecx'
+    yield  '    pushl  %ecx'
+    sequence = [
+           '    call   putchar@PLT',
+           '    movl   %eax, (%esp)'
+    ] * n
+    yield from sequence[:-1]
+    yield  '    addl   $4, %esp'
+    yield  '    popl   %eax'
+
+
+
+def _print(data: bytes) -> Iterator[str]:
+    yield  '    pushl  %eax'
+    yield  '    pushl  %eax'  # reserve space for the argument
+    for byte in data:
+        yield f'    movl   ${byte}, (%esp)'
+        yield  '    call   putchar@PLT'
+    yield  '    addl   $4, %esp'
+    yield  '    popl   %eax'
+
+
+def _input(offset: int, n: int) -> Iterator[str]:
+    yield  '    pushl  %eax'
+    yield  '    subl   $4, %esp'
+    yield from ['    call getchar@PLT'] * n
+    # EOF handling: replace negative values with 0.
+    # Can't use cmovs because it requires i686.
+    yield  '    xorl   %ecx, %ecx'
+    yield  '    testl  %eax, %eax'
+    yield  '    setns  %cl'
+    yield  '    negl   %ecx'
+    yield  '    andl   %eax, %ecx'
+    yield  '    addl   $4, %esp'
+    yield  '    popl   %eax'
+    yield f'    movb   %cl, {_cell(offset)}'
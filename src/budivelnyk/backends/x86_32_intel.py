@@ -1,8 +1,9 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan
 )
 
 def generate_x86_32_gas_intel(intermediate: AST) -> Iterator[str]:
@@ -34,7 +35,7 @@ def _generate_prologue_gas() -> Iterator[str]:
 
 
 def _generate_prologue_nasm() -> Iterator[str]:
-    yield '    extern getchar, putchar, _GLOBAL_OFFSET_TABLE_'
+    yield '    extern getchar, putchar, strlen, _GLOBAL_OFFSET_TABLE_'
     yield ''
     yield 'get_pc:'
     yield '    mov   ebx, dword [esp]'
@@ -54,23 +55,17 @@ def _generate_epilogue() -> Iterator[str]:
 
 
 def _generate_body(intermediate: AST, nasm: bool, parent_label: str='') -> Iterator[str]:
-    if nasm:
-        ptr = ""
-        plt = " wrt ..plt"
-    else:
-        ptr = " ptr"
-        plt = "@PLT"
+    ptr = "" if nasm else " ptr"
+    plt = " wrt ..plt" if nasm else "@PLT"
     loop_id = 0
     for node in intermediate:
         match node:
-            case Add(1):
-                yield f'    inc   byte{ptr} [eax]'
             case Add(n):
-                yield f'    add   byte{ptr} [eax], {n}'
-            case Subtract(1):
-                yield f'    dec   byte{ptr} [eax]'
+                yield from _add(0, n, ptr)
             case Subtract(n):
-                yield f'    sub   byte{ptr} [eax], {n}'
+                yield from _add(0, -n, ptr)
+            case AddAt(offset, n):
+                yield from _add(offset, n, ptr)
             case Forward(1):
                 yield  '    inc   eax'
             case Forward(n):
@@ -80,30 +75,40 @@ def _generate_body(intermediate: AST, nasm: bool, parent_label: str='') -> Itera
             case Back(n):
                 yield f'    sub   eax, {n}'
             case Output(n):
-                yield  '    push  eax'
-                yield f'    movzx ecx, byte{ptr} [eax]'
-                yield  '    push  ecx'
-                sequence = [
-                      f'    call  putchar{plt}',
-                      f'    mov   dword{ptr} [esp], eax'
-                ] * n
-                yield from sequence[:-1]
-                yield  '    add   esp, 4'
-                yield  '    pop   eax'
+                yield from _output(0, n, nasm)
+            case OutputAt(offset, n):
+                yield from _output(offset, n, nasm)
             case Input(n):
+                yield from _input(0, n, nasm)
+            case InputAt(offset, n):
+                yield from _input(offset, n, nasm)
+            case Print(data):
+                yield from _print(data, nasm)
+            case Set(n):
+                yield f'    mov   byte{ptr} [eax], {n}'
+            case SetAt(offset, n):
+                yield f'    mov   {_cell(offset, ptr)}, {n}'
+            case MulAdd(offset, 1):
+                yield f'    movzx ecx, byte{ptr} [eax]'
+                yield f'    add   byte{ptr} [eax{offset:+}], cl'
+            case MulAdd(offset, 255):
+                yield f'    movzx ecx, byte{ptr} [eax]'
+                yield f'    sub   byte{ptr} [eax{offset:+}], cl'
+            case MulAdd(offset, factor):
+                yield f'    movzx ecx, byte{ptr} [eax]'
+                yield f'    imul  ecx, ecx, {factor}'
+                yield f'    add   byte{ptr} [eax{offset:+}], cl'
+            case Scan(1):
+                # p += strlen(p)
                 yield  '    push  eax'
-                yield  '    sub   esp, 4'
-                yield from [f'    call  getchar{plt}'] * n
-                # EOF handling: replace negative values with 0.
-                # Can't use cmovs because it requires i686.
-                yield  '    xor   ecx, ecx'
-                yield  '    test  eax, eax'
-                yield  '    setns cl'
-                yield  '    neg   ecx'
-                yield  '    and   ecx, eax'
-                yield  '    add   esp, 4'
-                yield  '    pop   eax'
-                yield f'    mov   byte{ptr} [eax], cl'
+                yield f'    call  strlen{plt}'
+                yield  '    pop   ecx'
+                yield  '    add   eax, ecx'
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], nasm, f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -113,3 +118,84 @@ def _generate_body(intermediate: AST, nasm: bool, parent_label: str='') -> Itera
                 yield f'    jmp   start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, nasm, label)
+                yield f'    cmp   byte{ptr} [eax], 0'
+                yield f'    jne   start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'    cmp   byte{ptr} [eax], 0'
+                yield f'    je    end{label}'
+                yield from _generate_body(body, nasm, label)
+                yield f'end{label}:'
+                loop_id += 1
+
+
+def _cell(offset: int, ptr: str) -> str:
+    """ Memory operand for the cell at offset from the current one. """
+    if offset:
+        return f'byte{ptr} [eax{offset:+}]'
+    else:
+        return f'byte{ptr} [eax]'
+
+
+def _add(offset: int, n: int, ptr: str) -> Iterator[str]:
+    cell = _cell(offset, ptr)
+    match n:
+        case 1:
+            yield f'    inc   {cell}'
+        case -1:
+            yield f'    dec   {cell}'
+        case _ if n > 0:
+            yield f'    add   {cell}, {n}'
+        case _:
+            yield f'    sub   {cell}, {-n}'
+
+
+def _output(offset: int, n: int, nasm: bool) -> Iterator[str]:
+    ptr = "" if nasm else " ptr"
+    plt = " wrt ..plt" if nasm else "@PLT"
+    yield  '    push  eax'
+    yield f'    movzx ecx, {_cell(offset, ptr)}'
+    yield  '    push  ecx'
+    sequence = [
+          f'    call  putchar{plt}',
+          f'    mov   dword{ptr} [esp], eax'
+    ] * n
+    yield from sequence[:-1]
+    yield  '    add   esp, 4'
+    yield  '    pop   eax'
+
+
+
+def _print(data: bytes, nasm: bool) -> Iterator[str]:
+    ptr = "" if nasm else " ptr"
+    plt = " wrt ..plt" if nasm else "@PLT"
+    yield  '    push  eax'
+    yield  '    push  eax'  # reserve space for the argument
+    for byte in data:
+        yield f'    mov   dword{ptr} [esp], {byte}'
+        yield f'    call  putchar{plt}'
+    yield  '    add   esp, 4'
+    yield  '    pop   eax'
+
+
+def _input(offset: int, n: int, nasm: bool) -> Iterator[str]:
+    ptr = "" if nasm else " ptr"
+    plt = " wrt ..plt" if nasm else "@PLT"
+    yield  '    push  eax'
+    yield  '    sub   esp, 4'
+    yield from [f'    call  getchar{plt}'] * n
+    # EOF handling: replace negative values with 0.
+    # Can't use cmovs because it requires i686.
+    yield  '    xor   ecx, ecx'
+    yield  '    test  eax, eax'
+    yield  '    setns cl'
+    yield  '    neg   ecx'
+    yield  '    and   ecx, eax'
+    yield  '    add   esp, 4'
+    yield  '    pop   eax'
+    yield f'    mov   {_cell(offset, ptr)}, cl'
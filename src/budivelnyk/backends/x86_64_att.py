@@ -1,39 +1,132 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan, CheckBounds
 )
+from ..bounds import insert_bounds_checks
+from .x86_64_intel import BUFFER_SIZE
 
-def generate_x86_64_att(intermediate: AST, *, linux_syscalls: bool) -> Iterator[str]:
-    yield from _generate_prologue()
+def generate_x86_64_att(intermediate: AST, *, linux_syscalls: bool, bounds_checked: bool = False) -> Iterator[str]:
+    yield from _generate_prologue(linux_syscalls, bounds_checked)
+    if bounds_checked:
+        intermediate = insert_bounds_checks(intermediate)
     yield from _generate_body(intermediate, linux_syscalls)
-    yield from _generate_epilogue()
+    yield from _generate_epilogue(linux_syscalls, bounds_checked)
 
 
-def _generate_prologue() -> Iterator[str]:
+def _generate_prologue(linux_syscalls: bool, bounds_checked: bool) -> Iterator[str]:
     yield '    .globl run'
     yield '    .type run, @function'
     yield 'run:'
+    if bounds_checked:
+        # See the x86_64_intel backend for how bounds checking works.
+        yield  '    pushq  %r14'
+        yield  '    pushq  %r15'
+        yield  '    movq   %rdi, %r14'
+        yield  '    leaq   (%rdi,%rsi), %r15'
+    if linux_syscalls:
+        # See the x86_64_intel backend for how the buffers work.
+        yield  '    pushq  %rbx'
+        yield  '    pushq  %r12'
+        yield  '    pushq  %r13'
+        yield f'    subq   ${BUFFER_SIZE}, %rsp'
+        yield  '    movq   %rsp, %rbx'  # output buffer
+        yield  '    xorl   %r12d, %r12d'  # number of bytes in it
+        yield  '    leaq   input_state(%rip), %r13'
 
 
-def _generate_epilogue() -> Iterator[str]:
+def _generate_epilogue(linux_syscalls: bool, bounds_checked: bool) -> Iterator[str]:
+    if bounds_checked:
+        yield  '    xorl   %r14d, %r14d'
+        yield 'checked_return:'
+    if linux_syscalls:
+        yield  '    call   flush_output'
+        yield f'    addq   ${BUFFER_SIZE}, %rsp'
+        yield  '    popq   %r13'
+        yield  '    popq   %r12'
+        yield  '    popq   %rbx'
+    if bounds_checked:
+        yield  '    movl   %r14d, %eax'
+        yield  '    popq   %r15'
+        yield  '    popq   %r14'
     yield '    ret'
+    if bounds_checked:
+        yield 'out_of_bounds:'
+        yield  '    movl   $1, %r14d'
+        yield  '    jmp    checked_return'
+    if linux_syscalls:
+        yield from _generate_buffer_routines()
+
+
+def _generate_buffer_routines() -> Iterator[str]:
+    yield 'flush_output:'
+    yield  '    movq   %rbx, %rsi'
+    yield  '    leaq   (%rbx,%r12), %r9'
+    yield  '    xorl   %r12d, %r12d'
+    yield 'write_output:'
+    yield  '    movq   %rdi, %r8'  # syscall doesn't change r8 and r9
+    yield 'write_output_loop:'
+    yield  '    movq   %r9, %rdx'
+    yield  '    subq   %rsi, %rdx'  # length
+    yield  '    jz     write_output_done'
+    yield  '    movl   $1, %edi'  # stdout
+    yield  '    movl   $1, %eax'  # write
+    yield  '    syscall'
+    yield  '    testq  %rax, %rax'
+    yield  '    jle    write_output_done'  # on errors, the output is lost
+    yield  '    addq   %rax, %rsi'
+    yield  '    jmp    write_output_loop'
+    yield 'write_output_done:'
+    yield  '    movq   %r8, %rdi'
+    yield  '    ret'
+    yield 'read_input:'
+    yield  '    movq   (%r13), %rax'
+    yield  '    cmpq   8(%r13), %rax'
+    yield  '    jb     read_input_ready'
+    yield  '    call   flush_output'
+    yield  '    movq   %rdi, %r8'
+    yield  '    xorl   %edi, %edi'  # stdin
+    yield  '    leaq   16(%r13), %rsi'
+    yield f'    movl   ${BUFFER_SIZE}, %edx'  # length
+    yield  '    xorl   %eax, %eax'  # read
+    yield  '    syscall'
+    yield  '    movq   %r8, %rdi'
+    yield  '    testq  %rax, %rax'
+    yield  '    jle    read_input_eof'
+    yield  '    movq   %rax, 8(%r13)'
+    yield  '    xorl   %eax, %eax'
+    yield 'read_input_ready:'
+    yield  '    movzbl 16(%r13,%rax), %ecx'
+    yield  '    incq   %rax'
+    yield  '    movq   %rax, (%r13)'
+    yield  '    movl   %ecx, %eax'
+    yield  '    ret'
+    yield 'read_input_eof:'
+    yield  '    xorl   %eax, %eax'
+    yield  '    movq   %rax, (%r13)'
+    yield  '    movq   %rax, 8(%r13)'
+    yield  '    ret'
+    yield  '    .pushsection .bss'
+    yield  '    .balign 8'
+    yield  'input_state:'
+    yield f'    .zero  {16 + BUFFER_SIZE}'
+    yield  '    .popsection'
 
 
 def _generate_body(intermediate: AST, linux_syscalls: bool, parent_label: str='') -> Iterator[str]:
     loop_id = 0
-    input_id = 0
+    output_id = 0
+    print_id = 0
     for node in intermediate:
         match node:
-            case Add(1):
-                yield  '    incb   (%rdi)'
             case Add(n):
-                yield f'    addb   ${n}, (%rdi)'
-            case Subtract(1):
-                yield  '    decb   (%rdi)'
+                yield from _add(0, n)
             case Subtract(n):
-                yield f'    subb   ${n}, (%rdi)'
+                yield from _add(0, -n)
+            case AddAt(offset, n):
+                yield from _add(offset, n)
             case Forward(1):
                 yield  '    incq   %rdi'
             case Forward(n):
@@ -43,49 +136,40 @@ def _generate_body(intermediate: AST, linux_syscalls: bool, parent_label: str=''
             case Back(n):
                 yield f'    subq   ${n}, %rdi'
             case Output(n):
-                if linux_syscalls:
-                    yield '    movq   %rdi, %rsi'
-                    yield '    movl   $1, %edi'  # stdout
-                    yield '    movl   $1, %edx'  # length
-                    sequence = [
-                        '    movl   $1, %eax',  # write
-                        '    syscall'
-                    ] * n
-                    yield from sequence
-                    yield '    movq   %rsi, %rdi'
-                else:
-                    yield '    pushq  %rdi'
-                    yield '    movzbq (%rdi), %rdi'
-                    sequence = ['    call   putchar', '    mov    %rax, %rdi'] * n
-                    yield from sequence[:-1]
-                    yield '    popq   %rdi'
+                yield from _output(0, n, linux_syscalls, f"output{parent_label}_{output_id}")
+                output_id += 1
+            case OutputAt(offset, n):
+                yield from _output(offset, n, linux_syscalls, f"output{parent_label}_{output_id}")
+                output_id += 1
             case Input(n):
-                if linux_syscalls:
-                    yield '    movq   %rdi, %rsi'
-                    yield '    movl   $0, %edi'  # stdin
-                    yield '    movl   $1, %edx'  # length
-                    sequence = [
-                        '    movl   $0, %eax',  # read
-                        '    syscall'
-                    ] * n
-                    yield from sequence
-                    yield '    movq   %rsi, %rdi'
-                    # EOF handling: unless read returns 1 (1 byte read), write 0 to tape.
-                    label = f"read_{input_id}_done"
-                    yield  '    cmpl   $1, %eax'
-                    yield f'    je     {label}'
-                    yield  '    movb   $0, (%rdi)'
-                    yield f'{label}:'
-                    input_id += 1
-                else:
-                    yield '    pushq  %rdi'
-                    yield from ['    call   getchar'] * n
-                    yield '    popq   %rdi'
-                    # EOF handling: replace negative values with 0.
-                    yield '    xorl   %edx, %edx'
-                    yield '    testl  %eax, %eax'
-                    yield '    cmovs  %edx, %eax'
-                    yield '    movb   %al, (%rdi)'
+                yield from _input(0, n, linux_syscalls)
+            case InputAt(offset, n):
+                yield from _input(offset, n, linux_syscalls)
+            case Print(data):
+                yield from _print(data, linux_syscalls, f"text{parent_label}_{print_id}")
+                print_id += 1
+            case Set(n):
+                yield f'    movb   ${n}, (%rdi)'
+            case SetAt(offset, n):
+                yield f'    movb   ${n}, {_cell(offset)}'
+            case MulAdd(offset, 1):
+                yield  '    movzbl (%rdi), %eax'
+                yield f'    addb   %al, {offset}(%rdi)'
+            case MulAdd(offset, 255):
+                yield  '    movzbl (%rdi), %eax'
+                yield f'    subb   %al, {offset}(%rdi)'
+            case MulAdd(offset, factor):
+                yield  '    movzbl (%rdi), %eax'
+                yield f'    imull  ${factor}, %eax, %eax'
+                yield f'    addb   %al, {offset}(%rdi)'
+            case Scan(1 | -1 as stride):
+                yield from _scan(stride, f'{parent_label}_{loop_id}')
+                loop_id += 1
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], linux_syscalls, f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -95,3 +179,162 @@ def _generate_body(intermediate: AST, linux_syscalls: bool, parent_label: str=''
                 yield f'    jmp    start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, linux_syscalls, label)
+                yield  '    cmpb   $0, (%rdi)'
+                yield f'    jne    start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield  '    cmpb   $0, (%rdi)'
+                yield f'    je     end{label}'
+                yield from _generate_body(body, linux_syscalls, label)
+                yield f'end{label}:'
+                loop_id += 1
+            case CheckBounds(low, high):
+                yield from _check_bounds(low, high)
+
+
+def _check_bounds(low: int, high: int) -> Iterator[str]:
+    if low:
+        yield f'    leaq   {low}(%rdi), %rax'
+        yield  '    cmpq   %r14, %rax'
+    else:
+        yield  '    cmpq   %r14, %rdi'
+    yield  '    jb     out_of_bounds'
+    if high:
+        if high != low:
+            yield f'    leaq   {high}(%rdi), %rax'
+        yield  '    cmpq   %r15, %rax'
+    else:
+        yield  '    cmpq   %r15, %rdi'
+    yield  '    jae    out_of_bounds'
+
+
+def _cell(offset: int) -> str:
+    """ Memory operand for the cell at offset from the current one. """
+    if offset:
+        return f'{offset}(%rdi)'
+    else:
+        return '(%rdi)'
+
+
+def _add(offset: int, n: int) -> Iterator[str]:
+    cell = _cell(offset)
+    match n:
+        case 1:
+            yield f'    incb   {cell}'
+        case -1:
+            yield f'    decb   {cell}'
+        case _ if n > 0:
+            yield f'    addb   ${n}, {cell}'
+        case _:
+            yield f'    subb   ${-n}, {cell}'
+
+
+def _output(offset: int, n: int, linux_syscalls: bool, label: str) -> Iterator[str]:
+    if linux_syscalls:
+        for chunk_id, start in enumerate(range(0, n, BUFFER_SIZE)):
+            chunk = min(n - start, BUFFER_SIZE)
+            # make room for the chunk, then append it:
+            yield f'    cmpq   ${BUFFER_SIZE - chunk}, %r12'
+            yield f'    jbe    {label}_{chunk_id}'
+            yield  '    call   flush_output'
+            yield f'{label}_{chunk_id}:'
+            yield f'    movzbl {_cell(offset)}, %eax'
+            for i in range(chunk):
+                yield f'    movb   %al, {i}(%rbx,%r12)' if i else '    movb   %al, (%rbx,%r12)'
+            yield f'    addq   ${chunk}, %r12'
+    else:
+        yield  '    pushq  %rdi'
+        yield f'    movzbq {_cell(offset)}, %rdi'
+        sequence = ['    call   putchar', '    mov    %rax, %rdi'] * n
+        yield from sequence[:-1]
+        yield  '    popq   %rdi'
+
+
+def _print(data: bytes, linux_syscalls: bool, label: str) -> Iterator[str]:
+    if linux_syscalls:
+        yield  '    call   flush_output'
+        yield f'    leaq   {label}(%rip), %rsi'
+        yield f'    leaq   {len(data)}(%rsi), %r9'
+        yield  '    call   write_output'
+        yield  '    .pushsection .rodata'
+        yield f'{label}:'
+        for i in range(0, len(data), 16):
+            yield f'    .byte {", ".join(map(str, data[i:i+16]))}'
+        yield  '    .popsection'
+    else:
+        yield  '    pushq  %rdi'
+        for byte in data:
+            yield f'    movl   ${byte}, %edi'
+            yield  '    call   putchar'
+        yield  '    popq   %rdi'
+
+
+def _input(offset: int, n: int, linux_syscalls: bool) -> Iterator[str]:
+    cell = _cell(offset)
+    if linux_syscalls:
+        # read_input already returns 0 on EOF
+        yield from ['    call   read_input'] * n
+        yield f'    movb   %al, {cell}'
+    else:
+        yield  '    pushq  %rdi'
+        yield from ['    call   getchar'] * n
+        yield  '    popq   %rdi'
+        # EOF handling: replace negative values with 0.
+        yield  '    xorl   %edx, %edx'
+        yield  '    testl  %eax, %eax'
+        yield  '    cmovs  %edx, %eax'
+        yield f'    movb   %al, {cell}'
+
+
+def _scan(stride: int, label: str) -> Iterator[str]:
+    # Look for 0 in 16 cells at a time. Aligned loads never cross a page
+    # boundary, so we never touch a page that the original loop wouldn't.
+    yield  '    pxor   %xmm0, %xmm0'
+    yield  '    movl   %edi, %ecx'
+    yield  '    andl   $15, %ecx'  # index of the current cell in its block
+    if stride == 1:
+        yield  '    andq   $-16, %rdi'
+        yield  '    movdqa (%rdi), %xmm1'
+        yield  '    pcmpeqb %xmm0, %xmm1'
+        yield  '    pmovmskb %xmm1, %eax'
+        # ignore the cells before the current one:
+        yield  '    shrl   %cl, %eax'
+        yield  '    shll   %cl, %eax'
+        yield  '    testl  %eax, %eax'
+        yield f'    jnz    found{label}'
+        yield f'scan{label}:'
+        yield  '    addq   $16, %rdi'
+        yield  '    movdqa (%rdi), %xmm1'
+        yield  '    pcmpeqb %xmm0, %xmm1'
+        yield  '    pmovmskb %xmm1, %eax'
+        yield  '    testl  %eax, %eax'
+        yield f'    jz     scan{label}'
+        yield f'found{label}:'
+        yield  '    bsfl   %eax, %eax'
+    else:
+        yield  '    xorl   $15, %ecx'
+        yield  '    andq   $-16, %rdi'
+        yield  '    movdqa (%rdi), %xmm1'
+        yield  '    pcmpeqb %xmm0, %xmm1'
+        yield  '    pmovmskb %xmm1, %eax'
+        # ignore the cells after the current one:
+        yield  '    shll   %cl, %eax'
+        yield  '    andl   $0xFFFF, %eax'
+        yield  '    shrl   %cl, %eax'
+        yield  '    testl  %eax, %eax'
+        yield f'    jnz    found{label}'
+        yield f'scan{label}:'
+        yield  '    subq   $16, %rdi'
+        yield  '    movdqa (%rdi), %xmm1'
+        yield  '    pcmpeqb %xmm0, %xmm1'
+        yield  '    pmovmskb %xmm1, %eax'
+        yield  '    testl  %eax, %eax'
+        yield f'    jz     scan{label}'
+        yield f'found{label}:'
+        yield  '    bsrl   %eax, %eax'
+    yield  '    addq   %rax, %rdi'
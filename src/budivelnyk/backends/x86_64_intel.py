@@ -1,61 +1,187 @@
 from typing import Iterator
 
 from ..intermediate import (
-    AST, Loop,
-    Add, Subtract, Forward, Back, Output, Input
+    AST, Loop, DoWhile,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set, MulAdd, If,
+    AddAt, SetAt, OutputAt, InputAt, Scan, CheckBounds
 )
+from ..bounds import insert_bounds_checks
 
-def generate_x86_64_gas_intel(intermediate: AST, *, linux_syscalls: bool) -> Iterator[str]:
-    yield from _generate_prologue_gas()
+# With Linux system calls, output is collected in a buffer on the stack and
+# written when it's full, before reading input and before returning. Input is
+# read ahead into a buffer that is kept between calls, like stdio does.
+BUFFER_SIZE = 4096
+
+# Bounds-checked code is `int run(unsigned char *tape, size_t size)`, which
+# returns 1 if the program stopped because it would have left the tape and
+# 0 otherwise. r14 and r15 are the start and the end of the tape.
+
+
+def generate_x86_64_gas_intel(intermediate: AST, *, linux_syscalls: bool,
+                              bounds_checked: bool = False) -> Iterator[str]:
+    yield from _generate_prologue_gas(linux_syscalls, bounds_checked)
+    if bounds_checked:
+        intermediate = insert_bounds_checks(intermediate)
     yield from _generate_body(intermediate, linux_syscalls, nasm=False)
-    yield from _generate_epilogue()
+    yield from _generate_epilogue(linux_syscalls, nasm=False, bounds_checked=bounds_checked)
 
 
-def generate_x86_64_nasm(intermediate: AST, *, linux_syscalls: bool) -> Iterator[str]:
-    yield from _generate_prologue_nasm(linux_syscalls)
+def generate_x86_64_nasm(intermediate: AST, *, linux_syscalls: bool, bounds_checked: bool = False) -> Iterator[str]:
+    yield from _generate_prologue_nasm(linux_syscalls, bounds_checked)
+    if bounds_checked:
+        intermediate = insert_bounds_checks(intermediate)
     yield from _generate_body(intermediate, linux_syscalls, nasm=True)
-    yield from _generate_epilogue()
+    yield from _generate_epilogue(linux_syscalls, nasm=True, bounds_checked=bounds_checked)
 
 
-def _generate_prologue_gas() -> Iterator[str]:
+def _generate_prologue_gas(linux_syscalls: bool, bounds_checked: bool) -> Iterator[str]:
     yield '    .intel_syntax noprefix'
     yield ''
     yield '    .globl run'
     yield '    .type run, @function'  # TODO: inconsistent, do it in NASM or don't do it in GAS
     yield 'run:'
+    if bounds_checked:
+        yield from _generate_bounds_setup()
+    if linux_syscalls:
+        yield from _generate_buffers_setup(nasm=False)
 
 
-def _generate_prologue_nasm(linux_syscalls: bool) -> Iterator[str]:
+def _generate_prologue_nasm(linux_syscalls: bool, bounds_checked: bool) -> Iterator[str]:
     yield '    global run'
     if not linux_syscalls:
         yield '    extern getchar, putchar'  # TODO: eliminate if IO not used, explain why not needed for i486
     yield 'run:'
+    if bounds_checked:
+        yield from _generate_bounds_setup()
+    if linux_syscalls:
+        yield from _generate_buffers_setup(nasm=True)
+
 
+def _generate_bounds_setup() -> Iterator[str]:
+    yield  '    push  r14'
+    yield  '    push  r15'
+    yield  '    mov   r14, rdi'
+    yield  '    lea   r15, [rdi + rsi]'
 
-def _generate_epilogue() -> Iterator[str]:
+
+def _generate_buffers_setup(nasm: bool) -> Iterator[str]:
+    yield  '    push  rbx'
+    yield  '    push  r12'
+    yield  '    push  r13'
+    yield f'    sub   rsp, {BUFFER_SIZE}'
+    yield  '    mov   rbx, rsp'  # output buffer
+    yield  '    xor   r12d, r12d'  # number of bytes in it
+    if nasm:
+        yield  '    lea   r13, [rel input_state]'
+    else:
+        yield  '    lea   r13, [rip + input_state]'
+
+
+def _generate_epilogue(linux_syscalls: bool, nasm: bool, bounds_checked: bool) -> Iterator[str]:
+    if bounds_checked:
+        yield  '    xor   r14d, r14d'
+        yield 'checked_return:'
+    if linux_syscalls:
+        yield  '    call  flush_output'
+        yield f'    add   rsp, {BUFFER_SIZE}'
+        yield  '    pop   r13'
+        yield  '    pop   r12'
+        yield  '    pop   rbx'
+    if bounds_checked:
+        yield  '    mov   eax, r14d'
+        yield  '    pop   r15'
+        yield  '    pop   r14'
     yield '    ret'
+    if bounds_checked:
+        # Output that was produced before is kept.
+        yield 'out_of_bounds:'
+        yield  '    mov   r14d, 1'
+        yield  '    jmp   checked_return'
+    if linux_syscalls:
+        yield from _generate_buffer_routines(nasm)
 
 
-def _generate_body(intermediate: AST, linux_syscalls: bool, nasm: bool, parent_label: str='') -> Iterator[str]:
+def _generate_buffer_routines(nasm: bool) -> Iterator[str]:
+    ptr = "" if nasm else " ptr"
+    # Write rbx[0:r12] to stdout and empty the buffer.
+    yield 'flush_output:'
+    yield  '    mov   rsi, rbx'
+    yield  '    lea   r9, [rbx + r12]'
+    yield  '    xor   r12d, r12d'
+    # Write the bytes from rsi to r9 to stdout, retrying after partial writes.
+    yield 'write_output:'
+    yield  '    mov   r8, rdi'  # syscall doesn't change r8 and r9
+    yield 'write_output_loop:'
+    yield  '    mov   rdx, r9'
+    yield  '    sub   rdx, rsi'  # length
+    yield  '    jz    write_output_done'
+    yield  '    mov   edi, 1'  # stdout
+    yield  '    mov   eax, 1'  # write
+    yield  '    syscall'
+    yield  '    test  rax, rax'
+    yield  '    jle   write_output_done'  # on errors, the output is lost
+    yield  '    add   rsi, rax'
+    yield  '    jmp   write_output_loop'
+    yield 'write_output_done:'
+    yield  '    mov   rdi, r8'
+    yield  '    ret'
+    # Return the next byte of input in eax, or 0 on EOF. The input state
+    # is the position of the next byte, the number of bytes read and the bytes.
+    yield 'read_input:'
+    yield  '    mov   rax, [r13]'
+    yield  '    cmp   rax, [r13 + 8]'
+    yield  '    jb    read_input_ready'
+    yield  '    call  flush_output'
+    yield  '    mov   r8, rdi'
+    yield  '    xor   edi, edi'  # stdin
+    yield  '    lea   rsi, [r13 + 16]'
+    yield f'    mov   edx, {BUFFER_SIZE}'  # length
+    yield  '    xor   eax, eax'  # read
+    yield  '    syscall'
+    yield  '    mov   rdi, r8'
+    yield  '    test  rax, rax'
+    yield  '    jle   read_input_eof'
+    yield  '    mov   [r13 + 8], rax'
+    yield  '    xor   eax, eax'
+    yield 'read_input_ready:'
+    yield f'    movzx ecx, byte{ptr} [r13 + rax + 16]'
+    yield  '    inc   rax'
+    yield  '    mov   [r13], rax'
+    yield  '    mov   eax, ecx'
+    yield  '    ret'
+    yield 'read_input_eof:'
+    yield  '    xor   eax, eax'
+    yield  '    mov   [r13], rax'
+    yield  '    mov   [r13 + 8], rax'
+    yield  '    ret'
     if nasm:
-        ptr = ""
-        plt = " wrt ..plt"
+        yield  '    section .bss'
+        yield  '    alignb 8'
+        yield  'input_state:'
+        yield f'    resb  {16 + BUFFER_SIZE}'
+        yield  '    section .text'
     else:
-        ptr = " ptr"
-        plt = ""  # "@plt" would work, too
+        yield  '    .pushsection .bss'
+        yield  '    .balign 8'
+        yield  'input_state:'
+        yield f'    .zero {16 + BUFFER_SIZE}'
+        yield  '    .popsection'
+
+
+def _generate_body(intermediate: AST, linux_syscalls: bool, nasm: bool, parent_label: str='') -> Iterator[str]:
+    ptr = "" if nasm else " ptr"
 
     loop_id = 0
-    input_id = 0
+    output_id = 0
+    print_id = 0
     for node in intermediate:
         match node:
-            case Add(1):
-                yield f'    inc   byte{ptr} [rdi]'
             case Add(n):
-                yield f'    add   byte{ptr} [rdi], {n}'
-            case Subtract(1):
-                yield f'    dec   byte{ptr} [rdi]'
+                yield from _add(0, n, ptr)
             case Subtract(n):
-                yield f'    sub   byte{ptr} [rdi], {n}'
+                yield from _add(0, -n, ptr)
+            case AddAt(offset, n):
+                yield from _add(offset, n, ptr)
             case Forward(1):
                 yield  '    inc   rdi'
             case Forward(n):
@@ -65,49 +191,40 @@ def _generate_body(intermediate: AST, linux_syscalls: bool, nasm: bool, parent_l
             case Back(n):
                 yield f'    sub   rdi, {n}'
             case Output(n):
-                if linux_syscalls:
-                    yield '    mov   rsi, rdi'
-                    yield '    mov   edi, 1'  # stdout
-                    yield '    mov   edx, 1'  # length
-                    sequence = [
-                        '    mov   eax, 1',  # write
-                        '    syscall'
-                    ] * n
-                    yield from sequence
-                    yield '    mov   rdi, rsi'
-                else:
-                    yield  '    push  rdi'
-                    yield f'    movzx rdi, byte{ptr} [rdi]'
-                    sequence = [f'    call  putchar{plt}', '    mov   rdi, rax'] * n
-                    yield from sequence[:-1]
-                    yield  '    pop   rdi'
+                yield from _output(0, n, linux_syscalls, nasm, f"output{parent_label}_{output_id}")
+                output_id += 1
+            case OutputAt(offset, n):
+                yield from _output(offset, n, linux_syscalls, nasm, f"output{parent_label}_{output_id}")
+                output_id += 1
             case Input(n):
-                if linux_syscalls:
-                    yield '    mov   rsi, rdi'
-                    yield '    mov   edi, 0'  # stdin
-                    yield '    mov   edx, 1'  # length
-                    sequence = [
-                        '    mov   eax, 0',  # read
-                        '    syscall'
-                    ] * n
-                    yield from sequence
-                    yield '    mov   rdi, rsi'
-                    # EOF handling: unless read returns 1 (1 byte read), write 0 to tape.
-                    label = f"read_{input_id}_done"
-                    yield  '    cmp   eax, 1'
-                    yield f'    je    {label}'
-                    yield f'    mov   byte{ptr} [rdi], 0'
-                    yield f'{label}:'
-                    input_id += 1
-                else:
-                    yield  '    push  rdi'
-                    yield from [f'    call  getchar{plt}'] * n
-                    yield  '    pop   rdi'
-                    # EOF handling: replace negative values with 0.
-                    yield  '    xor   edx, edx'
-                    yield  '    test  eax, eax'
-                    yield  '    cmovs eax, edx'
-                    yield f'    mov   byte{ptr} [rdi], al'
+                yield from _input(0, n, linux_syscalls, nasm)
+            case InputAt(offset, n):
+                yield from _input(offset, n, linux_syscalls, nasm)
+            case Print(data):
+                yield from _print(data, linux_syscalls, nasm, f"text{parent_label}_{print_id}")
+                print_id += 1
+            case Set(n):
+                yield f'    mov   byte{ptr} [rdi], {n}'
+            case SetAt(offset, n):
+                yield f'    mov   byte{ptr} [rdi{offset:+}], {n}'
+            case MulAdd(offset, 1):
+                yield f'    movzx eax, byte{ptr} [rdi]'
+                yield f'    add   byte{ptr} [rdi{offset:+}], al'
+            case MulAdd(offset, 255):
+                yield f'    movzx eax, byte{ptr} [rdi]'
+                yield f'    sub   byte{ptr} [rdi{offset:+}], al'
+            case MulAdd(offset, factor):
+                yield f'    movzx eax, byte{ptr} [rdi]'
+                yield f'    imul  eax, eax, {factor}'
+                yield f'    add   byte{ptr} [rdi{offset:+}], al'
+            case Scan(1 | -1 as stride):
+                yield from _scan(stride, f'{parent_label}_{loop_id}', nasm)
+                loop_id += 1
+            case Scan(stride):
+                # Other strides are rare, so there is nothing special about them.
+                step = Forward(stride) if stride > 0 else Back(-stride)
+                yield from _generate_body([Loop([step])], linux_syscalls, nasm, f'{parent_label}_{loop_id}')
+                loop_id += 1
             case Loop(body):
                 label = f'{parent_label}_{loop_id}'
                 yield f'start{label}:'
@@ -117,3 +234,177 @@ def _generate_body(intermediate: AST, linux_syscalls: bool, nasm: bool, parent_l
                 yield f'    jmp   start{label}'
                 yield f'end{label}:'
                 loop_id += 1
+            case DoWhile(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'start{label}:'
+                yield from _generate_body(body, linux_syscalls, nasm, label)
+                yield f'    cmp   byte{ptr} [rdi], 0'
+                yield f'    jne   start{label}'
+                loop_id += 1
+            case If(body):
+                label = f'{parent_label}_{loop_id}'
+                yield f'    cmp   byte{ptr} [rdi], 0'
+                yield f'    je    end{label}'
+                yield from _generate_body(body, linux_syscalls, nasm, label)
+                yield f'end{label}:'
+                loop_id += 1
+            case CheckBounds(low, high):
+                yield from _check_bounds(low, high)
+
+
+def _check_bounds(low: int, high: int) -> Iterator[str]:
+    if low:
+        yield f'    lea   rax, [rdi{low:+}]'
+        yield  '    cmp   rax, r14'
+    else:
+        yield  '    cmp   rdi, r14'
+    yield  '    jb    out_of_bounds'
+    if high:
+        if high != low:
+            yield f'    lea   rax, [rdi{high:+}]'
+        yield  '    cmp   rax, r15'
+    else:
+        yield  '    cmp   rdi, r15'
+    yield  '    jae   out_of_bounds'
+
+
+def _cell(offset: int, ptr: str) -> str:
+    """ Memory operand for the cell at offset from the current one. """
+    if offset:
+        return f'byte{ptr} [rdi{offset:+}]'
+    else:
+        return f'byte{ptr} [rdi]'
+
+
+def _add(offset: int, n: int, ptr: str) -> Iterator[str]:
+    cell = _cell(offset, ptr)
+    match n:
+        case 1:
+            yield f'    inc   {cell}'
+        case -1:
+            yield f'    dec   {cell}'
+        case _ if n > 0:
+            yield f'    add   {cell}, {n}'
+        case _:
+            yield f'    sub   {cell}, {-n}'
+
+
+def _output(offset: int, n: int, linux_syscalls: bool, nasm: bool, label: str) -> Iterator[str]:
+    ptr = "" if nasm else " ptr"
+    plt = " wrt ..plt" if nasm else ""  # "@plt" would work, too
+    if linux_syscalls:
+        for chunk_id, start in enumerate(range(0, n, BUFFER_SIZE)):
+            chunk = min(n - start, BUFFER_SIZE)
+            # make room for the chunk, then append it:
+            yield f'    cmp   r12, {BUFFER_SIZE - chunk}'
+            yield f'    jbe   {label}_{chunk_id}'
+            yield  '    call  flush_output'
+            yield f'{label}_{chunk_id}:'
+            yield f'    movzx eax, {_cell(offset, ptr)}'
+            for i in range(chunk):
+                yield f'    mov   [rbx + r12 + {i}], al' if i else '    mov   [rbx + r12], al'
+            yield f'    add   r12, {chunk}'
+    else:
+        yield  '    push  rdi'
+        yield f'    movzx rdi, {_cell(offset, ptr)}'
+        sequence = [f'    call  putchar{plt}', '    mov   rdi, rax'] * n
+        yield from sequence[:-1]
+        yield  '    pop   rdi'
+
+
+def _print(data: bytes, linux_syscalls: bool, nasm: bool, label: str) -> Iterator[str]:
+    plt = " wrt ..plt" if nasm else ""
+    if linux_syscalls:
+        # Constant strings are usually long, so we don't copy them to the buffer.
+        yield  '    call  flush_output'
+        if nasm:
+            yield f'    lea   rsi, [rel {label}]'
+        else:
+            yield f'    lea   rsi, [rip + {label}]'
+        yield f'    lea   r9, [rsi + {len(data)}]'
+        yield  '    call  write_output'
+        yield from _data(data, label, nasm)
+    else:
+        yield  '    push  rdi'
+        for byte in data:
+            yield f'    mov   edi, {byte}'
+            yield f'    call  putchar{plt}'
+        yield  '    pop   rdi'
+
+
+def _data(data: bytes, label: str, nasm: bool) -> Iterator[str]:
+    yield  '    section .rodata' if nasm else '    .pushsection .rodata'
+    yield f'{label}:'
+    for i in range(0, len(data), 16):
+        directive = 'db   ' if nasm else '.byte'
+        yield f'    {directive} {", ".join(map(str, data[i:i+16]))}'
+    yield  '    section .text' if nasm else '    .popsection'
+
+
+def _input(offset: int, n: int, linux_syscalls: bool, nasm: bool) -> Iterator[str]:
+    ptr = "" if nasm else " ptr"
+    plt = " wrt ..plt" if nasm else ""
+    cell = _cell(offset, ptr)
+    if linux_syscalls:
+        # read_input already returns 0 on EOF
+        yield from ['    call  read_input'] * n
+        yield f'    mov   {cell}, al'
+    else:
+        yield  '    push  rdi'
+        yield from [f'    call  getchar{plt}'] * n
+        yield  '    pop   rdi'
+        # EOF handling: replace negative values with 0.
+        yield  '    xor   edx, edx'
+        yield  '    test  eax, eax'
+        yield  '    cmovs eax, edx'
+        yield f'    mov   {cell}, al'
+
+
+def _scan(stride: int, label: str, nasm: bool) -> Iterator[str]:
+    # Look for 0 in 16 cells at a time. Aligned loads never cross a page
+    # boundary, so we never touch a page that the original loop wouldn't.
+    xmmword = "" if nasm else "xmmword ptr "
+    yield  '    pxor  xmm0, xmm0'
+    yield  '    mov   ecx, edi'
+    yield  '    and   ecx, 15'  # index of the current cell in its block
+    if stride == 1:
+        yield  '    and   rdi, -16'
+        yield f'    movdqa xmm1, {xmmword}[rdi]'
+        yield  '    pcmpeqb xmm1, xmm0'
+        yield  '    pmovmskb eax, xmm1'
+        # ignore the cells before the current one:
+        yield  '    shr   eax, cl'
+        yield  '    shl   eax, cl'
+        yield  '    test  eax, eax'
+        yield f'    jnz   found{label}'
+        yield f'scan{label}:'
+        yield  '    add   rdi, 16'
+        yield f'    movdqa xmm1, {xmmword}[rdi]'
+        yield  '    pcmpeqb xmm1, xmm0'
+        yield  '    pmovmskb eax, xmm1'
+        yield  '    test  eax, eax'
+        yield f'    jz    scan{label}'
+        yield f'found{label}:'
+        yield  '    bsf   eax, eax'
+    else:
+        yield  '    xor   ecx, 15'
+        yield  '    and   rdi, -16'
+        yield f'    movdqa xmm1, {xmmword}[rdi]'
+        yield  '    pcmpeqb xmm1, xmm0'
+        yield  '    pmovmskb eax, xmm1'
+        # ignore the cells after the current one:
+        yield  '    shl   eax, cl'
+        yield  '    and   eax, 0xFFFF'
+        yield  '    shr   eax, cl'
+        yield  '    test  eax, eax'
+        yield f'    jnz   found{label}'
+        yield f'scan{label}:'
+        yield  '    sub   rdi, 16'
+        yield f'    movdqa xmm1, {xmmword}[rdi]'
+        yield  '    pcmpeqb xmm1, xmm0'
+        yield  '    pmovmskb eax, xmm1'
+        yield  '    test  eax, eax'
+        yield f'    jz    scan{label}'
+        yield f'found{label}:'
+        yield  '    bsr   eax, eax'
+    yield  '    add   rdi, rax'
@@ -0,0 +1,77 @@
+"""
+Bounds checking for programs that can't be trusted to stay on the tape.
+"""
+
+from .intermediate import (
+    AST, Loop, If, DoWhile, MulAdd, Scan, CheckBounds,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set,
+    AddAt, SetAt, OutputAt, InputAt
+)
+
+
+def insert_bounds_checks(intermediate: AST) -> AST:
+    """
+    Put a CheckBounds node before every run of nodes without loops, for the
+    range of cells that the run accesses relative to where it starts. Cells
+    are known at compile time relative to the pointer, so moves between them
+    don't need checks of their own, and a loop body is checked once per
+    iteration, including the cell that decides whether to run it again.
+
+    Scans become loops, so every step is checked. Code generators must keep
+    the pointer where the checks see it.
+    """
+    return _insert_bounds_checks(intermediate, reads_end=False, checked=False)
+
+
+def _insert_bounds_checks(intermediate: AST, reads_end: bool, checked: bool) -> AST:
+    """
+    `reads_end`: the cell where the pointer ends is read after the code.
+    `checked`: the current cell is already known to be on the tape.
+    """
+    result: AST = []
+    run: AST = []
+    for node in intermediate:
+        if isinstance(node, Scan):
+            node = Loop([Forward(node.stride) if node.stride > 0 else Back(-node.stride)])
+        match node:
+            case Loop(body) | If(body) | DoWhile(body):
+                # The condition is read where the run ends.
+                _check_run(result, run, reads_end=True, checked=checked)
+                run = []
+                result.append(type(node)(_insert_bounds_checks(body, reads_end=not isinstance(node, If),
+                                                               checked=True)))
+                # The body of an If may move the pointer, loops end where they read the condition.
+                checked = not isinstance(node, If)
+            case _:
+                run.append(node)
+    _check_run(result, run, reads_end=reads_end, checked=checked)
+    return result
+
+
+def _check_run(result: AST, run: AST, reads_end: bool, checked: bool) -> None:
+    """ Appends the run to the result, after a check of the cells it accesses if they aren't known to be fine. """
+    position = 0
+    accessed: set[int] = set()
+    for node in run:
+        match node:
+            case Forward(n):
+                position += n
+            case Back(n):
+                position -= n
+            case Add() | Subtract() | Set() | Output() | Input():
+                accessed.add(position)
+            case AddAt(offset, _) | SetAt(offset, _) | OutputAt(offset, _) | InputAt(offset, _):
+                accessed.add(position + offset)
+            case MulAdd(offset, _):
+                accessed.update((position, position + offset))
+            case Print():
+                pass
+            case _:
+                raise NotImplementedError(f"unexpected node {node}")
+    if reads_end:
+        accessed.add(position)
+    if checked:
+        accessed.discard(0)
+    if accessed:
+        result.append(CheckBounds(min(accessed), max(accessed)))
+    result.extend(run)
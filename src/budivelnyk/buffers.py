@@ -0,0 +1,91 @@
+import ctypes
+from typing import Any, Callable
+
+
+class _Buffer(ctypes.Structure):
+    """ Py_buffer from the C API. """
+    _fields_ = [
+        ("buf", ctypes.c_void_p),
+        ("obj", ctypes.c_void_p),
+        ("len", ctypes.c_ssize_t),
+        ("itemsize", ctypes.c_ssize_t),
+        ("readonly", ctypes.c_int),
+        ("ndim", ctypes.c_int),
+        ("format", ctypes.c_char_p),
+        ("shape", ctypes.c_void_p),
+        ("strides", ctypes.c_void_p),
+        ("suboffsets", ctypes.c_void_p),
+        ("internal", ctypes.c_void_p),
+    ]
+
+
+_PyBUF_SIMPLE = 0
+_PyBUF_WRITABLE = 1
+
+_get_buffer = ctypes.pythonapi.PyObject_GetBuffer
+_get_buffer.argtypes = (ctypes.py_object, ctypes.POINTER(_Buffer), ctypes.c_int)
+_get_buffer.restype = ctypes.c_int
+_release_buffer = ctypes.pythonapi.PyBuffer_Release
+_release_buffer.argtypes = (ctypes.POINTER(_Buffer),)
+_release_buffer.restype = None
+
+
+class BufferAddress:
+    """
+    Context manager for the address and size in bytes of an object that
+    supports the buffer protocol, e.g. bytes, bytearray, memoryview or mmap,
+    without copying it. Read-only objects are accepted unless `writable` is
+    true. The buffer must be contiguous, and objects like bytearray can't be
+    resized while it's used.
+    """
+
+    __slots__ = ("_data", "_flags", "_buffer")
+
+    def __init__(self, data: object, writable: bool = False):
+        self._data = data
+        self._flags = _PyBUF_WRITABLE if writable else _PyBUF_SIMPLE
+        self._buffer = _Buffer()
+
+    def __enter__(self) -> tuple[int, int]:
+        # raises TypeError or BufferError when the object isn't suitable
+        _get_buffer(self._data, self._buffer, self._flags)
+        return self._buffer.buf or 0, self._buffer.len
+
+    def __exit__(self, *exc_info: object) -> None:
+        _release_buffer(self._buffer)
+
+
+def call_with_tape(function: Callable[[Any], Any], address_function: Callable[[int], Any], tape: object) -> None:
+    """
+    Calls `function(tape)` if the tape is a ctypes array (or bytes, which
+    ctypes accepts as well, see README), or otherwise `address_function`
+    with the address of the tape: either the tape is already an address,
+    or it's a writable buffer, e.g. a bytearray or a NumPy array of uint8,
+    which isn't copied.
+    """
+    if isinstance(tape, ctypes.Array | bytes):
+        function(tape)
+    elif isinstance(tape, int):
+        address_function(tape)
+    else:
+        with BufferAddress(tape, writable=True) as (address, _):
+            address_function(address)
+
+
+def call_with_tape_bounds(function: Callable[..., Any], tape: object, *args: Any) -> None:
+    """
+    Calls a bounds-checked `function(address, size, *args)` with the address
+    and size of the tape, which is a ctypes array or any other buffer, but
+    not an address, since the size would be unknown. Raises IndexError if
+    the program stopped because it would have left the tape.
+    """
+    if isinstance(tape, ctypes.Array):
+        result = function(ctypes.addressof(tape), ctypes.sizeof(tape), *args)
+    elif isinstance(tape, int):
+        raise TypeError("bounds-checked functions need a tape of known size, not an address")
+    else:
+        # bytes aren't writable, but see call_with_tape
+        with BufferAddress(tape, writable=not isinstance(tape, bytes)) as (address, size):
+            result = function(address, size, *args)
+    if result:
+        raise IndexError("the program left the tape")
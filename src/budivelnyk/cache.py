@@ -0,0 +1,97 @@
+"""
+In-memory cache of compiled functions, see the `cache` parameter of `Bf.to_function`.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+
+Function = Callable[..., Any]
+
+
+@dataclass(frozen=True)
+class CacheStatistics:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int  # bytes of machine code or shared libraries
+
+
+class FunctionCache:
+    """
+    Thread-safe cache of compiled functions. When there are more than
+    `max_entries` functions or they take more than `max_size` bytes, the
+    least recently used ones are dropped. Dropped functions keep working
+    for as long as they are referenced elsewhere.
+    """
+
+    def __init__(self, max_entries: int = 256, max_size: int|None = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be 1 or more")
+        if max_size is not None and max_size < 1:
+            raise ValueError("max_size must be 1 or more")
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[Function, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_compile(self, key: Hashable, compile: Callable[[], tuple[Function, int]]) -> Function:
+        """ `compile` returns the function and its size in bytes. """
+        with self._lock:
+            function = self._get(key)
+            if function is not None:
+                self._hits += 1
+                return function
+            self._misses += 1
+
+        # Compiling takes long, so other threads may use the cache meanwhile.
+        function, size = compile()
+
+        with self._lock:
+            existing = self._get(key)
+            if existing is not None:
+                return existing
+            self._entries[key] = (function, size)
+            self._size += size
+            self._evict()
+        return function
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def statistics(self) -> CacheStatistics:
+        with self._lock:
+            return CacheStatistics(self._hits, self._misses, self._evictions, len(self._entries), self._size)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: Hashable) -> Function|None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        function, size = entry
+        if getattr(function, "closed", False):
+            # closed by the caller, so it can't be used any more
+            del self._entries[key]
+            self._size -= size
+            return None
+        self._entries.move_to_end(key)
+        return function
+
+    def _evict(self) -> None:
+        # The newest entry stays even if it's bigger than max_size on its own.
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or
+                                          self.max_size is not None and self._size > self.max_size):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._size -= size
+            self._evictions += 1
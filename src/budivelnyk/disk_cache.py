@@ -0,0 +1,122 @@
+"""
+Cache of compiled code on disk, shared between processes.
+"""
+
+from __future__ import annotations
+
+import os
+import hashlib
+import tempfile
+import subprocess
+from pathlib import Path
+from functools import cache
+
+from .intermediate import AST
+
+
+ENVIRONMENT_VARIABLE = "BUDIVELNYK_CACHE_DIR"
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+class DiskCache:
+    """
+    Directory of compiled code, with one file per key. Files are written
+    under a temporary name and then renamed, so concurrent processes never
+    see partially written files. When the files take more than `max_size`
+    bytes, the least recently used ones are deleted.
+    """
+
+    def __init__(self, directory: str|os.PathLike[str], max_size: int = DEFAULT_MAX_SIZE):
+        if max_size < 1:
+            raise ValueError("max_size must be 1 or more")
+        self.directory = Path(directory).expanduser()
+        self.max_size = max_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def from_environment() -> DiskCache|None:
+        """ The cache in the directory named by BUDIVELNYK_CACHE_DIR, if it is set. """
+        directory = os.environ.get(ENVIRONMENT_VARIABLE)
+        return DiskCache(directory) if directory else None
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> bytes|None:
+        path = self.directory / key
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # for eviction, the modification time is the time of the last use
+        except FileNotFoundError:  # e.g. evicted by another process
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temporary_file:
+                temporary_file.write(data)
+            os.replace(temporary_path, self.directory / key)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        self._evict()
+
+    def clear(self) -> None:
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+
+    def size(self) -> int:
+        return sum(size for _, _, size in self._stat_entries())
+
+    def _entries(self) -> list[Path]:
+        return [path for path in self.directory.iterdir() if not path.name.startswith(".tmp-")]
+
+    def _stat_entries(self) -> list[tuple[Path, float, int]]:
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._stat_entries()
+        total = sum(size for _, _, size in entries)
+        entries.sort(key=lambda entry: entry[1])
+        # The newest entry stays even if it's bigger than max_size on its own.
+        for path, _, size in entries[:-1]:
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def intermediate_hash(intermediate: AST) -> str:
+    return hashlib.sha256(repr(intermediate).encode()).hexdigest()
+
+
+@cache
+def compiler_version() -> str:
+    """ Hash of budivelnyk's own source code, which determines the generated code. """
+    digest = hashlib.sha256()
+    package = Path(__file__).parent
+    for path in sorted(package.rglob("*.py")):
+        digest.update(path.relative_to(package).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+@cache
+def tool_version(*command: str) -> str:
+    """ First line of the output of e.g. `cc --version`. """
+    result = subprocess.run(command, capture_output=True, text=True)
+    lines = (result.stdout or result.stderr).splitlines()
+    return lines[0] if lines else ""
@@ -1,15 +1,29 @@
-from typing import Callable, Iterator, TypeVar, Type
+from typing import Any, Callable, Iterable, Iterator, Literal, TypeVar, Type, overload
+import os
 import shutil
-from ctypes import CDLL
+import hashlib
+from ctypes import CDLL, c_int, c_size_t, c_void_p
+from functools import partial
 from platform import system
 from tempfile import NamedTemporaryFile
 from abc import ABC, abstractmethod
 
 from ..intermediate import AST
+from .. import optimizer
+from ..optimizer import DEFAULT_LEVEL, PassStatistics
 from ..tape import Tape
+from ..buffers import call_with_tape, call_with_tape_bounds
+from ..tape_pool import PooledTapeFunction
+from ..analysis import TapeRequirements, tape_requirements
+from ..cache import FunctionCache
+from ..disk_cache import DiskCache, intermediate_hash, compiler_version, tool_version
 from ..backends import Backend
-from ..backends.jit import intermediate_to_function, UseJIT, jit_implemented
+from ..backends.elf_x86_64 import generate_elf_x86_64
+from ..backends.jit import (
+    intermediate_to_function, intermediate_to_memory_function, MemoryIOFunction, UseJIT, jit_implemented
+)
 from .helpers import run_and_maybe_fail
+from .batch import BatchResult, run_batch
 
 
 T = TypeVar('T', bound='Frontend')
@@ -18,68 +32,229 @@ T = TypeVar('T', bound='Frontend')
 class Frontend(ABC):
     @staticmethod
     @abstractmethod
-    def to_intermediate(code: str) -> AST:
+    def _to_unoptimized_intermediate(code: str) -> AST:
         ...
 
     @classmethod
-    def to_function(cls: Type[T], code: str, *, use_jit: UseJIT = UseJIT.default()) -> Callable[[Tape], None]:
-        intermediate: AST = cls.to_intermediate(code)
-        match use_jit:
-            case UseJIT.LIBC:
-                return intermediate_to_function(intermediate, linux_syscalls=False)
-            case UseJIT.SYSCALLS:
-                return intermediate_to_function(intermediate, linux_syscalls=True)
-            case UseJIT.NO:
-                with NamedTemporaryFile() as library_file:
-                    library_path = library_file.name
-                    _intermediate_to_shared(intermediate, library_path, Backend.suggest())
-                    func = CDLL(library_path).run
-                    func.restype = None
-                    return func
+    def to_intermediate(cls: Type[T], code: str, *, optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                        statistics: list[PassStatistics]|None = None) -> AST:
+        intermediate: AST = cls._to_unoptimized_intermediate(code)
+        return optimizer.optimize(intermediate, optimize, blank_tape=blank_tape, statistics=statistics)
 
     @classmethod
-    def to_asm(cls: Type[T], code: str, *, backend: Backend = Backend.suggest()) -> Iterator[str]:
-        intermediate: AST = cls.to_intermediate(code)
-        yield from backend.intermediate_to_asm(intermediate)
+    def _to_intermediate(cls: Type[T], code: str, optimize: int, blank_tape: bool, bounds_checked: bool) -> AST:
+        # With a blank tape, the optimizer folds away reads of cells that
+        # were never written, so the bounds checks wouldn't see them.
+        return cls.to_intermediate(code, optimize=optimize, blank_tape=blank_tape and not bounds_checked)
 
     @classmethod
-    def file_to_asm_file(cls: Type[T], input_path: str, output_path: str, *, backend: Backend = Backend.suggest()) -> None:
+    def tape_requirements(cls: Type[T], code: str, *, optimize: int = DEFAULT_LEVEL,
+                          blank_tape: bool = False) -> TapeRequirements:
+        """ The cells that the code compiled with these options may access, see TapeRequirements. """
+        return tape_requirements(cls.to_intermediate(code, optimize=optimize, blank_tape=blank_tape))
+
+    @overload
+    @classmethod
+    def to_function(cls: Type[T], code: str, *, use_jit: UseJIT = ...,
+                    optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                    cache: FunctionCache|None = None,
+                    disk_cache: DiskCache|None = None, auto_tape: Literal[True],
+                    bounds_checked: Literal[False] = False) -> PooledTapeFunction:
+        ...
+
+    @overload
+    @classmethod
+    def to_function(cls: Type[T], code: str, *, use_jit: Literal[UseJIT.MEMORY],
+                    optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                    cache: FunctionCache|None = None,
+                    disk_cache: DiskCache|None = None, auto_tape: Literal[False] = False,
+                    bounds_checked: bool = False) -> MemoryIOFunction:
+        ...
+
+    @overload
+    @classmethod
+    def to_function(cls: Type[T], code: str, *, use_jit: Literal[UseJIT.LIBC, UseJIT.SYSCALLS, UseJIT.NO] = ...,
+                    optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                    cache: FunctionCache|None = None,
+                    disk_cache: DiskCache|None = None, auto_tape: Literal[False] = False,
+                    bounds_checked: bool = False) -> Callable[[Tape], None]:
+        ...
+
+    @classmethod
+    def to_function(cls: Type[T], code: str, *, use_jit: UseJIT = UseJIT.default(),
+                    optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                    cache: FunctionCache|None = None,
+                    disk_cache: DiskCache|None = None, auto_tape: bool = False,
+                    bounds_checked: bool = False) -> Callable[..., Any]:
+        if auto_tape and bounds_checked:
+            raise ValueError("auto_tape tapes are always large enough, so they don't need bounds_checked")
+        disk_cache = disk_cache or DiskCache.from_environment()
+        if cache is None:
+            function, _ = cls._compile_function(code, use_jit, optimize, blank_tape, disk_cache, auto_tape,
+                                                bounds_checked)
+            return function
+        key = (cls, hashlib.sha256(code.encode()).digest(), use_jit, optimize, blank_tape, auto_tape, bounds_checked)
+        return cache.get_or_compile(
+            key, lambda: cls._compile_function(code, use_jit, optimize, blank_tape, disk_cache, auto_tape,
+                                               bounds_checked))
+
+    @classmethod
+    def _compile_function(cls: Type[T], code: str, use_jit: UseJIT, optimize: int, blank_tape: bool,
+                          disk_cache: DiskCache|None, auto_tape: bool,
+                          bounds_checked: bool) -> tuple[Callable[..., Any], int]:
+        """ Returns the function and the size of its machine code or shared library. """
+        intermediate: AST = cls._to_intermediate(code, optimize, blank_tape, bounds_checked)
+        if not auto_tape:
+            return _intermediate_to_function(intermediate, use_jit, disk_cache, bounds_checked)
+
+        requirements = tape_requirements(intermediate)
+        if requirements.size is None or requirements.start is None:
+            raise ValueError(f"the tape size can't be determined for auto_tape: {requirements}")
+        function, size = _intermediate_to_function(intermediate, use_jit, disk_cache)
+        return PooledTapeFunction(function, requirements.size, requirements.start), size
+
+    @classmethod
+    def to_asm(cls: Type[T], code: str, *, backend: Backend = Backend.suggest(),
+               optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+               bounds_checked: bool = False) -> Iterator[str]:
+        intermediate: AST = cls._to_intermediate(code, optimize, blank_tape, bounds_checked)
+        yield from backend.intermediate_to_asm(intermediate, bounds_checked)
+
+    @classmethod
+    def file_to_asm_file(cls: Type[T], input_path: str, output_path: str, *, backend: Backend = Backend.suggest(),
+                         optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                         bounds_checked: bool = False) -> None:
         with open(input_path) as input_file:
             code = input_file.read()
 
-        cls._to_asm_file(code, output_path, backend=backend)
+        cls._to_asm_file(code, output_path, backend=backend, optimize=optimize, blank_tape=blank_tape,
+                         bounds_checked=bounds_checked)
 
     @classmethod
-    def to_shared(cls: Type[T], code: str, output_path: str, *, backend: Backend = Backend.suggest()) -> None:
-        intermediate: AST = cls.to_intermediate(code)
-        _intermediate_to_shared(intermediate, output_path, backend)
+    def to_shared(cls: Type[T], code: str, output_path: str, *, backend: Backend = Backend.suggest(),
+                  optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                  disk_cache: DiskCache|None = None, direct: bool = False, bounds_checked: bool = False) -> None:
+        intermediate: AST = cls._to_intermediate(code, optimize, blank_tape, bounds_checked)
+        if direct:
+            _intermediate_to_elf(intermediate, output_path, backend, bounds_checked)
+        else:
+            _intermediate_to_shared(intermediate, output_path, backend, disk_cache or DiskCache.from_environment(),
+                                    bounds_checked)
 
     @classmethod
-    def file_to_shared(cls: Type[T], input_path: str, output_path: str, *, backend: Backend = Backend.suggest()) -> None:
+    def file_to_shared(cls: Type[T], input_path: str, output_path: str, *, backend: Backend = Backend.suggest(),
+                       optimize: int = DEFAULT_LEVEL, blank_tape: bool = False,
+                       disk_cache: DiskCache|None = None, direct: bool = False, bounds_checked: bool = False) -> None:
         with open(input_path) as input_file:
             code = input_file.read()
 
-        cls.to_shared(code, output_path, backend=backend)
+        cls.to_shared(code, output_path, backend=backend, optimize=optimize, blank_tape=blank_tape,
+                      disk_cache=disk_cache, direct=direct, bounds_checked=bounds_checked)
+
+    @classmethod
+    def files_to_asm_files_many(cls: Type[T], pairs: Iterable[tuple[str, str]], *,
+                                backend: Backend = Backend.suggest(), optimize: int = DEFAULT_LEVEL,
+                                blank_tape: bool = False, bounds_checked: bool = False,
+                                workers: int|None = None) -> list[BatchResult]:
+        """ Like file_to_asm_file for every (input_path, output_path) pair, in parallel. """
+        return run_batch(cls.file_to_asm_file, pairs, workers, backend=backend, optimize=optimize,
+                         blank_tape=blank_tape, bounds_checked=bounds_checked)
+
+    @classmethod
+    def files_to_shared_many(cls: Type[T], pairs: Iterable[tuple[str, str]], *,
+                             backend: Backend = Backend.suggest(), optimize: int = DEFAULT_LEVEL,
+                             blank_tape: bool = False, disk_cache: DiskCache|None = None,
+                             direct: bool = False, bounds_checked: bool = False,
+                             workers: int|None = None) -> list[BatchResult]:
+        """ Like file_to_shared for every (input_path, output_path) pair, in parallel. """
+        return run_batch(cls.file_to_shared, pairs, workers, backend=backend, optimize=optimize,
+                         blank_tape=blank_tape, disk_cache=disk_cache, direct=direct, bounds_checked=bounds_checked)
 
     @classmethod
-    def _to_asm_file(cls: Type[T], code: str, output_path: str, backend: Backend) -> None:
-        lines = cls.to_asm(code, backend=backend)
+    def _to_asm_file(cls: Type[T], code: str, output_path: str, backend: Backend,
+                     optimize: int, blank_tape: bool, bounds_checked: bool) -> None:
+        lines = cls.to_asm(code, backend=backend, optimize=optimize, blank_tape=blank_tape,
+                           bounds_checked=bounds_checked)
 
         with open(output_path, 'w') as output_file:
             print(*lines, sep="\n", file=output_file)
 
 
-def _intermediate_to_shared(intermediate: AST, output_path: str, backend: Backend) -> None:
+def _intermediate_to_function(intermediate: AST, use_jit: UseJIT, disk_cache: DiskCache|None,
+                              bounds_checked: bool = False) -> tuple[Callable[..., Any], int]:
+    """ Returns the function and the size of its machine code or shared library. """
+    match use_jit:
+        case UseJIT.LIBC | UseJIT.SYSCALLS:
+            function = intermediate_to_function(intermediate, linux_syscalls=use_jit is UseJIT.SYSCALLS,
+                                                disk_cache=disk_cache, bounds_checked=bounds_checked)
+            return function, function.size
+        case UseJIT.MEMORY:
+            memory_function = intermediate_to_memory_function(intermediate, disk_cache=disk_cache,
+                                                              bounds_checked=bounds_checked)
+            return memory_function, memory_function.size
+        case UseJIT.NO:
+            with NamedTemporaryFile() as library_file:
+                library_path = library_file.name
+                _intermediate_to_shared(intermediate, library_path, Backend.suggest(), disk_cache, bounds_checked)
+                library = CDLL(library_path)
+                if bounds_checked:
+                    checked_func = library["run"]
+                    checked_func.restype = c_int
+                    checked_func.argtypes = [c_void_p, c_size_t]
+                    return partial(call_with_tape_bounds, checked_func), os.path.getsize(library_path)
+                # see JITFunction for why there are two prototypes
+                func, address_func = library["run"], library["run"]
+                func.restype = address_func.restype = None
+                address_func.argtypes = [c_void_p]
+                return partial(call_with_tape, func, address_func), os.path.getsize(library_path)
+
+
+def _intermediate_to_shared(intermediate: AST, output_path: str, backend: Backend,
+                            disk_cache: DiskCache|None = None, bounds_checked: bool = False) -> None:
     nasm: bool = backend in (Backend.X86_32_NASM, Backend.X86_64_NASM, Backend.X86_64_LINUX_SYSCALLS_NASM)
     if not shutil.which("cc"):
         raise RuntimeError("cc not found")
     if nasm and not shutil.which("nasm"):
         raise RuntimeError("nasm not found")
 
+    if disk_cache is None:
+        _build_shared(intermediate, output_path, backend, nasm, bounds_checked)
+        return
+
+    toolchain = [tool_version("cc", "--version")]
+    if nasm:
+        toolchain.append(tool_version("nasm", "-v"))
+    variant = backend.name + ("_BOUNDS_CHECKED" if bounds_checked else "")
+    key = DiskCache.key("shared", variant, *toolchain, compiler_version(), intermediate_hash(intermediate))
+    library = disk_cache.get(key)
+    if library is None:
+        _build_shared(intermediate, output_path, backend, nasm, bounds_checked)
+        with open(output_path, "rb") as library_file:
+            disk_cache.put(key, library_file.read())
+    else:
+        with open(output_path, "wb") as library_file:
+            library_file.write(library)
+
+
+def _intermediate_to_elf(intermediate: AST, output_path: str, backend: Backend, bounds_checked: bool) -> None:
+    match backend:
+        case Backend.X86_64_GAS_ATT | Backend.X86_64_GAS_INTEL | Backend.X86_64_NASM:
+            library = generate_elf_x86_64(intermediate, linux_syscalls=False, bounds_checked=bounds_checked)
+        case (Backend.X86_64_LINUX_SYSCALLS_GAS_ATT | Backend.X86_64_LINUX_SYSCALLS_GAS_INTEL |
+              Backend.X86_64_LINUX_SYSCALLS_NASM):
+            library = generate_elf_x86_64(intermediate, linux_syscalls=True, bounds_checked=bounds_checked)
+        case _:
+            raise ValueError(f"shared libraries can only be written directly for x86_64 backends, not {backend.name}")
+
+    with open(output_path, "wb") as library_file:
+        library_file.write(library)
+
+
+def _build_shared(intermediate: AST, output_path: str, backend: Backend, nasm: bool, bounds_checked: bool) -> None:
     with (NamedTemporaryFile(suffix=".s") as asm_file,
           NamedTemporaryFile(suffix=".o") as object_file):
         asm_path, object_path = asm_file.name, object_file.name
-        _intermediate_to_asm_file(intermediate, asm_path, backend=backend)
+        _intermediate_to_asm_file(intermediate, asm_path, backend, bounds_checked)
         # assemble:
         if nasm:
             bits = 32 if backend == Backend.X86_32_NASM else 64
@@ -92,8 +267,8 @@ def _intermediate_to_shared(intermediate: AST, output_path: str, backend: Backen
         run_and_maybe_fail("cc", "-z", "noexecstack", SHARED, object_path, "-o", output_path)
 
 
-def _intermediate_to_asm_file(intermediate: AST, output_path: str, backend: Backend) -> None:
-    lines = backend.intermediate_to_asm(intermediate)
+def _intermediate_to_asm_file(intermediate: AST, output_path: str, backend: Backend, bounds_checked: bool) -> None:
+    lines = backend.intermediate_to_asm(intermediate, bounds_checked)
 
     with open(output_path, 'w') as output_file:
         print(*lines, sep="\n", file=output_file)
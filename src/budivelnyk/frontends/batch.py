@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable
+
+
+@dataclass
+class BatchResult:
+    """ Outcome of compiling one file in a batch. """
+    input_path: str
+    output_path: str
+    error: BaseException|None = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_batch(function: Callable[..., None], pairs: Iterable[tuple[str, str]],
+              workers: int|None, **options: Any) -> list[BatchResult]:
+    """
+    Calls function(input_path, output_path, **options) for every pair, in
+    `workers` processes. An error only affects the result of its own pair.
+    """
+    pairs = list(pairs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be 1 or more")
+
+    if workers == 1 or len(pairs) <= 1:
+        return [_timed(function, input_path, output_path, options) for input_path, output_path in pairs]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(pairs))) as executor:
+        futures = [executor.submit(_timed, function, input_path, output_path, options)
+                   for input_path, output_path in pairs]
+        results = []
+        for (input_path, output_path), future in zip(pairs, futures):
+            try:
+                results.append(future.result())
+            except Exception as error:
+                # e.g. a worker died, or the error couldn't be pickled
+                results.append(BatchResult(input_path, output_path, error))
+        return results
+
+
+def _timed(function: Callable[..., None], input_path: str, output_path: str,
+           options: dict[str, Any]) -> BatchResult:
+    result = BatchResult(input_path, output_path)
+    start = time.perf_counter()
+    try:
+        function(input_path, output_path, **options)
+    except Exception as error:
+        result.error = error
+    result.seconds = time.perf_counter() - start
+    return result
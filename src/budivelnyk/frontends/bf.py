@@ -92,24 +92,35 @@ def _parse_bf(code: str, position: Position, expect_closing_bracket: bool) -> It
         raise ValueError('Closing bracket expected, reached end of file instead')
 
 
-def _parsed_to_intermediate(ast: AST) -> Iterable[intermediate.Node]:
-    for (_, g) in groupby(ast, type):
+def _category(node: Node) -> type[Node]|str:
+    # Runs of + and -, or of > and <, are folded together, e.g. +-+ is
+    # the same as +, so we group them by what they change.
+    match node:
+        case Inc() | Dec():
+            return "arithmetic"
+        case Forward() | Back():
+            return "pointer"
+        case _:
+            return type(node)
+
+
+def _parsed_to_intermediate(ast: AST) -> intermediate.AST:
+    result: intermediate.AST = []
+    for (_, g) in groupby(ast, _category):
         group = list(g)
         count = len(group)
         specimen = group[0]
         match specimen:
-            case Inc():
-                yield intermediate.Add(count)  # TODO: check for byte overflow in add and subtract
-            case Dec():
-                yield intermediate.Subtract(count)
-            case Forward():
-                yield intermediate.Forward(count)
-            case Back():
-                yield intermediate.Back(count)
+            case Inc() | Dec():
+                n = sum(1 if isinstance(node, Inc) else -1 for node in group)
+                _append_arithmetic(result, n)
+            case Forward() | Back():
+                n = sum(1 if isinstance(node, Forward) else -1 for node in group)
+                _append_pointer(result, n)
             case Output():
-                yield intermediate.Output(count)
+                result.append(intermediate.Output(count))
             case Input():
-                yield intermediate.Input(count)
+                result.append(intermediate.Input(count))
             case Loop(body):
                 # We optimize consecutive loops of the form [a][b][c] into [a].
                 # After the execution of the first loop the current cell always
@@ -119,11 +130,44 @@ def _parsed_to_intermediate(ast: AST) -> Iterable[intermediate.Node]:
                     position = second_group.starts_at
                     assert position is not None  # It's only None if we generate nodes manually, not if we parse bf code.
                     warn(f"Unreachable code eliminated at line {position.line}, column {position.column}", RuntimeWarning)
-                yield intermediate.Loop(list(_parsed_to_intermediate(body)))
+                result.append(intermediate.Loop(_parsed_to_intermediate(body)))
+    return result
+
+
+def _append_arithmetic(result: intermediate.AST, n: int) -> None:
+    # A run like +-> that cancels out may leave two runs of + and - next
+    # to each other, so we merge them with the previous node.
+    match result[-1:]:
+        case [intermediate.Add(m)]:
+            n += m
+            result.pop()
+        case [intermediate.Subtract(m)]:
+            n -= m
+            result.pop()
+    # Cells are bytes, so only n mod 256 matters. We emit the shorter direction.
+    n %= 256
+    if 0 < n <= 128:
+        result.append(intermediate.Add(n))
+    elif n > 128:
+        result.append(intermediate.Subtract(256 - n))
+
+
+def _append_pointer(result: intermediate.AST, n: int) -> None:
+    match result[-1:]:
+        case [intermediate.Forward(m)]:
+            n += m
+            result.pop()
+        case [intermediate.Back(m)]:
+            n -= m
+            result.pop()
+    if n > 0:
+        result.append(intermediate.Forward(n))
+    elif n < 0:
+        result.append(intermediate.Back(-n))
 
 
 class Bf(Frontend):
     @staticmethod
-    def to_intermediate(code: str) -> intermediate.AST:
+    def _to_unoptimized_intermediate(code: str) -> intermediate.AST:
         parsed: AST = parse_bf(code)
-        return list(_parsed_to_intermediate(parsed))
+        return _parsed_to_intermediate(parsed)
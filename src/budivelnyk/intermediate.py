@@ -39,7 +39,68 @@ class Input(Node):
     """ Get multiple input values and store the last one in current cell. """
     count: int
 
+@dataclass
+class Print(Node):
+    """ Output constant bytes, e.g. output that was computed at compile time. """
+    data: bytes
+
+@dataclass
+class Set(Node):
+    """ Set current cell's value to constant, e.g. [-] sets it to 0. """
+    constant: int
+
+@dataclass
+class MulAdd(Node):
+    """ Add current cell's value multiplied by factor to the cell at offset. """
+    offset: int
+    factor: int
+
+@dataclass
+class Scan(Node):
+    """ Move cell pointer by stride until current cell's value is 0, e.g. [>] or [<<]. """
+    stride: int
+
+@dataclass
+class AddAt(Node):
+    """ Add constant to the value of the cell at offset from the current one. """
+    offset: int
+    constant: int  # negative to subtract
+
+@dataclass
+class SetAt(Node):
+    """ Set the value of the cell at offset from the current one to constant. """
+    offset: int
+    constant: int
+
+@dataclass
+class OutputAt(Node):
+    """ Output the value of the cell at offset from the current one multiple times. """
+    offset: int
+    count: int
+
+@dataclass
+class InputAt(Node):
+    """ Get multiple input values and store the last one in the cell at offset from the current one. """
+    offset: int
+    count: int
+
 @dataclass
 class Loop(Node):
     """ [] """
     body: AST
+
+@dataclass
+class If(Node):
+    """ Execute body once if current cell's value is not 0. """
+    body: AST
+
+@dataclass
+class DoWhile(Node):
+    """ Like Loop, but the current cell's value is known not to be 0 before the first iteration. """
+    body: AST
+
+@dataclass
+class CheckBounds(Node):
+    """ Stop with an error unless the cells from offset low to high from the current one are on the tape. """
+    low: int
+    high: int
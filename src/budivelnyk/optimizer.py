@@ -0,0 +1,79 @@
+"""
+Run the passes from .passes on the intermediate AST, depending on the optimization level.
+"""
+
+import time
+import logging
+from typing import Callable, NamedTuple
+from dataclasses import dataclass
+from functools import partial
+
+from .intermediate import AST, Loop, If, DoWhile
+from .passes import simplify_loops, evaluate_prefix, propagate_constants, sink_pointer_moves
+
+
+logger = logging.getLogger(__name__)
+
+
+class Pass(NamedTuple):
+    name: str
+    level: int  # the lowest optimization level that runs the pass
+    function: Callable[[AST], AST]
+
+
+def _passes(blank_tape: bool) -> tuple[Pass, ...]:
+    # In the order they are run:
+    return (
+        Pass("simplify loops", 1, simplify_loops),
+        Pass("evaluate prefix", 2, partial(evaluate_prefix, blank_tape=blank_tape)),
+        Pass("propagate constants", 2, partial(propagate_constants, blank_tape=blank_tape)),
+        Pass("sink pointer moves", 2, sink_pointer_moves),
+    )
+
+
+PASSES: tuple[Pass, ...] = _passes(blank_tape=False)
+
+MAX_LEVEL: int = max(p.level for p in PASSES)
+DEFAULT_LEVEL: int = 2
+
+
+@dataclass
+class PassStatistics:
+    name: str
+    seconds: float
+    nodes_before: int
+    nodes_after: int
+
+
+def optimize(intermediate: AST, level: int = DEFAULT_LEVEL, *, blank_tape: bool = False,
+             statistics: list[PassStatistics]|None = None) -> AST:
+    """
+    Run every pass up to the given level. Level 0 doesn't change the AST.
+    With `blank_tape`, the passes may assume that all cells are 0 at the start.
+    If `statistics` is given, the time and node count of every pass is appended to it.
+    """
+    if level < 0:
+        raise ValueError(f"optimization level must be 0 or more, got {level}")
+
+    for name, pass_level, function in _passes(blank_tape):
+        if pass_level > level:
+            continue
+        nodes_before = count_nodes(intermediate)
+        start = time.perf_counter()
+        intermediate = function(intermediate)
+        seconds = time.perf_counter() - start
+        nodes_after = count_nodes(intermediate)
+        logger.debug("%s: %.3f ms, %d -> %d nodes", name, seconds * 1000, nodes_before, nodes_after)
+        if statistics is not None:
+            statistics.append(PassStatistics(name, seconds, nodes_before, nodes_after))
+    return intermediate
+
+
+def count_nodes(intermediate: AST) -> int:
+    count = 0
+    for node in intermediate:
+        count += 1
+        match node:
+            case Loop(body) | If(body) | DoWhile(body):
+                count += count_nodes(body)
+    return count
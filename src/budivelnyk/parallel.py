@@ -0,0 +1,64 @@
+"""
+Running one compiled function over many tapes in parallel.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence, Iterable
+
+from .tape import Tape
+
+
+# Tasks are handed to threads in chunks, a few per thread, which keeps the
+# overhead low for small tapes and still balances uneven ones.
+_CHUNKS_PER_WORKER = 4
+
+
+def run_many(function: Callable[..., Any], tapes: Iterable[Tape], *,
+             inputs: Sequence[object]|None = None, outputs: Sequence[object]|None = None,
+             workers: int|None = None) -> list[Any]:
+    """
+    Calls `function(tape)` for every tape, in `workers` threads, and returns
+    the results in the same order. Compiled code runs without holding the GIL,
+    so the calls run on several cores at once.
+
+    Functions compiled with UseJIT.MEMORY get their own input and output for
+    every tape: they are called as `function(tape, inputs[i], outputs[i])`,
+    and the results are the numbers of bytes consumed and produced.
+    Other functions share the standard input and output of the process, so
+    their output may be interleaved and they shouldn't read input.
+
+    If a call raises an exception, it's raised here after the other calls
+    finish.
+    """
+    tapes = list(tapes)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be 1 or more")
+    for name, buffers in (("inputs", inputs), ("outputs", outputs)):
+        if buffers is not None and len(buffers) != len(tapes):
+            raise ValueError(f"there must be as many {name} as tapes")
+
+    tasks: list[tuple[Any, ...]]
+    if inputs is None and outputs is None:
+        tasks = [(tape,) for tape in tapes]
+    else:
+        tasks = [(tape, b"" if inputs is None else inputs[i], None if outputs is None else outputs[i])
+                 for i, tape in enumerate(tapes)]
+
+    if workers == 1 or len(tasks) <= 1:
+        return [function(*task) for task in tasks]
+
+    workers = min(workers, len(tasks))
+    chunk_size = max(1, len(tasks) // (workers * _CHUNKS_PER_WORKER))
+    chunks = [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_chunk, function, chunk) for chunk in chunks]
+        return [result for future in futures for result in future.result()]
+
+
+def _run_chunk(function: Callable[..., Any], chunk: list[tuple[Any, ...]]) -> list[Any]:
+    return [function(*task) for task in chunk]
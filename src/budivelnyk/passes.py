@@ -0,0 +1,480 @@
+"""
+Transformations of the intermediate AST that make the generated code faster.
+"""
+
+from dataclasses import dataclass, field
+
+from .intermediate import (
+    AST, Node, Loop, If, DoWhile, MulAdd, Scan,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set,
+    AddAt, SetAt, OutputAt, InputAt
+)
+
+
+def simplify_loops(intermediate: AST) -> AST:
+    """
+    Replace loops that follow common patterns, e.g. [-], [->+<] or [>],
+    with nodes that don't have to run once per iteration.
+    """
+    result: AST = []
+    for node in intermediate:
+        match node:
+            case Loop(body):
+                result.extend(_simplify_loop(simplify_loops(body)))
+            case If(body):
+                result.append(If(simplify_loops(body)))
+            case DoWhile(body):
+                result.append(DoWhile(simplify_loops(body)))
+            case _:
+                result.append(node)
+    return result
+
+
+def _simplify_loop(body: AST) -> AST:
+    # Loops like [>] or [<<] look for the next cell that contains 0.
+    match body:
+        case [Forward(n)]:
+            return [Scan(n)]
+        case [Back(n)]:
+            return [Scan(-n)]
+
+    # Loops like [-] or [->+++>++<<] don't do I/O, don't contain other loops
+    # and return to the cell they started from. They only change a fixed set
+    # of cells by fixed amounts per iteration, so they can be replaced with
+    # multiplications followed by clearing the current cell.
+    changes: dict[int, int] = {}  # offset -> net change per iteration
+    offset = 0
+    for node in body:
+        match node:
+            case Add(n):
+                changes[offset] = changes.get(offset, 0) + n
+            case Subtract(n):
+                changes[offset] = changes.get(offset, 0) - n
+            case Forward(n):
+                offset += n
+            case Back(n):
+                offset -= n
+            case _:
+                return [Loop(body)]
+
+    step = changes.pop(0, 0) % 256
+    # If the current cell changes by an odd amount per iteration, it reaches
+    # 0 after at most 256 iterations no matter what it contained. If it
+    # changes by an even amount, e.g. [--], the loop might never terminate.
+    if offset != 0 or step % 2 == 0:
+        return [Loop(body)]
+
+    # The loop runs k times, where value + k * step = 0 (mod 256), so every
+    # other cell changes by k * change = value * (-change / step) (mod 256).
+    inverse = pow(step, -1, 256)
+    factors = {target: -change * inverse % 256 for target, change in changes.items()}
+    mul_adds: AST = [MulAdd(target, factor) for target, factor in factors.items() if factor]
+    if not mul_adds:
+        return [Set(0)]
+    # The original loop doesn't touch other cells if the current one is 0,
+    # and neither may we, e.g. [->+<] on the last cell of the tape.
+    return [If([*mul_adds, Set(0)])]
+
+
+EVALUATION_BUDGET: int = 100_000  # nodes executed at compile time
+
+
+class _Stop(Exception):
+    """ The compile-time evaluation can't or shouldn't go any further. """
+
+
+def evaluate_prefix(intermediate: AST, *, blank_tape: bool = False, budget: int = EVALUATION_BUDGET) -> AST:
+    """
+    Run the code at compile time until the first input, and replace the part
+    that has been run with its effect: the output it printed and the cells
+    it changed. This is only possible if the tape is blank at the start.
+    Loops are either run to the end or not at all, and we give up on loops
+    that take more than `budget` steps.
+    """
+    if not blank_tape:
+        return intermediate
+
+    evaluator = _Evaluator(budget)
+    done = 0
+    for node in intermediate:
+        state = evaluator.save()
+        try:
+            evaluator.run(node)
+        except _Stop:
+            evaluator.restore(state)
+            break
+        done += 1
+    if done == 0:
+        return intermediate
+
+    result: AST = []
+    if evaluator.output:
+        result.append(Print(bytes(evaluator.output)))
+    position = 0
+    for cell, value in sorted(evaluator.tape.items()):
+        if value:
+            result.extend(_move(cell - position))
+            result.append(Set(value))
+            position = cell
+    result.extend(_move(evaluator.position - position))
+    return result + intermediate[done:]
+
+
+def _move(n: int) -> AST:
+    if n > 0:
+        return [Forward(n)]
+    elif n < 0:
+        return [Back(-n)]
+    return []
+
+
+class _Evaluator:
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.tape: dict[int, int] = {}
+        self.position = 0
+        self.output = bytearray()
+
+    def save(self) -> tuple[dict[int, int], int, int]:
+        return dict(self.tape), self.position, len(self.output)
+
+    def restore(self, state: tuple[dict[int, int], int, int]) -> None:
+        self.tape, self.position, output_length = state
+        del self.output[output_length:]
+
+    def cell(self, offset: int = 0) -> int:
+        return self.tape.get(self._on_tape(self.position + offset), 0)
+
+    def store(self, value: int, offset: int = 0) -> None:
+        self.tape[self._on_tape(self.position + offset)] = value % 256
+
+    @staticmethod
+    def _on_tape(position: int) -> int:
+        # Cells left of the start are outside of the tape. Running the code
+        # would crash, and we shouldn't hide that at compile time.
+        if position < 0:
+            raise _Stop()
+        return position
+
+    def run(self, node: Node) -> None:
+        self.budget -= 1
+        if self.budget < 0:
+            raise _Stop()
+        match node:
+            case Add(n) | AddAt(0, n):
+                self.store(self.cell() + n)
+            case Subtract(n):
+                self.store(self.cell() - n)
+            case AddAt(offset, n):
+                self.store(self.cell(offset) + n, offset)
+            case Set(n):
+                self.store(n)
+            case SetAt(offset, n):
+                self.store(n, offset)
+            case Forward(n):
+                self.position += n
+            case Back(n):
+                self.position -= n
+            case Output(n):
+                self.output.extend([self.cell()] * n)
+            case OutputAt(offset, n):
+                self.output.extend([self.cell(offset)] * n)
+            case Print(data):
+                self.output.extend(data)
+            case MulAdd(offset, factor):
+                self.store(self.cell(offset) + self.cell() * factor, offset)
+            case Scan(stride):
+                while self.cell():
+                    self.run(Forward(stride) if stride > 0 else Back(-stride))
+                self.store(0)  # also checks that we are still on the tape
+            case If(body):
+                if self.cell():
+                    self.run_all(body)
+            case Loop(body) | DoWhile(body):
+                while self.cell():
+                    self.run_all(body)
+                    self.budget -= 1
+                    if self.budget < 0:
+                        raise _Stop()
+            case _:
+                # Input, or anything we don't know how to run
+                raise _Stop()
+
+    def run_all(self, intermediate: AST) -> None:
+        for node in intermediate:
+            self.run(node)
+
+
+@dataclass
+class _Knowledge:
+    """ What we know about the tape at some point of the program. """
+    # Cell positions are relative to where we started tracking the pointer.
+    # None means that the value is unknown.
+    position: int = 0
+    values: dict[int, int|None] = field(default_factory=dict)
+    rest: int|None = None  # the value of the cells that are not in `values`
+
+    def get(self, offset: int = 0) -> int|None:
+        position = self.position + offset
+        if position in self.values:
+            return self.values[position]
+        # With a blank tape, positions are relative to the start, and cells
+        # left of it aren't 0, they are outside of the tape.
+        return self.rest if position >= 0 else None
+
+    def store(self, value: int|None, offset: int = 0) -> None:
+        self.values[self.position + offset] = value
+
+    def copy(self) -> "_Knowledge":
+        return _Knowledge(self.position, dict(self.values), self.rest)
+
+    def forget(self, touched: set[int]|None) -> None:
+        """ Forget the cells at the given offsets, or everything if `touched` is None. """
+        if touched is None:
+            self.position, self.values, self.rest = 0, {}, None
+        else:
+            for offset in touched:
+                self.store(None, offset)
+
+    def join(self, other: "_Knowledge") -> None:
+        """ Only keep what is known no matter which of the two states we are in. """
+        assert self.position == other.position
+        rest = self.rest if self.rest == other.rest else None
+        values: dict[int, int|None] = {}
+        for position in self.values.keys() | other.values.keys():
+            mine = self.values.get(position, self.rest)
+            theirs = other.values.get(position, other.rest)
+            if mine != rest or theirs != rest:
+                values[position] = mine if mine == theirs else None
+        self.values, self.rest = values, rest
+
+
+def propagate_constants(intermediate: AST, *, blank_tape: bool = False) -> AST:
+    """
+    Track which cells have known values, e.g. 0 after a loop or after [-],
+    and use that to remove loops that never run, to replace additions with
+    stores, to skip the first check of loops that always run and to print
+    known values as constants. With
+    `blank_tape`, all cells are assumed to be 0 at the start.
+    """
+    knowledge = _Knowledge(rest=0 if blank_tape else None)
+    return _propagate_constants(intermediate, knowledge)
+
+
+def _propagate_constants(intermediate: AST, knowledge: _Knowledge) -> AST:
+    result: AST = []
+
+    def append_set(offset: int, n: int) -> None:
+        # A store overwrites whatever was done to the same cell right before it.
+        match result[-1:]:
+            case [Set() | Add() | Subtract()] if offset == 0:
+                result.pop()
+            case [SetAt(previous) | AddAt(previous)] if previous == offset:
+                result.pop()
+        result.append(Set(n) if offset == 0 else SetAt(offset, n))
+        knowledge.store(n, offset)
+
+    def add(offset: int, n: int, node: Add|Subtract|AddAt) -> None:
+        value = knowledge.get(offset)
+        if value is None:
+            result.append(node)
+        else:
+            append_set(offset, (value + n) % 256)
+
+    # Output of known values is collected in one Print node, so that it can be
+    # written at once. Moving it before stores or pointer moves doesn't change
+    # anything, but moving it before other I/O would, so that ends the Print.
+    last_print: Print|None = None
+
+    def print_(data: bytes) -> None:
+        nonlocal last_print
+        if last_print is None:
+            last_print = Print(data)
+            result.append(last_print)
+        else:
+            last_print.data += data
+
+    for node in intermediate:
+        match node:
+            case Add(n):
+                add(0, n, node)
+            case Subtract(n):
+                add(0, -n, node)
+            case AddAt(offset, n):
+                add(offset, n, node)
+            case Set(n) if knowledge.get() == n:
+                pass  # the cell already contains n
+            case SetAt(offset, n) if knowledge.get(offset) == n:
+                pass
+            case Set(n):
+                append_set(0, n)
+            case SetAt(offset, n):
+                append_set(offset, n)
+            case Forward(n):
+                knowledge.position += n
+                result.append(node)
+            case Back(n):
+                knowledge.position -= n
+                result.append(node)
+            case Output(n) if (value := knowledge.get()) is not None:
+                print_(bytes([value]) * n)
+            case OutputAt(offset, n) if (value := knowledge.get(offset)) is not None:
+                print_(bytes([value]) * n)
+            case Print(data):
+                print_(data)
+            case Output() | OutputAt():
+                result.append(node)
+                last_print = None
+            case Input():
+                knowledge.store(None)
+                result.append(node)
+                last_print = None
+            case InputAt(offset, _):
+                knowledge.store(None, offset)
+                result.append(node)
+                last_print = None
+            case MulAdd(offset, factor):
+                value, target = knowledge.get(), knowledge.get(offset)
+                if value == 0:
+                    continue
+                if value is None or target is None:
+                    knowledge.store(None, offset)
+                    result.append(node)
+                else:
+                    append_set(offset, (target + value * factor) % 256)
+            case Scan() | Loop() | If() if knowledge.get() == 0:
+                pass  # never runs
+            case Scan():
+                result.append(node)
+                knowledge.forget(None)
+                knowledge.store(0)
+            case If(body) if knowledge.get() is not None:
+                # The cell isn't 0, so the body runs exactly once.
+                result.extend(_propagate_constants(body, knowledge))
+                last_print = None
+            case If(body):
+                touched = _touched(body)
+                taken = knowledge.copy()
+                taken.store(None)
+                result.append(If(_propagate_constants(body, taken)))
+                knowledge.store(0)  # otherwise the body would have run
+                if touched is None:
+                    knowledge.forget(None)
+                else:
+                    knowledge.join(taken)
+                last_print = None
+            case Loop(body) | DoWhile(body):
+                runs_at_least_once = isinstance(node, DoWhile) or knowledge.get() is not None
+                # Cells that the body doesn't change keep their values in every iteration.
+                touched = _touched(body)
+                knowledge.forget(touched)
+                inner = knowledge.copy()
+                inner.store(None)
+                body = _propagate_constants(body, inner)
+                result.append(DoWhile(body) if runs_at_least_once else Loop(body))
+                knowledge.store(0)  # otherwise the loop wouldn't have ended
+                last_print = None
+            case _:
+                result.append(node)
+                knowledge.forget(None)
+                last_print = None
+    return result
+
+
+def _touched(intermediate: AST) -> set[int]|None:
+    """
+    Offsets of the cells that the code might change. None if the code might
+    not return to the cell it started from, so that it can change any cell.
+    """
+    touched: set[int] = set()
+    offset = 0
+    for node in intermediate:
+        match node:
+            case Add() | Subtract() | Set() | Input():
+                touched.add(offset)
+            case AddAt(node_offset, _) | SetAt(node_offset, _) | InputAt(node_offset, _) | MulAdd(node_offset, _):
+                touched.add(offset + node_offset)
+            case Forward(n):
+                offset += n
+            case Back(n):
+                offset -= n
+            case Output() | OutputAt() | Print():
+                pass
+            case Loop(body) | If(body) | DoWhile(body):
+                inner = _touched(body)
+                if inner is None:
+                    return None
+                touched.update(offset + inner_offset for inner_offset in inner)
+                touched.add(offset)
+            case _:
+                return None
+    return touched if offset == 0 else None
+
+
+def sink_pointer_moves(intermediate: AST) -> AST:
+    """
+    Replace pointer moves inside straight-line code with offsets, e.g.
+    >+>+>+<<< becomes AddAt(1, 1), AddAt(2, 1), AddAt(3, 1). The pointer
+    is only moved once, before the next loop or at the end of the code.
+    """
+    result: AST = []
+    offset = 0
+
+    def move_pointer() -> None:
+        nonlocal offset
+        if offset > 0:
+            result.append(Forward(offset))
+        elif offset < 0:
+            result.append(Back(-offset))
+        offset = 0
+
+    for node in intermediate:
+        match node:
+            case Forward(n):
+                offset += n
+            case Back(n):
+                offset -= n
+            case Add(n):
+                _append_add(result, offset, n)
+            case Subtract(n):
+                _append_add(result, offset, -n)
+            case AddAt(node_offset, n):
+                _append_add(result, offset + node_offset, n)
+            case Set(n):
+                result.append(SetAt(offset, n))
+            case SetAt(node_offset, n):
+                result.append(SetAt(offset + node_offset, n))
+            case Output(n):
+                result.append(OutputAt(offset, n))
+            case OutputAt(node_offset, n):
+                result.append(OutputAt(offset + node_offset, n))
+            case Input(n):
+                result.append(InputAt(offset, n))
+            case InputAt(node_offset, n):
+                result.append(InputAt(offset + node_offset, n))
+            case Print():
+                result.append(node)
+            case Loop(body):
+                move_pointer()
+                result.append(Loop(sink_pointer_moves(body)))
+            case If(body):
+                move_pointer()
+                result.append(If(sink_pointer_moves(body)))
+            case DoWhile(body):
+                move_pointer()
+                result.append(DoWhile(sink_pointer_moves(body)))
+            case _:
+                # Nodes like MulAdd are relative to the current cell.
+                move_pointer()
+                result.append(node)
+
+    move_pointer()
+    return result
+
+
+def _append_add(result: AST, offset: int, n: int) -> None:
+    # Bring n into the range [-128, 127], so that the backends can emit
+    # the shortest instruction. Adding 0 doesn't have to be emitted at all.
+    n = (n + 128) % 256 - 128
+    if n:
+        result.append(AddAt(offset, n))
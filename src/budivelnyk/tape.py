@@ -1,9 +1,23 @@
+import os
+import sys
+import mmap
 import ctypes
-from typing import TypeAlias, no_type_check
+import pickle
+import signal
+import faulthandler
+from typing import Any, Callable, TypeAlias, no_type_check
 
 
 Tape: TypeAlias = ctypes.Array[ctypes.c_ubyte]
 
+_PROT_NONE = 0  # not in the mmap module
+_HUGE_PAGE_SIZE = 2 * 1024 * 1024
+
+
+if os.name == "posix":
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _libc.mprotect.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]
+
 
 def tape_of_size(size: int) -> Tape:
     return (ctypes.c_ubyte * size)()
@@ -17,3 +31,150 @@ def tape_with_contents(cells: bytes|bytearray) -> Tape:
 @no_type_check  # TODO: try collections.abc.Buffer with 3.12
 def as_tape(buffer, size: int) -> Tape:
     return (ctypes.c_ubyte * size).from_buffer(buffer)
+
+
+def tape_from_file(path: str|os.PathLike[str], size: int|None = None, *, private: bool = False) -> Tape:
+    """
+    Tape mapped from a file, by default as large as the file. Changes to the
+    tape are written to the file, so the tape can be kept between runs and
+    shared between processes. A missing or shorter file is created or
+    extended with zeros.
+
+    With `private`, the file is only read, e.g. to restore a saved tape, and
+    changes to the tape are only made in memory. The file can't be shorter
+    than the tape then.
+    """
+    fd = os.open(path, os.O_RDONLY if private else os.O_RDWR|os.O_CREAT, 0o666)
+    try:
+        file_size = os.fstat(fd).st_size
+        if size is None:
+            size = file_size
+        if size < 1:
+            raise ValueError("size must be 1 or more")
+        if file_size < size:
+            if private:
+                raise ValueError(f"the file has {file_size} bytes, but the tape needs {size}")
+            os.ftruncate(fd, size)
+        memory = mmap.mmap(fd, size, access=mmap.ACCESS_COPY if private else mmap.ACCESS_WRITE)
+    finally:
+        os.close(fd)  # the mapping stays
+    return (ctypes.c_ubyte * size).from_buffer(memory)
+
+
+def tape_with_huge_pages(size: int) -> Tape:
+    """
+    Tape of zeros in anonymous memory, which Linux is advised to back with
+    transparent huge pages, so large tapes need fewer TLB entries. Memory is
+    only allocated when it's first used, so creating the tape is cheap.
+    """
+    if os.name != "posix":
+        raise NotImplementedError("huge page tapes are only implemented on POSIX systems")
+    if size < 1:
+        raise ValueError("size must be 1 or more")
+    # Reserve enough to start the tape at a huge page boundary.
+    memory = mmap.mmap(-1, size + _HUGE_PAGE_SIZE, flags=mmap.MAP_PRIVATE)
+    if hasattr(mmap, "MADV_HUGEPAGE"):
+        memory.madvise(mmap.MADV_HUGEPAGE)
+    address = ctypes.addressof(ctypes.c_char.from_buffer(memory))
+    return (ctypes.c_ubyte * size).from_buffer(memory, -address % _HUGE_PAGE_SIZE)
+
+
+def tape_guarded(size: int, guard_size: int = 16 * mmap.PAGESIZE) -> Tape:
+    """
+    Tape of zeros between two inaccessible regions of `guard_size` bytes, so
+    a program that leaves the tape crashes instead of corrupting memory.
+    The tape ends right before the guard region after it. Before it, there
+    are up to a page of unused cells, so moving left of the tape is only
+    detected after them. Use `run_guarded` to get an exception instead of
+    the crash.
+
+    Only accesses that land in a guard region are caught. The optimizer
+    folds moves into the commands after them, so a program that moves more
+    than `guard_size` bytes past the tape at once, e.g. with `guard_size + 1`
+    `>` followed by `+`, jumps over the guard and corrupts memory.
+
+    The memory is shared with child processes, so changes that `run_guarded`
+    makes to the tape are visible to the caller.
+    """
+    if os.name != "posix":
+        raise NotImplementedError("guarded tapes are only implemented on POSIX systems")
+    if size < 1:
+        raise ValueError("size must be 1 or more")
+    if guard_size < 1:
+        raise ValueError("guard_size must be 1 or more")
+    guard_size = _round_up(guard_size, mmap.PAGESIZE)
+    tape_pages_size = _round_up(size, mmap.PAGESIZE)
+    memory = mmap.mmap(-1, guard_size + tape_pages_size + guard_size)  # shared and zeroed
+    address = ctypes.addressof(ctypes.c_char.from_buffer(memory))
+    for start in (address, address + guard_size + tape_pages_size):
+        if _libc.mprotect(start, guard_size, _PROT_NONE) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"mprotect failed: {os.strerror(errno)}")
+    # The tape keeps the mapping alive.
+    return (ctypes.c_ubyte * size).from_buffer(memory, guard_size + tape_pages_size - size)
+
+
+def run_guarded(function: Callable[..., Any], tape: Tape, *args: Any) -> Any:
+    """
+    Calls `function(tape, *args)` in a child process and returns its result.
+    If the program leaves a tape from `tape_guarded`, it raises IndexError
+    instead of crashing the caller. Exceptions raised by the function are
+    raised again here.
+
+    Only changes to shared memory, such as guarded tapes, are visible to the
+    caller. Output written into e.g. a bytearray is lost, and so is input
+    that a function compiled with UseJIT.SYSCALLS read ahead.
+
+    Every call forks the process, which takes milliseconds. Don't call it
+    while other threads run, e.g. from `run_many`: the child only has the
+    calling thread, and locks held by the others are never released in it.
+    """
+    if not hasattr(os, "fork"):
+        raise NotImplementedError("run_guarded requires os.fork")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _run_child(function, tape, args, write_fd)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as pipe:
+        data = pipe.read()
+    _, status = os.waitpid(pid, 0)
+    exit_code = os.waitstatus_to_exitcode(status)
+    if exit_code in (-signal.SIGSEGV, -signal.SIGBUS):
+        raise IndexError(f"the program left the tape ({signal.Signals(-exit_code).name})")
+    if exit_code < 0:
+        raise RuntimeError(f"the program was killed by {signal.Signals(-exit_code).name}")
+    if not data:
+        raise RuntimeError(f"the program exited with code {exit_code}")
+    succeeded, result = pickle.loads(data)
+    if not succeeded:
+        raise result
+    return result
+
+
+def _run_child(function: Callable[..., Any], tape: Tape, args: tuple[Any, ...], write_fd: int) -> None:
+    # The parent reports the crash, so there's no need for a traceback.
+    faulthandler.disable()
+    try:
+        try:
+            outcome: tuple[bool, Any] = (True, function(tape, *args))
+        except BaseException as error:
+            outcome = (False, error)
+        try:
+            data = pickle.dumps(outcome)
+        except Exception as error:
+            data = pickle.dumps((False, RuntimeError(f"can't return the outcome of the program: {error}")))
+        with os.fdopen(write_fd, "wb") as pipe:
+            pipe.write(data)
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(0)
+
+
+def _round_up(n: int, multiple: int) -> int:
+    return (n + multiple - 1) // multiple * multiple
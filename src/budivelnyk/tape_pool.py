@@ -0,0 +1,107 @@
+"""
+Reusable tapes, see TapePool.
+"""
+
+from __future__ import annotations
+
+import mmap
+import ctypes
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from .tape import Tape, tape_of_size
+
+
+# Smaller tapes are cleared with memset, larger ones by dropping their pages,
+# which the kernel replaces with zeros when they're used again.
+_DROP_PAGES_SIZE = 16 * mmap.PAGESIZE
+
+
+class TapePool:
+    """
+    Thread-safe pool of tapes of `size` cells. Tapes are cleared when they're
+    returned, so `acquire` always gives a tape of zeros. Up to `max_free`
+    returned tapes are kept for reuse.
+    """
+
+    def __init__(self, size: int, max_free: int = 16):
+        if size < 1:
+            raise ValueError("size must be 1 or more")
+        if max_free < 0:
+            raise ValueError("max_free must be 0 or more")
+        self.size = size
+        self.max_free = max_free
+        self._lock = threading.Lock()
+        self._free: list[tuple[Tape, mmap.mmap|None]] = []
+        # Keeping the tapes here keeps their ids from being reused while
+        # they're out, so a foreign tape can't be mistaken for one of them.
+        self._used: dict[int, tuple[Tape, mmap.mmap|None]] = {}
+
+    def acquire(self) -> Tape:
+        with self._lock:
+            if self._free:
+                tape, memory = self._free.pop()
+                self._used[id(tape)] = (tape, memory)
+                return tape
+        tape, memory = self._new_tape()
+        with self._lock:
+            self._used[id(tape)] = (tape, memory)
+        return tape
+
+    def release(self, tape: Tape) -> None:
+        with self._lock:
+            used_tape, memory = self._used.get(id(tape), (None, None))
+            if used_tape is not tape:
+                raise ValueError("the tape is not from this pool or was already released")
+            del self._used[id(tape)]
+            if len(self._free) >= self.max_free:
+                return
+        self._clear(tape, memory)  # outside of the lock, it may take long
+        with self._lock:
+            if len(self._free) < self.max_free:
+                self._free.append((tape, memory))
+
+    @contextmanager
+    def tape(self) -> Iterator[Tape]:
+        """ Acquires a tape for the `with` block and releases it after it. """
+        tape = self.acquire()
+        try:
+            yield tape
+        finally:
+            self.release(tape)
+
+    def _new_tape(self) -> tuple[Tape, mmap.mmap|None]:
+        if self.size < _DROP_PAGES_SIZE or not hasattr(mmap, "MADV_DONTNEED"):
+            return tape_of_size(self.size), None
+        memory = mmap.mmap(-1, self.size, flags=mmap.MAP_PRIVATE)
+        return (ctypes.c_ubyte * self.size).from_buffer(memory), memory
+
+    def _clear(self, tape: Tape, memory: mmap.mmap|None) -> None:
+        if memory is None:
+            ctypes.memset(tape, 0, self.size)
+        else:
+            memory.madvise(mmap.MADV_DONTNEED)
+
+
+class PooledTapeFunction:
+    """
+    Compiled function whose tape can be omitted: then it runs on a tape of
+    zeros from its own pool. The starting cell is `start` cells into the
+    tape, so programs that move left of it have room as well.
+    """
+
+    def __init__(self, function: Callable[..., Any], size: int, start: int = 0):
+        self._function = function
+        self.pool = TapePool(size)
+        self.start = start
+
+    def __call__(self, tape: Tape|int|object = None, *args: Any) -> Any:
+        if tape is not None:
+            return self._function(tape, *args)
+        with self.pool.tape() as pooled_tape:
+            return self._function(ctypes.addressof(pooled_tape) + self.start, *args)
+
+    def __getattr__(self, name: str) -> Any:
+        # e.g. close() and size of JIT-compiled functions
+        return getattr(self._function, name)
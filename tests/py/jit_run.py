@@ -0,0 +1,8 @@
+from sys import argv
+from budivelnyk import Bf, UseJIT, tape_of_size
+
+# usage: jit_run.py CODE CALLS [SYSCALLS|LIBC]
+use_jit = UseJIT[argv[3]] if len(argv) > 3 else UseJIT.SYSCALLS
+func = Bf.to_function(argv[1], use_jit=use_jit)
+for _ in range(int(argv[2])):
+    func(tape_of_size(1))
@@ -0,0 +1,66 @@
+import pytest
+
+from budivelnyk import Bf, TapeRequirements, UseJIT, tape_guarded, run_guarded
+from budivelnyk.analysis import tape_requirements
+from budivelnyk.intermediate import Forward, Back, AddAt, Loop, If, Scan, MulAdd, SetAt
+from helpers import skip_if_jit_not_implemented
+
+
+def test_straight_line():
+    assert tape_requirements([AddAt(3, 1), Forward(5), Back(7), AddAt(-1, 1)]) == TapeRequirements(-3, 3)
+    assert tape_requirements([Forward(5)]) == TapeRequirements(0, 0)  # moving doesn't access cells
+
+
+def test_balanced_loop():
+    requirements = tape_requirements([Forward(1), Loop([AddAt(-1, 1), AddAt(2, -1)])])
+    assert requirements == TapeRequirements(0, 3)
+    assert requirements.size == 4
+    assert requirements.start == 0
+
+
+def test_unbalanced_loop():
+    assert tape_requirements([Forward(2), Loop([Forward(1), AddAt(0, 1)])]) == TapeRequirements(0, None)
+    assert tape_requirements([Forward(2), Loop([Back(1)]), SetAt(3, 0)]) == TapeRequirements(None, 5)
+    assert tape_requirements([Loop([Scan(1), Back(1)])]) == TapeRequirements(None, None)
+    assert tape_requirements([Scan(-2)]).size is None
+
+
+def test_if():
+    # the pointer may or may not move
+    assert tape_requirements([If([Forward(2)]), SetAt(1, 0)]) == TapeRequirements(0, 3)
+    assert tape_requirements([If([MulAdd(-2, 1)])]) == TapeRequirements(-2, 0)
+
+
+def test_left_of_start():
+    requirements = Bf.tape_requirements("<<+>>>+")
+    assert requirements == TapeRequirements(-2, 1)
+    assert requirements.size == 4
+    assert requirements.start == 2
+
+
+@skip_if_jit_not_implemented
+@pytest.mark.parametrize("code", [
+    ">>+<",
+    "++[>+++[>++<-]<-]>>.",
+    "+[->>+<<]>>[-<<+>>]",
+    ">+>+<[->+<]>.",
+])
+def test_exact_fit(code):
+    size = Bf.tape_requirements(code).size
+    run_guarded(Bf.to_function(code, use_jit=UseJIT.MEMORY), tape_guarded(size))
+
+
+@skip_if_jit_not_implemented
+def test_auto_tape():
+    function = Bf.to_function("<+++[>++<-]>.", use_jit=UseJIT.MEMORY, auto_tape=True)
+    assert function.pool.size == 2
+    output = bytearray(1)
+    assert function(None, b"", output) == (0, 1)
+    assert output == b"\6"
+    assert function(None, b"", output) == (0, 1)  # the tape is cleared between calls
+    assert output == b"\6"
+
+
+def test_auto_tape_unbounded():
+    with pytest.raises(ValueError, match="can't be determined"):
+        Bf.to_function(",[>,]", auto_tape=True)
@@ -0,0 +1,57 @@
+import os
+from ctypes import CDLL
+import pytest
+from budivelnyk import Bf, tape_with_contents
+from budivelnyk.frontends.batch import run_batch
+
+
+@pytest.fixture
+def sources(tmp_path):
+    paths = []
+    for name, code in [("inc", "+"), ("broken", "+]"), ("dec", "-")]:
+        path = tmp_path / f"{name}.bf"
+        path.write_text(code)
+        paths.append((str(path), str(tmp_path / f"lib{name}.so")))
+    return paths
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_files_to_shared_many(sources, workers):
+    results = Bf.files_to_shared_many(sources, workers=workers)
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert isinstance(results[1].error, ValueError)
+    assert [(result.input_path, result.output_path) for result in results] == sources
+    for result, expected in zip([results[0], results[2]], [1, 255]):
+        tape = tape_with_contents(b"\0")
+        CDLL(result.output_path).run(tape)
+        assert tape[:] == [expected]
+
+
+def test_files_to_asm_files_many(sources, tmp_path):
+    pairs = [(input_path, output_path.replace(".so", ".s")) for input_path, output_path in sources]
+    results = Bf.files_to_asm_files_many(pairs, workers=2)
+
+    assert [result.ok for result in results] == [True, False, True]
+    with open(results[0].output_path) as asm_file:
+        assert "run:" in asm_file.read()
+
+
+def test_invalid_workers(sources):
+    with pytest.raises(ValueError):
+        Bf.files_to_shared_many(sources, workers=0)
+
+
+def _misbehave(input_path, output_path):
+    if input_path == "unpicklable":
+        raise ValueError(lambda: None)
+    if input_path == "exit":
+        os._exit(1)
+
+
+def test_pool_errors():
+    pairs = [("unpicklable", "a"), ("exit", "b")]
+    results = run_batch(_misbehave, pairs, workers=2)
+    # the errors are reported per file instead of being raised
+    assert [(result.input_path, result.output_path) for result in results] == pairs
+    assert not any(result.ok for result in results)
@@ -1,13 +1,55 @@
 import pytest
 from budivelnyk.frontends.bf import Bf
-from budivelnyk.intermediate import Loop, Subtract
+from budivelnyk.intermediate import Loop, Add, Subtract, Forward, Back, Set, MulAdd, If, Scan
 
 def test_dead_code():
     with pytest.warns() as warnings:
-        nodes = Bf.to_intermediate("[-][+]")
+        nodes = Bf.to_intermediate("[-][+]", optimize=1)
 
-        assert nodes == [Loop([Subtract(1)])]
+        assert nodes == [Set(0)]
 
         assert len(warnings) == 1
         message = warnings[0].message.args[0]
         assert message == "Unreachable code eliminated at line 1, column 4"
+
+def test_clear():
+    assert Bf.to_intermediate("[-]>[+]>[---]>[-+-]", optimize=1) == [
+        Set(0), Forward(1), Set(0), Forward(1), Set(0), Forward(1), Set(0)
+    ]
+
+def test_not_clear():
+    # [--] never terminates if the cell is odd, so it must stay a loop:
+    assert Bf.to_intermediate("[--]", optimize=1) == [Loop([Subtract(2)])]
+    assert Bf.to_intermediate("[->+<]", optimize=1) != [Set(0)]
+    assert Bf.to_intermediate("[+-]", optimize=1) == [Loop([])]
+
+def test_multiply():
+    assert Bf.to_intermediate("[->+++>++<<]", optimize=1) == [If([MulAdd(1, 3), MulAdd(2, 2), Set(0)])]
+    assert Bf.to_intermediate("[<->-]", optimize=1) == [If([MulAdd(-1, 255), Set(0)])]
+    # the loop runs 256 - value times, so the factor is negated:
+    assert Bf.to_intermediate("[+>+<]", optimize=1) == [If([MulAdd(1, 255), Set(0)])]
+    assert Bf.to_intermediate("[->+>-<+<]", optimize=1) == [If([MulAdd(1, 2), MulAdd(2, 255), Set(0)])]
+    # changes that cancel out are dropped:
+    assert Bf.to_intermediate("[->+<>-<]", optimize=1) == [Set(0)]
+
+def test_not_multiply():
+    assert Bf.to_intermediate("[->+]", optimize=1) == [Loop([Subtract(1), Forward(1), Add(1)])]
+    assert Bf.to_intermediate("[->+<.]", optimize=1)[0] != Set(0)
+    assert Bf.to_intermediate("[-->+<]", optimize=1)[0] != Set(0)
+
+def test_scan():
+    assert Bf.to_intermediate("[>]>[<<]", optimize=1) == [Scan(1), Forward(1), Scan(-2)]
+    assert Bf.to_intermediate("[>+]", optimize=1) == [Loop([Forward(1), Add(1)])]
+
+def test_fold_mixed_runs():
+    assert Bf.to_intermediate("+-+-", optimize=0) == []
+    assert Bf.to_intermediate(">><<<", optimize=0) == [Back(1)]
+    assert Bf.to_intermediate("+><+", optimize=0) == [Add(2)]
+    assert Bf.to_intermediate("+>-<-+<", optimize=0) == [Add(1), Forward(1), Subtract(1), Back(2)]
+
+def test_fold_wraps_around():
+    assert Bf.to_intermediate("+" * 300, optimize=0) == [Add(44)]
+    assert Bf.to_intermediate("+" * 128, optimize=0) == [Add(128)]
+    assert Bf.to_intermediate("-" * 129, optimize=0) == [Add(127)]
+    assert Bf.to_intermediate("+" * 250, optimize=0) == [Subtract(6)]
+    assert Bf.to_intermediate("+" * 256 + ">", optimize=0) == [Forward(1)]
@@ -39,9 +39,49 @@ def test_zero_minus_one(backend, library_path):
 
 
 @pytest.mark.parametrize("backend", backends)
-def test_print_hello(backend, library_path):
+def test_multiply(backend, library_path):
+    bf = ">[->+++>>++<<<]>>>[<+>-]"
+    Bf.to_shared(bf, library_path, backend=backend)
+
+    libmul = CDLL(library_path)
+    buffer = tape_with_contents(bytes([100, 5, 1, 7, 2]))
+    libmul.run(buffer)
+    assert buffer[:] == [100, 0, 16, 19, 0]
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_scan(backend, library_path):
+    bf = "[>]+>>[>>]+<[<]+"
+    Bf.to_shared(bf, library_path, backend=backend)
+
+    libscan = CDLL(library_path)
+    buffer = tape_with_contents(bytes([0, 5, 5, 0, 5, 0, 5, 0, 5, 5, 0, 0]))
+    libscan.run(buffer)
+    assert buffer[:] == [1, 5, 5, 0, 5, 0, 5, 1, 5, 5, 1, 0]
+    buffer = tape_with_contents(bytes([0, 5, 5, 5, 5, 0, 0, 0]))
+    libscan.run(buffer)
+    assert buffer[:] == [1, 5, 5, 5, 5, 1, 1, 0]
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_known_values(backend, library_path):
+    # After [-]+++ the cell is known to be 3, so the loop doesn't check it
+    # before the first iteration.
+    bf = "[-]+++[>[-]>++<<-]>>+"
+    Bf.to_shared(bf, library_path, backend=backend)
+
+    libknown = CDLL(library_path)
+    buffer = tape_with_contents(bytes([9, 9, 9]))
+    libknown.run(buffer)
+    assert buffer[:] == [0, 0, 16]
+
+
+@pytest.mark.parametrize("backend", backends)
+@pytest.mark.parametrize("blank_tape", [False, True])
+def test_print_hello(backend, blank_tape, library_path):
+    # With a blank tape, the whole program is run at compile time.
     bf = "tests/bf/hello.bf"
-    Bf.file_to_shared(bf, library_path, backend=backend)
+    Bf.file_to_shared(bf, library_path, backend=backend, blank_tape=blank_tape)
 
     call_hello = [sys.executable, "tests/py/call_hello.py", library_path]
     result = run(call_hello, capture_output=True)
@@ -96,3 +136,41 @@ def test_consecutive_reads(backend, library_path):
         except TimeoutExpired as e:
             process.kill()
             assert False, f"process still runs after {e.timeout} s"
+
+
+direct_backends = [backend for backend in backends if backend.name.startswith("X86_64")]
+
+
+@pytest.mark.parametrize("backend", direct_backends)
+def test_direct(backend, library_path):
+    Bf.to_shared(">[->+++>>++<<<]>>>[<+>-]>[>]", library_path, backend=backend, direct=True)
+
+    libmul = CDLL(library_path)
+    buffer = tape_with_contents(bytes([100, 5, 1, 7, 2, 0]))
+    libmul.run(buffer)
+    assert buffer[:] == [100, 0, 16, 19, 0, 0]
+
+
+@pytest.mark.parametrize("backend", direct_backends)
+@pytest.mark.parametrize("blank_tape", [False, True])
+def test_direct_print_hello(backend, blank_tape, library_path):
+    Bf.file_to_shared("tests/bf/hello.bf", library_path, backend=backend, blank_tape=blank_tape, direct=True)
+
+    call_hello = [sys.executable, "tests/py/call_hello.py", library_path]
+    result = run(call_hello, capture_output=True)
+    result.check_returncode()
+    assert result.stdout == b"hello\n"
+
+
+@pytest.mark.parametrize("backend", direct_backends)
+def test_direct_tee(backend, library_path):
+    Bf.to_shared("+[,.]", library_path, backend=backend, direct=True)
+
+    call_tee = [sys.executable, "tests/py/call_tee.py", library_path]
+    result = run(call_tee, input=b"123\n456", capture_output=True, timeout=3)
+    assert result.stdout == b"123\n456\0"
+
+
+def test_direct_unsupported_backend(library_path):
+    with pytest.raises(ValueError):
+        Bf.to_shared("+", library_path, backend=Backend.ARM64, direct=True)
@@ -0,0 +1,143 @@
+import ctypes
+
+import pytest
+
+from budivelnyk import Bf, Backend, UseJIT, jit_implemented, tape_of_size
+from budivelnyk.bounds import insert_bounds_checks
+from budivelnyk.intermediate import Forward, Back, AddAt, SetAt, Loop, If, Scan, CheckBounds
+from helpers import library_path
+
+
+def test_one_check_per_run():
+    intermediate = [AddAt(0, 1), AddAt(3, 1), Forward(5), Loop([AddAt(-1, 1), Forward(1)])]
+    assert insert_bounds_checks(intermediate) == [
+        # the loop condition is read at offset 5
+        CheckBounds(0, 5), AddAt(0, 1), AddAt(3, 1), Forward(5),
+        # and again after every iteration
+        Loop([CheckBounds(-1, 1), AddAt(-1, 1), Forward(1)]),
+    ]
+
+
+def test_known_cells_are_not_checked_again():
+    intermediate = [SetAt(0, 1), Loop([Back(1)]), Loop([SetAt(0, 0)]), If([Forward(2)]), SetAt(0, 0)]
+    assert insert_bounds_checks(intermediate) == [
+        CheckBounds(0, 0), SetAt(0, 1),
+        Loop([CheckBounds(-1, -1), Back(1)]),
+        Loop([SetAt(0, 0)]),
+        If([Forward(2)]),
+        CheckBounds(0, 0), SetAt(0, 0),
+    ]
+
+
+def test_scans_are_checked_every_step():
+    assert insert_bounds_checks([Scan(-2)]) == [CheckBounds(0, 0), Loop([CheckBounds(-2, -2), Back(2)])]
+
+
+modes = [
+    pytest.param(use_jit, marks=pytest.mark.skipif(use_jit is not UseJIT.NO and not jit_implemented,
+                                                   reason="JIT compiler not implemented for this platform"))
+    for use_jit in UseJIT
+]
+
+
+def _run(function, use_jit, tape):
+    if use_jit is UseJIT.MEMORY:
+        function(tape, b"", None)
+    else:
+        function(tape)
+
+
+@pytest.mark.parametrize("use_jit", modes)
+@pytest.mark.parametrize("code, cells", [
+    ("+>++>+++", [1, 2, 3]),
+    (">>+[-<+>]<[<+>-]", [1, 0, 0]),
+    ("+[>+]", None),  # runs right until it leaves the tape
+    ("+[>>>+<<<-]", None),
+    ("<+", None),
+    ("+>+>+[<]", None),
+])
+def test_functions(use_jit, code, cells):
+    function = Bf.to_function(code, use_jit=use_jit, bounds_checked=True)
+    # the cells around the tape must stay untouched
+    memory = tape_of_size(5)
+    tape = (ctypes.c_ubyte * 3).from_buffer(memory, 1)
+    if cells is None:
+        with pytest.raises(IndexError):
+            _run(function, use_jit, tape)
+    else:
+        _run(function, use_jit, tape)
+        assert tape[:] == cells
+    assert memory[0] == memory[4] == 0
+
+
+@pytest.mark.parametrize("use_jit", modes)
+@pytest.mark.parametrize("code", ["<.", "<[+]", ">>>>>>>>>>.", ">>>>>>>>>>[-]", ",>>>>>>>>>>."])
+def test_blank_tape(use_jit, code):
+    # reads the optimizer could answer at compile time must still be checked
+    function = Bf.to_function(code, use_jit=use_jit, blank_tape=True, bounds_checked=True)
+    with pytest.raises(IndexError):
+        _run(function, use_jit, tape_of_size(5))
+
+
+@pytest.mark.parametrize("use_jit", modes)
+def test_changes_before_leaving_are_kept(use_jit):
+    function = Bf.to_function("+>+>+>+", use_jit=use_jit, bounds_checked=True)
+    tape = bytearray(3)
+    with pytest.raises(IndexError):
+        _run(function, use_jit, tape)
+    # the last run is checked as a whole
+    assert tape == bytes(3)
+
+    function = Bf.to_function("+>+>+[>+]", use_jit=use_jit, bounds_checked=True)
+    with pytest.raises(IndexError):
+        _run(function, use_jit, tape)
+    assert tape == b"\x01\x01\x01"
+
+
+@pytest.mark.skipif(not jit_implemented, reason="JIT compiler not implemented for this platform")
+def test_memory_io():
+    reverse = Bf.to_function(">,[>,]<[.<]", use_jit=UseJIT.MEMORY, bounds_checked=True)
+    output = bytearray(4)
+    assert reverse(tape_of_size(6), b"abcd", output) == (4, 4)
+    assert output == b"dcba"
+    with pytest.raises(IndexError):
+        reverse(tape_of_size(5), b"abcd", output)
+
+
+def test_address_is_rejected():
+    function = Bf.to_function("+", bounds_checked=True)
+    with pytest.raises(TypeError):
+        function(ctypes.addressof(tape_of_size(1)))
+
+
+def test_auto_tape_is_rejected():
+    with pytest.raises(ValueError):
+        Bf.to_function("+", auto_tape=True, bounds_checked=True)
+
+
+x86_64_backends = [backend for backend in Backend.candidates() if backend.name.startswith("X86_64")]
+
+
+@pytest.mark.parametrize("backend", x86_64_backends)
+@pytest.mark.parametrize("direct", [False, True])
+def test_shared(backend, direct, library_path):
+    if direct and not jit_implemented:
+        pytest.skip("shared libraries are only written directly on x86_64 Linux")
+    Bf.to_shared("+[>+]", library_path, backend=backend, direct=direct, bounds_checked=True)
+
+    run = ctypes.CDLL(library_path).run
+    run.restype = ctypes.c_int
+    run.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    memory = tape_of_size(5)
+    assert run(ctypes.addressof(memory), 4) == 1
+    assert memory[:] == [1, 1, 1, 1, 0]
+    # stops at the last cell
+    memory = tape_of_size(5)
+    memory[4] = 255
+    assert run(ctypes.addressof(memory), 5) == 0
+    assert memory[:] == [1, 1, 1, 1, 0]
+
+
+def test_other_backends():
+    with pytest.raises(ValueError):
+        list(Bf.to_asm("+", backend=Backend.ARM64, bounds_checked=True))
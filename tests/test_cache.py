@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from budivelnyk import Bf, FunctionCache, UseJIT, tape_of_size
+from helpers import skip_if_jit_not_implemented
+
+
+def _compile(name, size=1):
+    def function(tape):
+        pass
+    function.__name__ = name
+    return lambda: (function, size)
+
+
+def test_hits_and_misses():
+    cache = FunctionCache()
+    first = cache.get_or_compile("a", _compile("a"))
+    assert cache.get_or_compile("a", _compile("other")) is first
+    cache.get_or_compile("b", _compile("b"))
+    statistics = cache.statistics()
+    assert (statistics.hits, statistics.misses, statistics.entries) == (1, 2, 2)
+
+
+def test_evict_least_recently_used():
+    cache = FunctionCache(max_entries=2)
+    a = cache.get_or_compile("a", _compile("a"))
+    cache.get_or_compile("b", _compile("b"))
+    cache.get_or_compile("a", _compile("a"))  # "b" is now the least recently used
+    cache.get_or_compile("c", _compile("c"))
+    assert cache.get_or_compile("a", _compile("a")) is a
+    assert len(cache) == 2
+    assert cache.statistics().evictions == 1
+    assert cache.get_or_compile("b", _compile("b")).__name__ == "b"
+    assert cache.statistics().misses == 4
+
+
+def test_evict_by_size():
+    cache = FunctionCache(max_size=100)
+    cache.get_or_compile("a", _compile("a", 60))
+    cache.get_or_compile("b", _compile("b", 60))
+    statistics = cache.statistics()
+    assert (statistics.entries, statistics.size, statistics.evictions) == (1, 60, 1)
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        FunctionCache(max_entries=0)
+    with pytest.raises(ValueError):
+        FunctionCache(max_size=0)
+
+
+def test_threads():
+    cache = FunctionCache(max_entries=10)
+    keys = [i % 20 for i in range(1000)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda key: cache.get_or_compile(key, _compile(str(key))), keys))
+    statistics = cache.statistics()
+    assert statistics.hits + statistics.misses == 1000
+    assert statistics.entries == 10
+
+
+@skip_if_jit_not_implemented
+def test_to_function():
+    cache = FunctionCache()
+    inc = Bf.to_function("+", cache=cache)
+    assert Bf.to_function("+", cache=cache) is inc
+    assert Bf.to_function("+", cache=cache, optimize=0) is not inc
+    assert Bf.to_function("+", cache=cache, use_jit=UseJIT.LIBC) is not inc
+    tape = tape_of_size(1)
+    inc(tape)
+    assert tape[:] == [1]
+    assert cache.statistics().size > 0
+
+
+@skip_if_jit_not_implemented
+def test_closed_functions_are_recompiled():
+    cache = FunctionCache()
+    inc = Bf.to_function("+", cache=cache)
+    inc.close()
+    assert not Bf.to_function("+", cache=cache).closed
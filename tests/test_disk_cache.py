@@ -0,0 +1,64 @@
+import os
+import sys
+from subprocess import run
+from budivelnyk import Bf, DiskCache, UseJIT, tape_of_size
+from helpers import skip_if_jit_not_implemented
+
+
+def test_get_and_put(tmp_path):
+    cache = DiskCache(tmp_path)
+    key = DiskCache.key("a", "b")
+    assert cache.get(key) is None
+    cache.put(key, b"data")
+    assert cache.get(key) == b"data"
+    assert DiskCache.key("a", "b") != DiskCache.key("ab")
+    assert [path.name for path in tmp_path.iterdir()] == [key]
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_size=15)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, b"12345")
+        os.utime(tmp_path / key, (i, i))
+    cache.get("a")  # "b" and then "c" are now the least recently used
+    cache.max_size = 10
+    cache.put("d", b"12345")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "d"]
+    assert cache.size() == 10
+
+
+def test_from_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv("BUDIVELNYK_CACHE_DIR", raising=False)
+    assert DiskCache.from_environment() is None
+    monkeypatch.setenv("BUDIVELNYK_CACHE_DIR", str(tmp_path / "cache"))
+    cache = DiskCache.from_environment()
+    assert cache is not None and cache.directory == tmp_path / "cache"
+
+
+def test_shared(tmp_path):
+    cache = DiskCache(tmp_path / "cache")
+    Bf.to_shared("+", str(tmp_path / "first.so"), disk_cache=cache)
+    assert len(list(cache.directory.iterdir())) == 1
+    Bf.to_shared("+", str(tmp_path / "second.so"), disk_cache=cache)
+    assert len(list(cache.directory.iterdir())) == 1
+    assert (tmp_path / "first.so").read_bytes() == (tmp_path / "second.so").read_bytes()
+
+
+def test_function_without_jit(tmp_path):
+    cache = DiskCache(tmp_path)
+    for _ in range(2):
+        func = Bf.to_function("++", use_jit=UseJIT.NO, disk_cache=cache)
+        tape = tape_of_size(1)
+        func(tape)
+        assert tape[:] == [2]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@skip_if_jit_not_implemented
+def test_jit_code_is_reused_between_processes(tmp_path):
+    environment = {**os.environ, "BUDIVELNYK_CACHE_DIR": str(tmp_path)}
+    jit_run = [sys.executable, "tests/py/jit_run.py", ",+.", "2"]
+    for _ in range(2):
+        result = run(jit_run, input=b"ab", capture_output=True, env=environment, timeout=10)
+        assert result.stdout == b"bc"
+    assert len(list(tmp_path.iterdir())) == 1
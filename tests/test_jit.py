@@ -1,3 +1,5 @@
+import sys
+from subprocess import run
 from budivelnyk import Bf, tape_of_size, tape_with_contents
 from helpers import skip_if_jit_not_implemented
 
@@ -32,3 +34,139 @@ def test_empty_loop():
     tape = tape_with_contents(bytes([0, 123]))
     func(tape)
     assert tape[:] == [0, 123]
+
+
+@skip_if_jit_not_implemented
+def test_clear_odd_step():
+    func = Bf.to_function("[+++]>[-]")
+    tape = tape_with_contents(bytes([200, 1]))
+    func(tape)
+    assert tape[:] == [0, 0]
+
+
+@skip_if_jit_not_implemented
+def test_multiply_with_offsets():
+    func = Bf.to_function(">>[-<<+++>+>>+++++<]")
+    tape = tape_with_contents(bytes([1, 100, 30, 0]))
+    func(tape)
+    assert tape[:] == [91, 130, 0, 150]
+
+
+@skip_if_jit_not_implemented
+def test_multiply_zero_at_end_of_tape():
+    func = Bf.to_function("[->+<]")
+    tape = tape_with_contents(bytes([0]))
+    func(tape)
+    assert tape[:] == [0]
+
+
+@skip_if_jit_not_implemented
+def test_offsets():
+    func = Bf.to_function(">+>++" + ">" * 200 + "+++" + "<" * 202 + "-")
+    tape = tape_of_size(203)
+    func(tape)
+    assert tape[:3] == [255, 1, 2]
+    assert tape[202] == 3
+
+
+@skip_if_jit_not_implemented
+def test_scan_forward():
+    # every position of the zero relative to a 16-byte block:
+    for start in range(20):
+        for zero in range(start, 70):
+            tape = tape_with_contents(bytes(1 if i != zero else 0 for i in range(80)))
+            Bf.to_function(">" * start + "[>]+")(tape)
+            assert tape[:] == [1] * 80
+
+
+@skip_if_jit_not_implemented
+def test_scan_back():
+    for start in range(50, 70):
+        for zero in range(start - 40, start + 1):
+            tape = tape_with_contents(bytes(1 if i != zero else 0 for i in range(80)))
+            Bf.to_function(">" * start + "[<]+")(tape)
+            assert tape[:] == [1] * 80
+
+
+@skip_if_jit_not_implemented
+def test_scan_with_stride():
+    func = Bf.to_function("[>>>]+")
+    tape = tape_with_contents(bytes([1, 0, 0, 1, 0, 0, 0]))
+    func(tape)
+    assert tape[:] == [1, 0, 0, 1, 0, 0, 1]
+
+
+@skip_if_jit_not_implemented
+def test_loop_known_to_run():
+    # [-]+ makes the current cell 1, so the loop body runs at least once.
+    # The body is long enough to need a 32-bit jump.
+    func = Bf.to_function("[-]+[>" + ">+" * 50 + "<" * 50 + "[-]<-]")
+    tape = tape_with_contents(bytes([7] * 52))
+    func(tape)
+    assert tape[:] == [0, 0] + [8] * 50
+
+
+@skip_if_jit_not_implemented
+def test_long_loop_body():
+    # Scans take many bytes of machine code, so the jumps around this body don't fit in a byte.
+    func = Bf.to_function(">[>[>]<[<]>-]")
+    tape = tape_with_contents(bytes([0, 3, 1, 1, 0]))
+    func(tape)
+    assert tape[:] == [0, 0, 1, 1, 0]
+
+
+@skip_if_jit_not_implemented
+def test_buffered_io():
+    # More than one buffer of input and output:
+    data = bytes(range(1, 256)) * 100
+    jit_run = [sys.executable, "tests/py/jit_run.py", "+[,.]", "1"]
+    result = run(jit_run, input=data, capture_output=True, timeout=10)
+    assert result.stdout == data + b"\0"
+
+
+@skip_if_jit_not_implemented
+def test_long_constant_output():
+    # A constant string longer than the pipe buffer:
+    jit_run = [sys.executable, "tests/py/jit_run.py", "[-]" + "+" * 65 + "." * 100000, "1"]
+    result = run(jit_run, capture_output=True, timeout=10)
+    assert result.stdout == b"A" * 100000
+
+
+@skip_if_jit_not_implemented
+def test_read_ahead_is_kept_between_calls():
+    jit_run = [sys.executable, "tests/py/jit_run.py", ",.,.", "3"]
+    result = run(jit_run, input=b"abcdefg", capture_output=True, timeout=10)
+    assert result.stdout == b"abcdef"
+
+
+@skip_if_jit_not_implemented
+def test_long_pointer_moves():
+    func = Bf.to_function(">" * 200 + "+" + "<" * 150 + "++", optimize=0)
+    tape = tape_of_size(201)
+    func(tape)
+    assert tape[50] == 2 and tape[200] == 1
+
+
+@skip_if_jit_not_implemented
+def test_deeply_nested_loops():
+    depth = 100
+    func = Bf.to_function("+" + "[>+" * depth + "[-]" + "<-]" * depth, optimize=0)
+    tape = tape_of_size(depth + 1)
+    func(tape)
+    assert tape[:] == [0] * (depth + 1)
+
+
+@skip_if_jit_not_implemented
+def test_libc_io():
+    # Bytes are written as they are, not encoded as characters.
+    data = bytes(range(1, 256))
+    jit_run = [sys.executable, "tests/py/jit_run.py", "+[,.]", "1", "LIBC"]
+    result = run(jit_run, input=data, capture_output=True, timeout=10)
+    assert result.stdout == data + b"\0"
+
+
+@skip_if_jit_not_implemented
+def test_libc_output_order():
+    code = "from budivelnyk import *; print('a'); Bf.to_function('+' * 98 + '.', use_jit=UseJIT.LIBC)(tape_of_size(1)); print('c')"
+    result = run([sys.executable, "-c", code], capture_output=True, timeout=10)
+    assert result.stdout == b"a\nbc\n"
@@ -0,0 +1,102 @@
+import os
+import gc
+import pytest
+from budivelnyk import Bf, tape_of_size
+from budivelnyk.backends.jit.arena import Arena, PAGE_SIZE
+from helpers import skip_if_jit_not_implemented
+
+
+def _permissions(address):
+    with open("/proc/self/maps") as maps:
+        for line in maps:
+            addresses, permissions = line.split()[:2]
+            start, end = (int(a, 16) for a in addresses.split("-"))
+            if start <= address < end:
+                return permissions[:3]
+
+
+@skip_if_jit_not_implemented
+def test_functions_share_pages():
+    arena = Arena()
+    first = arena.allocate(b"\xC3")
+    second = arena.allocate(b"\xC3")
+    assert second.address // PAGE_SIZE == first.address // PAGE_SIZE
+    assert second.address != first.address
+
+
+@skip_if_jit_not_implemented
+@pytest.mark.parametrize("shared_pages", [True, False])
+def test_code_is_not_writable(shared_pages):
+    arena = Arena()
+    arena._shared_pages = shared_pages
+    allocation = arena.allocate(b"\xC3")
+    assert (allocation.chunk is not None) == shared_pages
+    assert _permissions(allocation.address) == "r-x"
+    arena.release(allocation)
+
+
+@skip_if_jit_not_implemented
+def test_memory_is_reused():
+    arena = Arena()
+    first = arena.allocate(b"\xC3" * 100)
+    arena.release(first)
+    second = arena.allocate(b"\xC3" * 50)
+    assert second.address == first.address
+
+
+@skip_if_jit_not_implemented
+def test_large_code():
+    arena = Arena()
+    code = b"\x90" * (20 * PAGE_SIZE) + b"\xC3"
+    allocation = arena.allocate(code)
+    assert allocation.size >= len(code)
+    arena.release(allocation)
+
+
+@skip_if_jit_not_implemented
+def test_close():
+    with Bf.to_function("+") as func:
+        tape = tape_of_size(1)
+        func(tape)
+        assert tape[:] == [1]
+    assert func.closed
+    with pytest.raises(ValueError):
+        func(tape)
+
+
+@skip_if_jit_not_implemented
+def test_garbage_collection():
+    func = Bf.to_function("+")
+    chunk = func._finalizer.peek()[2][0].chunk
+    live = chunk.live
+    del func
+    gc.collect()
+    assert chunk.live == live - 1
+
+
+@skip_if_jit_not_implemented
+def test_fork():
+    # Code compiled in the parent and in the child after fork must not end up in the same memory.
+    inherited = Bf.to_function("+++")
+    to_parent, from_child = os.pipe()
+    to_child, from_parent = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            five = Bf.to_function("+" * 5)
+            os.write(from_child, b"x")
+            os.read(to_child, 1)  # the parent compiled its function
+            tapes = tape_of_size(1), tape_of_size(1)
+            inherited(tapes[0])
+            five(tapes[1])
+            os._exit(0 if (tapes[0][0], tapes[1][0]) == (3, 5) else 1)
+        finally:
+            os._exit(2)
+    os.read(to_parent, 1)  # the child compiled its function
+    seven = Bf.to_function("+" * 7)
+    os.write(from_parent, b"x")
+    _, status = os.waitpid(pid, 0)
+    tape = tape_of_size(1)
+    seven(tape)
+    assert tape[:] == [7]
+    assert os.waitstatus_to_exitcode(status) == 0
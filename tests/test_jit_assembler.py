@@ -0,0 +1,73 @@
+import pytest
+from budivelnyk.backends.jit.assembler import Assembler, MachineCode, Relocation
+from budivelnyk.backends.jit.hex import b
+
+
+def test_short_jumps():
+    asm = Assembler()
+    asm.label("start")
+    asm.emit(b("90"))           # nop
+    asm.jump("je", "end")
+    asm.jump("jmp", "start")
+    asm.label("end")
+    assert asm.assemble().code == b("90 74 02 EB FB")
+
+
+def test_near_jumps():
+    asm = Assembler()
+    asm.label("start")
+    asm.jump("je", "end")
+    asm.emit(b("90") * 200)
+    asm.jump("jmp", "start")
+    asm.label("end")
+    assert asm.assemble().code == b("0F 84", (200 + 5).to_bytes(4, "little")) + b("90") * 200 + b("E9", (-211).to_bytes(4, "little", signed=True))
+
+
+def test_relaxation_cascades():
+    # The jump over 200 bytes becomes near, which makes the first one too long for a short jump.
+    asm = Assembler()
+    asm.jump("je", "end")
+    asm.emit(b("90") * 124)
+    asm.jump("jne", "far")
+    asm.label("end")
+    asm.emit(b("90") * 200)
+    asm.label("far")
+    code = asm.assemble().code
+    assert code[:6] == b("0F 84", (124 + 6).to_bytes(4, "little"))
+    assert len(code) == 6 + 124 + 6 + 200
+
+
+def test_calls_are_always_near():
+    asm = Assembler()
+    asm.call("function")
+    asm.label("function")
+    asm.emit(b("C3"))           # ret
+    assert asm.assemble().code == b("E8 00 00 00 00 C3")
+
+
+def test_undefined_label():
+    asm = Assembler()
+    asm.jump("jmp", "nowhere")
+    with pytest.raises(ValueError):
+        asm.assemble()
+
+
+def test_relocations():
+    asm = Assembler()
+    asm.jump("jmp", "end")
+    asm.absolute(b("49 BD"), "symbol")  # movabs r13, symbol
+    asm.label("end")
+    machine_code = asm.assemble()
+    assert machine_code.relocations == (Relocation(4, "symbol"),)
+    assert machine_code.link({"symbol": 0x1122}) == b("EB 0A 49 BD 22 11 00 00 00 00 00 00")
+    assert MachineCode.from_bytes(machine_code.to_bytes()) == machine_code
+
+
+def test_rip_relative_relocations():
+    asm = Assembler()
+    asm.emit(b("90"))
+    asm.rip_relative(b("4C 8D 2D"), "data")  # lea r13, [rip+data]
+    machine_code = asm.assemble()
+    assert machine_code.relocations == (Relocation(4, "data", relative=True),)
+    assert machine_code.link({"data": 0x1000}, base=0x100) == b("90 4C 8D 2D", (0x1000 - 0x108).to_bytes(4, "little"))
+    assert MachineCode.from_bytes(machine_code.to_bytes()) == machine_code
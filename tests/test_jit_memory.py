@@ -0,0 +1,73 @@
+import mmap
+
+import pytest
+
+from budivelnyk import Bf, UseJIT, tape_of_size
+from helpers import skip_if_jit_not_implemented
+
+
+@skip_if_jit_not_implemented
+def test_copy():
+    cat = Bf.to_function(",[.,]", use_jit=UseJIT.MEMORY)
+    output = bytearray(11)
+    assert cat(tape_of_size(1), b"hello world", output) == (11, 11)
+    assert output == b"hello world"
+
+
+@skip_if_jit_not_implemented
+def test_end_of_input():
+    # reading past the end gives 0 and doesn't consume anything
+    read = Bf.to_function(",>,>,", use_jit=UseJIT.MEMORY)
+    tape = tape_of_size(3)
+    assert read(tape, b"ab") == (2, 0)
+    assert tape[:] == [97, 98, 0]
+
+
+@skip_if_jit_not_implemented
+def test_truncated_output():
+    cat = Bf.to_function(",[.,]", use_jit=UseJIT.MEMORY)
+    output = bytearray(3)
+    assert cat(tape_of_size(1), b"hello", output) == (5, 5)
+    assert output == b"hel"
+    assert cat(tape_of_size(1), b"hello") == (5, 5)
+
+
+@skip_if_jit_not_implemented
+@pytest.mark.parametrize("blank_tape", [False, True])
+def test_print(blank_tape):
+    hi = Bf.to_function("+" * 72 + ".+.", use_jit=UseJIT.MEMORY, blank_tape=blank_tape)
+    output = bytearray(2)
+    assert hi(tape_of_size(1), output=output) == (0, 2)
+    assert output == b"HI"
+
+
+@skip_if_jit_not_implemented
+def test_memoryview_and_mmap(tmp_path):
+    path = tmp_path / "input"
+    path.write_bytes(b"0123456789")
+    reverse = Bf.to_function(">,[>,]<[.<]", use_jit=UseJIT.MEMORY)
+    with open(path, "rb") as input_file, \
+         mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as input, \
+         mmap.mmap(-1, mmap.PAGESIZE) as output:
+        assert reverse(tape_of_size(12), memoryview(input)[2:7], memoryview(output)[1:]) == (5, 5)
+        assert output[:6] == b"\x0065432"
+
+
+@skip_if_jit_not_implemented
+def test_unsuitable_buffers():
+    cat = Bf.to_function(",[.,]", use_jit=UseJIT.MEMORY)
+    with pytest.raises(BufferError):
+        cat(tape_of_size(1), b"", b"read-only")
+    with pytest.raises(BufferError):
+        cat(tape_of_size(1), memoryview(b"not contiguous")[::2])
+    with pytest.raises(TypeError):
+        cat(tape_of_size(1), "text")
+
+
+@skip_if_jit_not_implemented
+def test_buffers_released():
+    output = bytearray(1)
+    resize = Bf.to_function(".", use_jit=UseJIT.MEMORY)
+    resize(tape_of_size(1), output=output)
+    output.append(0)  # would raise BufferError if the buffer were still exported
+    assert output == b"\0\0"
@@ -0,0 +1,71 @@
+import sys
+from subprocess import run
+
+import pytest
+
+from budivelnyk.__main__ import main
+
+
+def test_two_arguments(tmp_path):
+    output_path = tmp_path / "hello.s"
+    result = run([sys.executable, "-m", "budivelnyk", "tests/bf/hello.bf", str(output_path)], capture_output=True)
+    assert result.returncode == 0
+    assert "run:" in output_path.read_text()
+
+
+def _compiled(output):
+    return sorted(line.split(" -> ")[0].rsplit("/", 1)[-1] for line in output.splitlines() if " -> " in line)
+
+
+def test_directory(tmp_path, capsys):
+    source, build = tmp_path / "src", tmp_path / "build"
+    (source / "sub").mkdir(parents=True)
+    (source / "inc.bf").write_text("+")
+    (source / "sub" / "dec.bf").write_text("-")
+
+    assert main([str(source), str(build), "-j", "2"]) == 0
+    assert _compiled(capsys.readouterr().out) == ["dec.bf", "inc.bf"]
+    assert (build / "inc.s").exists() and (build / "sub" / "dec.s").exists()
+
+    # only changed inputs are compiled again:
+    (source / "inc.bf").write_text("++")
+    assert main([str(source), str(build)]) == 0
+    assert _compiled(capsys.readouterr().out) == ["inc.bf"]
+
+    # touching a file doesn't change its contents:
+    (source / "inc.bf").write_text("++")
+    assert main([str(source), str(build)]) == 0
+    assert _compiled(capsys.readouterr().out) == []
+
+    # but different options do:
+    assert main([str(source), str(build), "-O", "0"]) == 0
+    assert _compiled(capsys.readouterr().out) == ["dec.bf", "inc.bf"]
+
+
+def test_errors(tmp_path, capsys):
+    source, build = tmp_path / "src", tmp_path / "build"
+    source.mkdir()
+    (source / "bad.bf").write_text("+]")
+    (source / "good.bf").write_text("+")
+
+    assert main([str(source), str(build)]) == 1
+    captured = capsys.readouterr()
+    assert _compiled(captured.out) == ["good.bf"]
+    assert "bad.bf" in captured.err
+
+    # the failed file is compiled again:
+    assert main([str(source), str(build)]) == 1
+    assert "bad.bf" in capsys.readouterr().err
+
+
+def test_empty_directory(tmp_path):
+    source, build = tmp_path / "src", tmp_path / "build"
+    source.mkdir()
+    assert main([str(source), str(build)]) == 0
+    assert (build / ".budivelnyk-manifest.json").exists()
+
+
+def test_direct_requires_shared(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        main(["tests/bf/hello.bf", str(tmp_path / "hello.s"), "--direct"])
+    assert "--direct requires --shared" in capsys.readouterr().err
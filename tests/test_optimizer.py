@@ -0,0 +1,33 @@
+import pytest
+from budivelnyk import Bf
+from budivelnyk.optimizer import optimize, count_nodes, PASSES
+from budivelnyk.intermediate import Loop, If, Add, Subtract, Forward, Back, MulAdd, Set, SetAt
+
+
+def test_level_zero():
+    nodes = Bf.to_intermediate("[-]>[->+<]", optimize=0)
+    assert nodes == [Loop([Subtract(1)]), Forward(1), Loop([Subtract(1), Forward(1), Add(1), Back(1)])]
+
+
+def test_levels():
+    code = "[-]>[->+<]"
+    assert Bf.to_intermediate(code, optimize=1) == [Set(0), Forward(1), If([MulAdd(1, 1), Set(0)])]
+    assert Bf.to_intermediate(code, optimize=2) == [SetAt(0, 0), Forward(1), If([MulAdd(1, 1), SetAt(0, 0)])]
+    assert Bf.to_intermediate(code, optimize=99) == Bf.to_intermediate(code, optimize=2)
+
+
+def test_negative_level():
+    with pytest.raises(ValueError, match="optimization level"):
+        optimize([], -1)
+
+
+def test_statistics():
+    statistics = []
+    optimize([Loop([Subtract(1)]), Forward(1), Add(1)], 2, statistics=statistics)
+    assert [s.name for s in statistics] == [p.name for p in PASSES]
+    assert (statistics[0].nodes_before, statistics[0].nodes_after) == (4, 3)
+    assert all(s.seconds >= 0 for s in statistics)
+
+
+def test_count_nodes():
+    assert count_nodes([Loop([Add(1), Loop([Forward(1)])]), If([Set(0)])]) == 6
@@ -0,0 +1,47 @@
+import pytest
+
+from budivelnyk import Bf, UseJIT, run_many, tape_of_size, tape_with_contents
+from helpers import skip_if_jit_not_implemented
+
+
+@skip_if_jit_not_implemented
+@pytest.mark.parametrize("workers", [1, 4])
+def test_tapes(workers):
+    double = Bf.to_function("[->++<]")
+    tapes = [tape_with_contents(bytes([i, 0])) for i in range(100)]
+    assert run_many(double, tapes, workers=workers) == [None] * 100
+    assert [tape[1] for tape in tapes] == [2 * i for i in range(100)]
+
+
+@skip_if_jit_not_implemented
+@pytest.mark.parametrize("workers", [1, 4])
+def test_memory_io(workers):
+    reverse = Bf.to_function(">,[>,]<[.<]", use_jit=UseJIT.MEMORY)
+    inputs = [bytes(range(1, n + 1)) for n in range(50)]
+    outputs = [bytearray(n) for n in range(50)]
+    tapes = [tape_of_size(n + 2) for n in range(50)]
+    results = run_many(reverse, tapes, inputs=inputs, outputs=outputs, workers=workers)
+    assert results == [(n, n) for n in range(50)]
+    assert outputs == [input[::-1] for input in inputs]
+
+
+@skip_if_jit_not_implemented
+def test_outputs_only():
+    hi = Bf.to_function("+" * 72 + ".+.", use_jit=UseJIT.MEMORY)
+    outputs = [bytearray(2) for _ in range(10)]
+    assert run_many(hi, [tape_of_size(1) for _ in outputs], outputs=outputs, workers=3) == [(0, 2)] * 10
+    assert outputs == [b"HI"] * 10
+
+
+def test_errors():
+    def fail(tape):
+        if tape[0] == 7:
+            raise RuntimeError("seven")
+
+    tapes = [tape_with_contents(bytes([i])) for i in range(10)]
+    with pytest.raises(RuntimeError, match="seven"):
+        run_many(fail, tapes, workers=4)
+    with pytest.raises(ValueError, match="as many inputs"):
+        run_many(fail, tapes, inputs=[b""])
+    with pytest.raises(ValueError, match="workers"):
+        run_many(fail, tapes, workers=0)
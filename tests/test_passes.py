@@ -0,0 +1,111 @@
+from budivelnyk import Bf
+from budivelnyk.passes import evaluate_prefix, propagate_constants, sink_pointer_moves
+from budivelnyk.intermediate import (
+    Loop, If, DoWhile, MulAdd, Scan,
+    Add, Subtract, Forward, Back, Output, Input, Print, Set,
+    AddAt, SetAt, OutputAt, InputAt
+)
+
+
+def test_sink_pointer_moves():
+    nodes = [Forward(1), Add(1), Forward(1), Add(1), Forward(1), Add(1), Back(3)]
+    assert sink_pointer_moves(nodes) == [AddAt(1, 1), AddAt(2, 1), AddAt(3, 1)]
+
+
+def test_sink_pointer_moves_io():
+    nodes = [Back(2), Output(1), Forward(3), Input(2), Set(5), Subtract(3)]
+    assert sink_pointer_moves(nodes) == [
+        OutputAt(-2, 1), InputAt(1, 2), SetAt(1, 5), AddAt(1, -3), Forward(1)
+    ]
+
+
+def test_sink_pointer_moves_stops_at_loops():
+    nodes = [Forward(2), Add(1), Loop([Forward(1), Add(1), Back(2)]), Forward(1),
+             If([MulAdd(1, 2), Set(0)])]
+    assert sink_pointer_moves(nodes) == [
+        AddAt(2, 1), Forward(2), Loop([AddAt(1, 1), Back(1)]), Forward(1),
+        If([MulAdd(1, 2), SetAt(0, 0)])
+    ]
+
+
+def test_sink_pointer_moves_wraps_constants():
+    nodes = [Add(200), Forward(1), Add(256), Back(1), Subtract(130)]
+    assert sink_pointer_moves(nodes) == [AddAt(0, -56), AddAt(0, 126)]
+
+
+def test_propagate_constants_dead_loops():
+    nodes = [Loop([Input(1)]), Loop([Output(1)]), Scan(1), If([MulAdd(1, 2), Set(0)]), Set(0)]
+    assert propagate_constants(nodes) == [Loop([Input(1)])]
+
+
+def test_propagate_constants_folds_adds():
+    nodes = [Set(0), Add(3), Forward(1), Add(1), Back(1), Subtract(1)]
+    assert propagate_constants(nodes) == [Set(3), Forward(1), Add(1), Back(1), Set(2)]
+
+
+def test_propagate_constants_blank_tape():
+    nodes = [Add(3), Forward(1), Loop([Output(1)]), Add(1), Back(1), If([MulAdd(1, 2), Set(0)])]
+    assert propagate_constants(nodes) == [
+        Add(3), Forward(1), Loop([Output(1)]), Set(1), Back(1), If([MulAdd(1, 2), Set(0)])
+    ]
+    assert propagate_constants(nodes, blank_tape=True) == [
+        Set(3), Forward(1), Set(1), Back(1), SetAt(1, 7), Set(0)
+    ]
+
+
+def test_propagate_constants_do_while():
+    nodes = [Set(2), Loop([Forward(1), Input(1), Back(1), Subtract(1)]), Loop([Add(1)])]
+    assert propagate_constants(nodes) == [
+        Set(2), DoWhile([Forward(1), Input(1), Back(1), Subtract(1)])
+    ]
+
+
+def test_propagate_constants_untouched_cells():
+    # The loop doesn't change the cell at offset 2, so it's still known afterwards.
+    nodes = [Forward(2), Set(5), Back(2), Loop([Subtract(1), Forward(1), Input(1), Back(1)]),
+             Forward(2), Add(1), Back(1), Add(1)]
+    assert propagate_constants(nodes) == [
+        Forward(2), Set(5), Back(2), Loop([Subtract(1), Forward(1), Input(1), Back(1)]),
+        Forward(2), Set(6), Back(1), Add(1)
+    ]
+
+
+def test_propagate_constants_unknown_after_scan():
+    nodes = [Forward(1), Set(1), Back(1), Scan(2), Forward(1), Add(1), Back(1), Add(1)]
+    assert propagate_constants(nodes) == [
+        Forward(1), Set(1), Back(1), Scan(2), Forward(1), Add(1), Back(1), Set(1)
+    ]
+
+
+def test_evaluate_prefix():
+    nodes = [Add(3), If([MulAdd(2, 5), Set(0)]), Forward(2), Output(2), Back(1), Input(1), Output(1)]
+    assert evaluate_prefix(nodes) == nodes
+    assert evaluate_prefix(nodes, blank_tape=True) == [
+        Print(bytes([15, 15])), Forward(2), Set(15), Back(1), Input(1), Output(1)
+    ]
+
+
+def test_evaluate_prefix_budget():
+    loop = Loop([Forward(1), Add(1)])  # never ends
+    nodes = [Add(1), Output(1), loop]
+    assert evaluate_prefix(nodes, blank_tape=True) == [Print(bytes([1])), Set(1), loop]
+    assert evaluate_prefix([Add(1), Loop([Add(1)])], blank_tape=True, budget=255) == [Set(1), Loop([Add(1)])]
+    assert evaluate_prefix([Add(1), Loop([Add(1)])], blank_tape=True, budget=1000) == []
+
+
+def test_evaluate_prefix_left_of_tape():
+    nodes = [Add(1), Back(1), Add(1)]
+    assert evaluate_prefix(nodes, blank_tape=True) == [Set(1), Back(1), Add(1)]
+    # reading isn't allowed there either
+    nodes = [Add(1), Back(1), Output(1)]
+    assert evaluate_prefix(nodes, blank_tape=True) == [Set(1), Back(1), Output(1)]
+    assert Bf.to_intermediate("<.", blank_tape=True) == [OutputAt(-1, 1), Back(1)]
+
+
+def test_propagate_constants_fuses_output():
+    nodes = [Set(72), Output(1), Forward(1), Set(105), Output(1), Back(1), Output(1),
+             Input(1), Output(1), Set(10), Output(2)]
+    assert propagate_constants(nodes) == [
+        Set(72), Print(b"HiH"), Forward(1), Set(105), Back(1),
+        Input(1), Output(1), Set(10), Print(b"\n\n")
+    ]
@@ -42,3 +42,33 @@ def test_string_buffer(nop):
     tape = ctypes.create_string_buffer(1)
     assert tape._type_ is ctypes.c_char
     nop(tape)
+
+
+@pytest.fixture(params=["DLL", "syscalls", "memory I/O"])
+def inc(request):
+    match request.param:
+        case "DLL":
+            return bd.Bf.to_function(">+", use_jit=bd.UseJIT.NO)
+        case "syscalls" | "memory I/O" if not bd.jit_implemented:
+            pytest.skip()
+        case "syscalls":
+            return bd.Bf.to_function(">+", use_jit=bd.UseJIT.SYSCALLS)
+        case "memory I/O":
+            return bd.Bf.to_function(">+", use_jit=bd.UseJIT.MEMORY)
+
+
+def test_bytearray_slice(inc):
+    data = bytearray(4)
+    inc(memoryview(data)[1:])
+    assert data == b"\0\0\1\0"
+
+
+def test_address(inc):
+    tape = bd.tape_of_size(2)
+    inc(ctypes.addressof(tape))
+    assert tape[:] == [0, 1]
+
+
+def test_read_only_buffer(inc):
+    with pytest.raises(BufferError):
+        inc(memoryview(b"\0\0"))
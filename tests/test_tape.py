@@ -1,8 +1,10 @@
 from array import array
 import sys
+import ctypes
 import platform
 import pytest
 import budivelnyk as bd
+from helpers import skip_if_jit_not_implemented
 
 
 def test_cast_bytes():
@@ -41,3 +43,69 @@ def test_copy_bytearray():
     x = bytearray(b"\x12\x34\x56")
     tape = bd.tape_with_contents(x)
     assert tape[:] == [0x12, 0x34, 0x56]
+
+
+@skip_if_jit_not_implemented
+def test_guarded():
+    tape = bd.tape_guarded(5000)
+    assert tape[:] == [0] * 5000
+    bd.run_guarded(bd.Bf.to_function(">+" * 4999), tape)
+    assert tape[:] == [0] + [1] * 4999
+
+
+@skip_if_jit_not_implemented
+@pytest.mark.parametrize("code, cells", [("+[>+]", [1] * 10), ("<" * 5000 + "+", [0] * 10)])
+def test_guarded_out_of_bounds(code, cells):
+    tape = bd.tape_guarded(10)
+    with pytest.raises(IndexError, match="left the tape"):
+        bd.run_guarded(bd.Bf.to_function(code), tape)
+    assert tape[:] == cells
+
+
+@skip_if_jit_not_implemented
+def test_guarded_result_and_errors():
+    cat = bd.Bf.to_function(",[.,]", use_jit=bd.UseJIT.MEMORY)
+    assert bd.run_guarded(cat, bd.tape_guarded(1), b"abc") == (3, 3)
+
+    def fail(tape):
+        raise KeyError("missing")
+
+    with pytest.raises(KeyError, match="missing"):
+        bd.run_guarded(fail, bd.tape_guarded(1))
+
+
+@skip_if_jit_not_implemented
+def test_from_file(tmp_path):
+    path = tmp_path / "tape"
+    tape = bd.tape_from_file(path, 3)
+    bd.Bf.to_function("+>++>+++")(tape)
+    del tape
+    assert path.read_bytes() == b"\1\2\3"
+    tape = bd.tape_from_file(path, 5)
+    assert tape[:] == [1, 2, 3, 0, 0]
+
+
+@skip_if_jit_not_implemented
+def test_from_file_private(tmp_path):
+    path = tmp_path / "tape"
+    path.write_bytes(b"\1\2\3")
+    tape = bd.tape_from_file(path, private=True)
+    bd.Bf.to_function("+>+>+")(tape)
+    assert tape[:] == [2, 3, 4]
+    assert path.read_bytes() == b"\1\2\3"
+    with pytest.raises(ValueError, match="3 bytes"):
+        bd.tape_from_file(path, 4, private=True)
+
+
+def test_from_file_empty(tmp_path):
+    with pytest.raises(ValueError, match="size"):
+        bd.tape_from_file(tmp_path / "tape")
+
+
+@skip_if_jit_not_implemented
+def test_huge_pages():
+    tape = bd.tape_with_huge_pages(3 * 1024 * 1024)
+    assert ctypes.addressof(tape) % (2 * 1024 * 1024) == 0
+    tape[-1] = 255
+    bd.Bf.to_function("+[>+]")(tape)  # stops at the last cell, where + makes 0
+    assert tape[0] == tape[-2] == 1 and tape[-1] == 0
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from budivelnyk import TapePool
+
+
+@pytest.mark.parametrize("size", [10, 1024 * 1024])
+def test_reuse_and_clear(size):
+    pool = TapePool(size)
+    tape = pool.acquire()
+    tape[0] = tape[size - 1] = 7
+    pool.release(tape)
+    again = pool.acquire()
+    assert again is tape
+    assert tape[0] == tape[size - 1] == 0
+
+
+def test_distinct_tapes():
+    pool = TapePool(4)
+    with pool.tape() as first, pool.tape() as second:
+        assert first is not second
+    assert len(pool._free) == 2
+
+
+def test_max_free():
+    pool = TapePool(4, max_free=1)
+    tapes = [pool.acquire() for _ in range(3)]
+    for tape in tapes:
+        pool.release(tape)
+    assert len(pool._free) == 1
+
+
+def test_foreign_tape():
+    pool = TapePool(4)
+    tape = TapePool(4).acquire()
+    with pytest.raises(ValueError, match="this pool"):
+        pool.release(tape)
+    own = pool.acquire()
+    pool.release(own)
+    with pytest.raises(ValueError, match="this pool"):
+        pool.release(own)
+
+
+def test_lost_tape():
+    pool = TapePool(4)
+    # a tape that is never released must not let another one take its id
+    for _ in range(100):
+        lost = pool.acquire()
+        lost_id = id(lost)
+        del lost
+        foreign = TapePool(4).acquire()
+        if id(foreign) == lost_id:
+            break
+    with pytest.raises(ValueError, match="this pool"):
+        pool.release(foreign)
+
+
+def test_threads():
+    pool = TapePool(64, max_free=4)
+    errors = []
+
+    def work():
+        for i in range(200):
+            with pool.tape() as tape:
+                if any(tape):
+                    errors.append(tape[:])
+                tape[i % 64] = 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(pool._free) <= 4
+
+
+def test_arguments():
+    with pytest.raises(ValueError, match="size"):
+        TapePool(0)
+    with pytest.raises(ValueError, match="max_free"):
+        TapePool(1, max_free=-1)